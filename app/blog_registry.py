@@ -0,0 +1,129 @@
+"""In-memory index of blog posts, built once instead of scanning per request."""
+
+from dataclasses import dataclass
+from datetime import UTC, datetime
+import logging
+import os
+import threading
+import time
+
+from app.blog_seo import BLOG_DISPLAY_TITLES
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Templates in the blog directory that are not posts
+NON_POSTS = ('blog_index.html', 'blog_base.html')
+
+
+@dataclass(frozen=True)
+class BlogPost:
+    """One post found in the blog directory."""
+
+    slug: str
+    template: str  # name for the template loader, e.g. public/blog_<slug>.html
+    title: str
+    modified: float  # file mtime (epoch seconds)
+
+    @property
+    def published(self) -> str:
+        """ISO date of the file's last modification (UTC)."""
+        return datetime.fromtimestamp(self.modified, UTC).date().isoformat()
+
+
+@dataclass(frozen=True)
+class BlogIndex:
+    """Immutable snapshot of the posts in one directory."""
+
+    directory: str
+    posts: dict[str, BlogPost]
+    directory_mtime: float
+
+    @property
+    def slugs(self) -> list[str]:
+        return list(self.posts)
+
+
+def scan(directory: str) -> BlogIndex:
+    """
+    Build a ``BlogIndex`` from the ``blog_<slug>.html`` files in ``directory``.
+
+    Args:
+        directory: Blog template directory (``settings.blog_dir``).
+
+    Returns:
+        The posts, sorted by slug.
+    """
+    prefix = os.path.basename(os.path.normpath(directory))
+    posts = {}
+    with os.scandir(directory) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            name = entry.name
+            if not (name.startswith('blog_') and name.endswith('.html')):
+                continue
+            if name in NON_POSTS or not entry.is_file():
+                continue
+            slug = name.removeprefix('blog_').removesuffix('.html')
+            posts[slug] = BlogPost(
+                slug=slug,
+                template=f'{prefix}/{name}',
+                title=BLOG_DISPLAY_TITLES.get(slug, slug.replace('_', ' ').title()),
+                modified=entry.stat().st_mtime,
+            )
+    return BlogIndex(
+        directory=directory,
+        posts=posts,
+        directory_mtime=os.stat(directory).st_mtime,
+    )
+
+
+class BlogRegistry:
+    """
+    Process-wide ``BlogIndex`` for ``settings.blog_dir``.
+
+    ``load()`` is called at startup; afterwards lookups only touch memory. With
+    ``blog_watch_interval_seconds`` > 0 the directory's mtime is re-checked at
+    most that often and the index is rebuilt when files were added, removed or
+    renamed. A settings reload pointing ``blog_dir`` elsewhere rebuilds it too.
+    """
+
+    def __init__(self):
+        self._index: BlogIndex | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> BlogIndex:
+        """(Re)build the index for the configured blog directory."""
+        index = scan(get_settings().blog_dir)
+        with self._lock:
+            self._index = index
+            self._checked_at = time.monotonic()
+        logger.info('Blog index: %d post(s) in %s', len(index.posts), index.directory)
+        return index
+
+    def current(self) -> BlogIndex:
+        """Return the index, rebuilding it if the directory has changed."""
+        index = self._index
+        settings = get_settings()
+        if index is None or index.directory != settings.blog_dir:
+            return self.load()
+        interval = settings.blog_watch_interval_seconds
+        now = time.monotonic()
+        if interval > 0 and now - self._checked_at >= interval:
+            self._checked_at = now
+            try:
+                changed = os.stat(index.directory).st_mtime != index.directory_mtime
+            except OSError:
+                changed = True
+            if changed:
+                return self.load()
+        return index
+
+    def get(self, slug: str) -> BlogPost | None:
+        return self.current().posts.get(slug)
+
+    def posts(self) -> list[BlogPost]:
+        return list(self.current().posts.values())
+
+
+blog_registry = BlogRegistry()
@@ -1,17 +1,29 @@
 """Centralized configuration using Pydantic Settings."""
 
+import logging
 import os
+import threading
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+logger = logging.getLogger(__name__)
+
+StrategyName = Literal['ctr_boost', 'epsilon_greedy', 'thompson']
+
 
 class Settings(BaseSettings):
-    """Application settings loaded from environment variables."""
+    """
+    Application settings loaded from environment variables.
+
+    Instances are immutable; ``reload_settings()`` replaces the shared one.
+    """
 
     model_config = SettingsConfigDict(
         env_file='.env',
         env_file_encoding='utf-8',
         extra='ignore',
+        frozen=True,
     )
 
     # Environment
@@ -20,9 +32,27 @@ class Settings(BaseSettings):
     # Database
     database_url: str | None = None
     local_database_url: str = 'sqlite:///./adserver.db'
+    # 'tuned' applies the settings below; 'default' leaves the driver defaults
+    db_profile: str = 'tuned'
+    sqlite_journal_mode: str = 'WAL'
+    sqlite_synchronous: str = 'NORMAL'
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kb: int = 32_768
+    sqlite_mmap_size: int = 128 * 1024 * 1024
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout_seconds: float = 10.0
+    db_pool_recycle_seconds: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 5000
+    # Query instrumentation (app/database.py)
+    db_slow_query_ms: float = 250.0
+    db_repeated_query_threshold: int = 10  # same statement shape in one request
 
     # Security
     admin_key: str | None = None
+    # Port of the keyless internal /metrics listener (fly.toml [metrics]); None: off
+    metrics_port: int | None = None
 
     # External services
     adsterra_smartlink: str = (
@@ -32,8 +62,41 @@ class Settings(BaseSettings):
     # Analytics
     ga_measurement_id: str | None = None
 
+    # Serving caches
+    catalog_ttl_seconds: float = 60.0
+    ctr_window_days: int = 7
+    ctr_bucket_seconds: int = 3600
+    ctr_resync_seconds: float = 300.0
+    sampler_refresh_seconds: float = 5.0
+    sampler_batch_size: int = 1024  # picks drawn per sampler (re)build
+
+    # Ad selection (app/services/ad_selection.py)
+    selection_strategy: StrategyName = 'ctr_boost'
+    # JSON object of zone id -> strategy, e.g. {"3": "thompson"}
+    zone_selection_strategies: dict[int, StrategyName] = {}
+    selection_epsilon: float = 0.1
+    stats_snapshot_seconds: float = 30.0
+
+    # Write-behind tracking
+    write_behind_enabled: bool = True
+    impression_batch_size: int = 500
+    impression_flush_interval_ms: int = 250
+    impression_buffer_max: int = 50_000
+    click_batch_size: int = 200
+    click_flush_interval_ms: int = 250
+    click_buffer_max: int = 50_000
+    # Unwritten rows at shutdown, and rejected rows, go here (fly.toml: /data)
+    tracking_spool_dir: str | None = None
+
+    # Retention (raw rows are already counted in the rollups when written)
+    raw_event_ttl_days: int = 30
+    rollup_hourly_ttl_days: int = 120
+    retention_chunk_size: int = 5000
+    retention_interval_minutes: float = 60.0  # 0 disables the in-process job
+
     # Paths
     blog_dir: str = os.path.join('templates', 'public')
+    blog_watch_interval_seconds: float = 0.0  # 0: index built at startup only
 
     @property
     def effective_database_url(self) -> str:
@@ -50,6 +113,37 @@ class Settings(BaseSettings):
         return self.app_env == 'development'
 
 
+_settings: Settings | None = None
+_settings_lock = threading.Lock()
+
+
 def get_settings() -> Settings:
-    """Get settings instance (reads from environment each time)."""
-    return Settings()
+    """
+    Get the process-wide settings snapshot.
+
+    The environment and ``.env`` are read once, on first use. Values consulted
+    per request (admin key, SmartLink, paths, ...) should be read through this
+    function rather than cached, so ``reload_settings()`` reaches them; engine,
+    pool and buffer sizes are fixed at startup.
+    """
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = Settings()
+    return _settings
+
+
+def reload_settings() -> Settings:
+    """
+    Re-read the environment and ``.env`` and atomically swap in the result.
+
+    If the new values don't validate, the error is raised and the current
+    snapshot stays in place.
+    """
+    global _settings
+    settings = Settings()
+    with _settings_lock:
+        _settings = settings
+    logger.info('Settings reloaded')
+    return settings
@@ -1,32 +1,305 @@
 """Database engine and session management."""
 
-from collections.abc import Generator
+from collections import Counter
+from collections.abc import AsyncGenerator, Callable, Generator, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+import logging
+import re
+import time
+from typing import TypeVar
 
+from sqlalchemy import Engine, event, inspect
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from app.config import get_settings
+from app import metrics
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
 
 settings = get_settings()
 
-# Configure connection arguments based on database type
-if settings.effective_database_url.startswith('sqlite'):
-    connect_args = {'check_same_thread': False}
-else:
-    connect_args = {}
 
-engine = create_engine(
-    settings.effective_database_url,
-    echo=False,
-    connect_args=connect_args,
-)
+def _set_sqlite_pragmas(dbapi_conn, s: Settings) -> None:
+    """Apply the per-connection SQLite pragmas of the tuned profile."""
+    cursor = dbapi_conn.cursor()
+    try:
+        # Only takes effect on a new, empty database (and must precede the WAL
+        # switch); older databases are converted by the retention CLI
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute(f'PRAGMA busy_timeout = {int(s.sqlite_busy_timeout_ms)}')
+        cursor.execute(f'PRAGMA journal_mode = {s.sqlite_journal_mode}')
+        cursor.execute(f'PRAGMA synchronous = {s.sqlite_synchronous}')
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f'PRAGMA cache_size = {-int(s.sqlite_cache_size_kb)}')
+        cursor.execute(f'PRAGMA mmap_size = {int(s.sqlite_mmap_size)}')
+        cursor.execute('PRAGMA temp_store = MEMORY')
+    finally:
+        cursor.close()
+
+
+def _profile_options(url: str, settings: Settings, kwargs: dict) -> dict:
+    """Fill in the ``create_engine`` arguments of the storage profile."""
+    if url.startswith('sqlite'):
+        kwargs.setdefault('connect_args', {})['check_same_thread'] = False
+    elif settings.db_profile == 'tuned':
+        kwargs.setdefault('pool_size', settings.db_pool_size)
+        kwargs.setdefault('max_overflow', settings.db_max_overflow)
+        kwargs.setdefault('pool_timeout', settings.db_pool_timeout_seconds)
+        kwargs.setdefault('pool_recycle', settings.db_pool_recycle_seconds)
+        kwargs.setdefault('pool_pre_ping', settings.db_pool_pre_ping)
+        if url.startswith('postgres'):
+            # Server-side limit, so a runaway query can't pin a pooled connection
+            kwargs.setdefault('connect_args', {})['options'] = (
+                f'-c statement_timeout={int(settings.db_statement_timeout_ms)}'
+            )
+    return kwargs
+
+
+def _attach_sqlite_pragmas(engine: Engine, settings: Settings) -> None:
+    if engine.dialect.name != 'sqlite' or settings.db_profile != 'tuned':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_conn, connection_record):
+        _set_sqlite_pragmas(dbapi_conn, settings)
+
+
+@dataclass
+class QueryLog:
+    """Statements executed while handling one request (or ``track_queries`` block)."""
+
+    route: str | None = None
+    budget: int | None = None
+    count: int = 0
+    seconds: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[normalize_sql(statement)] += 1
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        """Statement shapes run at least ``threshold`` times (likely N+1 loops)."""
+        return {sql: n for sql, n in self.shapes.items() if n >= threshold}
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+
+_query_log: ContextVar[QueryLog | None] = ContextVar('query_log', default=None)
+
+# Called with every finished request's QueryLog (the test suite asserts on these)
+query_log_listeners: list[Callable[[QueryLog], None]] = []
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAM_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(statement: str) -> str:
+    """
+    Reduce a statement to its shape: literals and IN lists become ``?``.
+
+    SQLAlchemy already binds parameters; this folds the remaining variation
+    (inline literals, expanded ``IN (?, ?, ...)`` lists, %s/$n/:name paramstyles
+    and whitespace) so repeats of one query compare equal.
+    """
+    sql = re.sub(r'%\(\w+\)s|%s|\$\d+|(?<!:):\w+', '?', statement)
+    sql = _LITERALS.sub('?', sql)
+    sql = _PARAM_LISTS.sub('(?...)', sql)
+    return ' '.join(sql.split())
+
+
+def query_budget(limit: int) -> Callable[[T], T]:
+    """
+    Declare the most statements one request to the decorated endpoint may run.
+
+    Apply it below the route decorator. Requests over budget are logged, and
+    the test suite fails on them (see ``query_log_listeners``).
+    """
+
+    def decorate(endpoint: T) -> T:
+        endpoint.__query_budget__ = limit  # type: ignore
+        return endpoint
+
+    return decorate
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryLog]:
+    """Collect the statements run in this context (threads inherit it)."""
+    log = QueryLog()
+    token = _query_log.set(log)
+    try:
+        yield log
+    finally:
+        _query_log.reset(token)
+
+
+def finish_query_log(log: QueryLog, settings: Settings | None = None) -> None:
+    """Warn about repeated statement shapes and blown budgets; notify listeners."""
+    settings = settings or get_settings()
+    for sql, n in log.repeated(settings.db_repeated_query_threshold).items():
+        logger.warning('%s ran the same statement %d times: %s', log.route, n, sql)
+    if log.over_budget:
+        logger.warning(
+            '%s ran %d statements (budget %d)', log.route, log.count, log.budget
+        )
+    for listener in query_log_listeners:
+        listener(log)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    operation = statement.split(None, 1)[0].upper()  # SELECT, INSERT, ...
+    engine_kind = 'async' if conn.dialect.is_async else 'sync'
+    metrics.db_query_duration.observe(elapsed, engine_kind, operation)
+    log = _query_log.get()
+    if log is not None:
+        log.record(statement, elapsed)
+    if elapsed * 1000 >= get_settings().db_slow_query_ms:
+        logger.warning(
+            'Slow query (%.1f ms, route %s): %s',
+            elapsed * 1000,
+            log.route if log is not None else None,
+            normalize_sql(statement),
+        )
+
+
+class QueryTrackingMiddleware:
+    """Gives each HTTP request a ``QueryLog`` and checks it when the request ends."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        with track_queries() as log:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                route = scope.get('route')
+                log.route = getattr(route, 'path', scope['path'])
+                log.budget = getattr(
+                    getattr(route, 'endpoint', None), '__query_budget__', None
+                )
+                finish_query_log(log)
+
+
+def create_db_engine(url: str, settings: Settings = settings, **kwargs) -> Engine:
+    """
+    Create an engine with the storage profile for the URL's backend.
+
+    Args:
+        url: SQLAlchemy database URL.
+        settings: Settings holding ``db_profile`` and the backend tuning values.
+        **kwargs: Extra ``create_engine`` arguments (e.g. ``poolclass``).
+
+    Returns:
+        The configured engine. With ``db_profile='default'`` only the
+        options required to work at all are set.
+    """
+    engine = create_engine(url, echo=False, **_profile_options(url, settings, kwargs))
+    _attach_sqlite_pragmas(engine, settings)
+    return engine
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync database URL to the same database with an asyncio driver."""
+    scheme, sep, rest = url.partition('://')
+    backend = scheme.split('+', 1)[0]
+    if backend == 'sqlite':
+        return f'sqlite+aiosqlite{sep}{rest}'
+    if backend in ('postgres', 'postgresql'):
+        # psycopg 3 has a native asyncio mode, no extra driver needed
+        return f'postgresql+psycopg{sep}{rest}'
+    return url
+
+
+def create_async_db_engine(
+    url: str, settings: Settings = settings, **kwargs
+) -> AsyncEngine:
+    """
+    Create an asyncio engine for ``url`` with the same storage profile.
+
+    Args:
+        url: Sync SQLAlchemy database URL; see ``async_database_url``.
+        settings: Settings holding ``db_profile`` and the backend tuning values.
+        **kwargs: Extra ``create_async_engine`` arguments.
+
+    Returns:
+        The configured async engine.
+    """
+    url = async_database_url(url)
+    engine = create_async_engine(
+        url, echo=False, **_profile_options(url, settings, kwargs)
+    )
+    _attach_sqlite_pragmas(engine.sync_engine, settings)
+    return engine
+
+
+engine = create_db_engine(settings.effective_database_url)
+# Used by the serving endpoints, so ad requests don't hold a threadpool slot
+async_engine = create_async_db_engine(settings.effective_database_url)
+
+
+def ensure_indexes(bind: Engine = engine) -> list[str]:
+    """
+    Create model indexes missing from existing tables.
+
+    ``create_all`` only creates indexes together with new tables, so databases
+    created before an index was declared never get it. Returns the names of the
+    indexes that were created. On SQLite the planner statistics are refreshed
+    afterwards, since it has no autovacuum/autoanalyze.
+    """
+    inspector = inspect(bind)
+    created = []
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info('Creating index %s on %s', index.name, table.name)
+                index.create(bind)
+                created.append(index.name)
+    if created and bind.dialect.name == 'sqlite':
+        with bind.begin() as conn:
+            conn.exec_driver_sql('ANALYZE')
+    return created
 
 
 def init_db() -> None:
-    """Initialize database tables."""
+    """Initialize database tables and indexes."""
     SQLModel.metadata.create_all(engine)
+    ensure_indexes(engine)
 
 
 def get_session() -> Generator[Session, None, None]:
     """Provide a database session for dependency injection."""
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """Provide an asyncio database session for dependency injection."""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
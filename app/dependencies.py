@@ -4,12 +4,14 @@ from typing import Annotated
 
 from fastapi import Depends, Header, HTTPException
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.config import get_settings
-from app.database import get_session
+from app.database import get_async_session, get_session
 
 # Type alias for database session dependency
 SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 
 def verify_admin_key(x_admin_key: str | None = Header(default=None)) -> bool:
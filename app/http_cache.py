@@ -0,0 +1,122 @@
+"""Validators and conditional responses for content served from memory."""
+
+from email.utils import formatdate, parsedate_to_datetime
+import hashlib
+
+from fastapi import Request, Response
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def content_hash(body: bytes, length: int = 16) -> str:
+    """Return a short hex digest of ``body`` for ETags and versioned URLs."""
+    return hashlib.sha256(body).hexdigest()[:length]
+
+
+def strong_etag(body: bytes) -> str:
+    """Return a strong, quoted ETag for ``body``."""
+    return f'"{content_hash(body)}"'
+
+
+def accepts_encoding(header: str, coding: str) -> bool:
+    """
+    Return True if the Accept-Encoding value ``header`` allows ``coding``.
+
+    Honours q-values (RFC 9110 12.5.3): ``gzip;q=0`` refuses gzip, and ``*``
+    covers codings the header doesn't name.
+    """
+    wildcard = False
+    for item in header.split(','):
+        name, _, params = item.partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        name = name.strip().lower()
+        if name == coding:
+            return q > 0
+        if name == '*':
+            wildcard = q > 0
+    return wildcard
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Return True if the request's If-None-Match matches ``etag``.
+
+    If-None-Match uses the weak comparison (RFC 9110 13.1.2), so a ``W/`` prefix
+    on either side is ignored.
+    """
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    bare = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == bare for tag in header.split(','))
+
+
+def not_modified_since(request: Request, last_modified: float) -> bool:
+    """Return True if If-Modified-Since is at or after ``last_modified`` (epoch s)."""
+    header = request.headers.get('if-modified-since')
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(last_modified) <= since  # HTTP dates have 1 s resolution
+
+
+def cached_response(
+    request: Request,
+    body: bytes,
+    media_type: str,
+    etag: str,
+    cache_control: str,
+    headers: dict[str, str] | None = None,
+    last_modified: float | None = None,
+    gzipped: bytes | None = None,
+) -> Response:
+    """
+    Return ``body`` with validators, or an empty 304 if the client has it already.
+
+    Args:
+        request: Incoming request (for If-None-Match / If-Modified-Since).
+        body: Response body.
+        media_type: Content-Type of ``body``.
+        etag: Quoted ETag of ``body``; the gzipped variant gets a ``-gzip``
+            suffix, so caches never confuse the two.
+        cache_control: Cache-Control header value.
+        headers: Extra headers for both the 200 and the 304 response.
+        last_modified: Modification time (epoch seconds) for Last-Modified.
+        gzipped: Pre-compressed ``body``, sent to clients that accept gzip.
+
+    Returns:
+        A 304 response when the request's validators match, otherwise a 200.
+        If-Modified-Since is only consulted without If-None-Match (RFC 9110).
+    """
+    gzip = gzipped is not None and accepts_encoding(
+        request.headers.get('accept-encoding', ''), 'gzip'
+    )
+    if gzip:
+        etag = f'{etag[:-1]}-gzip"'
+    all_headers = {'ETag': etag, 'Cache-Control': cache_control, **(headers or {})}
+    if last_modified is not None:
+        all_headers['Last-Modified'] = formatdate(last_modified, usegmt=True)
+    if gzipped is not None:
+        all_headers['Vary'] = 'Accept-Encoding'
+    if 'if-none-match' in request.headers:
+        fresh = etag_matches(request, etag)
+    else:
+        fresh = last_modified is not None and not_modified_since(request, last_modified)
+    if fresh:
+        return Response(status_code=304, headers=all_headers)
+    if gzip:
+        all_headers['Content-Encoding'] = 'gzip'
+        body = gzipped  # type: ignore
+    return Response(content=body, media_type=media_type, headers=all_headers)
@@ -1,28 +1,120 @@
 """FastAPI application factory and configuration."""
 
+import asyncio
 from contextlib import asynccontextmanager
 import logging
+import mimetypes
 import os
+import signal
+import stat
 
+import anyio
 from fastapi import FastAPI
-from sqlmodel import SQLModel
-from starlette.middleware.gzip import GZipMiddleware
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+from starlette.responses import Response
 from starlette.staticfiles import StaticFiles
-
-from app.database import engine
+from starlette.types import Message, Receive, Scope, Send
+
+from app.blog_registry import blog_registry
+from app.config import get_settings, reload_settings
+from app.database import (
+    QueryTrackingMiddleware,
+    async_engine,
+    engine,
+    init_db,
+)
+from app.http_cache import accepts_encoding
+from app.metrics import MetricsMiddleware, start_scrape_server
+from app.profiling import ProfilingMiddleware
 from app.routers import (
     admin_router,
     api_router,
+    metrics_router,
     public_router,
     seo_router,
     serving_router,
 )
+from app.services.catalog import catalog
+from app.services.counters import ctr_counters
+from app.services.embed import embed_scripts
+from app.services.event_sink import click_sink, impression_sink
+from app.services.retention import retention_job
+from app.services.rollup import backfill_hourly
+from app.static_assets import COMPRESSIBLE, ENCODINGS
 
 logging.basicConfig(level=logging.DEBUG)
+# aiosqlite logs every cursor operation at DEBUG, i.e. several lines per request
+logging.getLogger('aiosqlite').setLevel(logging.INFO)
+
+
+class _WeakETagGZipResponder(GZipResponder):
+    """GZipResponder that makes the ETag of the bodies it compresses weak."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async def send_weak_etag(message: Message) -> None:
+            # content_encoding_set: the app sent it encoded, so its ETag holds
+            if message['type'] == 'http.response.start' and not (
+                self.content_encoding_set
+            ):
+                headers = MutableHeaders(raw=message['headers'])
+                etag = headers.get('etag')
+                if etag and 'content-encoding' in headers and etag[:2] != 'W/':
+                    headers['ETag'] = f'W/{etag}'
+            await send(message)
+
+        await super().__call__(scope, receive, send_weak_etag)
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that honours Accept-Encoding q-values.
+
+    ``gzip;q=0`` is a refusal. Responses that already carry a Content-Encoding
+    (precompressed static siblings, pre-gzipped pages and fragments) pass
+    through untouched; anything else is compressed here and gets a weak ETag,
+    since the strong one names the uncompressed bytes.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        accept = Headers(scope=scope).get('accept-encoding', '')
+        if accepts_encoding(accept, 'gzip'):
+            responder = _WeakETagGZipResponder(
+                self.app, self.minimum_size, compresslevel=self.compresslevel
+            )
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+
+        async def send_single_vary(message: Message) -> None:
+            # The responders append Accept-Encoding even if the app set it
+            if message['type'] == 'http.response.start':
+                headers = MutableHeaders(raw=message['headers'])
+                vary = headers.get('vary')
+                if vary and ',' in vary:
+                    names = dict.fromkeys(v.strip() for v in vary.split(','))
+                    headers['Vary'] = ', '.join(names)
+            await send(message)
+
+        await responder(scope, receive, send_single_vary)
 
 
 class CachedStaticFiles(StaticFiles):
-    """Static files with Cache-Control tuned for unhashed CSS/JS vs images/fonts."""
+    """
+    Static files with Cache-Control tuned for unhashed CSS/JS vs images/fonts.
+
+    Text assets are served from the ``.br``/``.gz`` siblings written by
+    ``python -m app.static_assets`` when the client accepts that encoding, via
+    ``FileResponse`` (which uses the server's pathsend extension when offered).
+    Each sibling has its own ETag, derived from its own size and mtime. A
+    sibling older than its source is stale (the source was edited after the
+    last build) and is skipped. Without a usable sibling the original is sent
+    and ``SelectiveGZipMiddleware`` compresses it on the fly.
+    """
 
     _CACHE_CSS_JS = 'public, max-age=86400'  # 1d — main.css updates apply within a day
     _CACHE_FONT = 'public, max-age=604800'  # 7d
@@ -30,7 +122,11 @@ class CachedStaticFiles(StaticFiles):
     _CACHE_IMAGE = 'public, max-age=604800'
 
     async def get_response(self, path, scope):
-        resp = await super().get_response(path, scope)
+        resp = await self._precompressed_response(path, scope)
+        if resp is None:
+            resp = await super().get_response(path, scope)
+        if path.endswith(COMPRESSIBLE):
+            resp.headers['Vary'] = 'Accept-Encoding'
         if resp.status_code != 200:
             return resp
         ext = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
@@ -44,14 +140,83 @@ class CachedStaticFiles(StaticFiles):
             resp.headers['Cache-Control'] = self._CACHE_CSS_JS
         return resp
 
+    async def _precompressed_response(self, path, scope) -> Response | None:
+        if not path.endswith(COMPRESSIBLE):
+            return None
+        accept = Headers(scope=scope).get('accept-encoding', '')
+        source = None
+        for encoding, suffix in ENCODINGS:
+            if not accepts_encoding(accept, encoding):
+                continue
+            if source is None:
+                _, source = await anyio.to_thread.run_sync(self.lookup_path, path)
+                if source is None:
+                    return None
+            full_path, stat_result = await anyio.to_thread.run_sync(
+                self.lookup_path, path + suffix
+            )
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            if stat_result.st_mtime < source.st_mtime:
+                continue
+            resp = self.file_response(full_path, stat_result, scope)
+            resp.headers['Content-Encoding'] = encoding
+            resp.headers['Content-Type'] = (
+                mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            )
+            return resp
+        return None
+
+
+def _reload_settings_on_signal() -> None:
+    try:
+        reload_settings()
+    except Exception:
+        logging.exception('Settings reload failed; keeping the current settings')
+
+
+def _watch_sighup() -> bool:
+    """Reload settings on SIGHUP; False where signals can't be handled here."""
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGHUP, _reload_settings_on_signal
+        )
+    except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+        return False  # no SIGHUP (Windows) or not the main thread (tests)
+    return True
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle application startup and shutdown."""
     # Startup
-    SQLModel.metadata.create_all(engine)
+    init_db()
+    with Session(engine) as session:
+        backfill_hourly(session)
+    # Warm the serving caches through the engine the serving endpoints use
+    async with AsyncSession(async_engine) as async_session:
+        snapshot = await async_session.run_sync(catalog.load)
+        await async_session.run_sync(ctr_counters.seed)
+    embed_scripts.prerender(snapshot.zones)
+    blog_registry.load()
+    if get_settings().write_behind_enabled:
+        impression_sink.start(engine)
+        click_sink.start(engine)
+    retention_job.start(engine)
+    metrics_port = get_settings().metrics_port
+    scrape_server = start_scrape_server(metrics_port) if metrics_port else None
+    watching_sighup = _watch_sighup()
     yield
-    # Shutdown (if needed in future)
+    if watching_sighup:
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+    if scrape_server is not None:
+        scrape_server.shutdown()
+        scrape_server.server_close()
+    # Shutdown: drain buffered tracking rows
+    retention_job.stop()
+    impression_sink.stop()
+    click_sink.stop()
+    await async_engine.dispose()
 
 
 def create_app() -> FastAPI:
@@ -59,11 +224,18 @@ def create_app() -> FastAPI:
     app = FastAPI(lifespan=lifespan)
 
     # Middleware
-    app.add_middleware(GZipMiddleware, minimum_size=500)
+    # Precompressed /static siblings carry a Content-Encoding and pass through
+    app.add_middleware(SelectiveGZipMiddleware, minimum_size=500)
+
+    app.add_middleware(QueryTrackingMiddleware)
+    app.add_middleware(ProfilingMiddleware)
+    # Outermost, so the timings include compression
+    app.add_middleware(MetricsMiddleware)
 
     # Include routers
     app.include_router(seo_router)
     app.include_router(api_router)
+    app.include_router(metrics_router)
     app.include_router(admin_router)
     app.include_router(public_router)
     app.include_router(serving_router)
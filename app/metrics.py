@@ -0,0 +1,350 @@
+"""Process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms keep one value table per thread, written only
+by that thread, so recording is a dict update with no lock; a scrape sums the
+tables. Collected gauges call a function at scrape time instead (queue depths
+and the like).
+"""
+
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import math
+import threading
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+Labels = tuple[str, ...]
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+# Seconds; Prometheus client defaults, plus finer steps for in-memory paths
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names: Labels, values: Labels, extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Registry:
+    """The metrics exposed by ``render()``."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: '_Metric') -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f'Duplicate metric {metric.name}')
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Labels = (),
+        registry: Registry | None = REGISTRY,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._local = threading.local()
+        self._tables: list[dict] = []
+        self._tables_lock = threading.Lock()  # only taken once per thread
+        if registry is not None:
+            registry.register(self)
+
+    def _table(self) -> dict:
+        try:
+            return self._local.table
+        except AttributeError:
+            table = self._local.table = {}
+            with self._tables_lock:
+                self._tables.append(table)
+            return table
+
+    def _snapshots(self) -> list[dict]:
+        with self._tables_lock:
+            tables = list(self._tables)
+        return [table.copy() for table in tables]  # copy() holds the GIL
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A monotonically increasing value per label set."""
+
+    kind = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        table = self._table()
+        table[labels] = table.get(labels, 0.0) + amount
+
+    def values(self) -> dict[Labels, float]:
+        totals: dict[Labels, float] = {}
+        for table in self._snapshots():
+            for labels, value in table.items():
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def value(self, *labels: str) -> float:
+        return self.values().get(labels, 0.0)
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self.values().items()):
+            yield f'{self.name}{_labels(self.labels, labels)} {_number(value)}'
+
+
+class Gauge(Counter):
+    """A value that goes up and down (e.g. requests in flight)."""
+
+    kind = 'gauge'
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class CollectedGauge(_Metric):
+    """A gauge whose values are read from ``collect()`` at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], dict[Labels, float]],
+        labels: Labels = (),
+        registry: Registry | None = REGISTRY,
+    ):
+        super().__init__(name, help, labels, registry)
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self.collect().items()):
+            yield f'{self.name}{_labels(self.labels, labels)} {_number(value)}'
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative ``le`` buckets, with their sum."""
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        registry: Registry | None = REGISTRY,
+    ):
+        super().__init__(name, help, labels, registry)
+        self.buckets = (*sorted(buckets), math.inf)
+
+    def observe(self, value: float, *labels: str) -> None:
+        table = self._table()
+        counts = table.get(labels)
+        if counts is None:
+            counts = table[labels] = [0] * len(self.buckets) + [0.0]  # + sum
+        counts[bisect_left(self.buckets, value)] += 1  # first bound >= value
+        counts[-1] += value
+
+    def values(self) -> dict[Labels, list]:
+        """Label set -> per-bucket (non-cumulative) counts followed by the sum."""
+        totals: dict[Labels, list] = {}
+        for table in self._snapshots():
+            for labels, counts in table.items():
+                counts = list(counts)
+                total = totals.setdefault(labels, [0] * len(counts))
+                for i, c in enumerate(counts):
+                    total[i] += c
+        return totals
+
+    def samples(self) -> Iterable[str]:
+        for labels, counts in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts, strict=False):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield (
+                    f'{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}'
+                )
+            yield f'{self.name}_sum{_labels(self.labels, labels)} {_number(counts[-1])}'
+            yield f'{self.name}_count{_labels(self.labels, labels)} {cumulative}'
+
+
+# -------- Application metrics --------
+http_requests = Counter(
+    'http_requests_total',
+    'HTTP requests by method, route template and status.',
+    ('method', 'route', 'status'),
+)
+http_request_duration = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by method and route template.',
+    ('method', 'route'),
+)
+http_in_flight = Gauge('http_requests_in_flight', 'HTTP requests being served.')
+db_query_duration = Histogram(
+    'db_query_duration_seconds',
+    'Database statement execution time by engine and statement type.',
+    ('engine', 'operation'),
+)
+impressions = Counter('adserver_impressions_total', 'Impressions recorded.')
+clicks = Counter('adserver_clicks_total', 'Clicks recorded.')
+cache_lookups = Counter(
+    'adserver_cache_lookups_total',
+    'In-process cache lookups by cache and result (hit/miss).',
+    ('cache', 'result'),
+)
+
+
+def _sink_stats() -> dict[Labels, float]:
+    from app.services.event_sink import click_sink, impression_sink
+
+    return {
+        (name,): sink.stats()['queue_depth']
+        for name, sink in (('impressions', impression_sink), ('clicks', click_sink))
+    }
+
+
+CollectedGauge(
+    'adserver_write_behind_queue_depth',
+    'Tracking rows waiting in the write-behind buffers.',
+    _sink_stats,
+    ('sink',),
+)
+_started = time.time()
+CollectedGauge(
+    'process_start_time_seconds',
+    'Start time of the process since the epoch.',
+    lambda: {(): _started},
+)
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    """Count a lookup in the in-process cache named ``cache``."""
+    cache_lookups.inc(cache, 'hit' if hit else 'miss')
+
+
+def route_template(scope: Scope, root_path: str = '') -> str:
+    """
+    Return the matched route's path template (bounded label cardinality).
+
+    FastAPI routes leave themselves in ``scope['route']``; mounts (``/static``)
+    only extend ``root_path``. Anything else, such as 404s, is ``unmatched``.
+    """
+    route = scope.get('route')
+    if route is not None:
+        return getattr(route, 'path', 'unmatched')
+    mounted = scope.get('root_path', '')
+    if mounted != root_path and mounted.startswith(root_path):
+        return mounted[len(root_path) :] + '/{path}'
+    return 'unmatched'
+
+
+class MetricsMiddleware:
+    """Counts and times HTTP requests per route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        root_path = scope.get('root_path', '')
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec()
+            route = route_template(scope, root_path)
+            http_requests.inc(scope['method'], route, str(status))
+            http_request_duration.observe(elapsed, scope['method'], route)
+
+
+class _ScrapeHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass  # one line per scrape is noise
+
+
+def start_scrape_server(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """
+    Serve ``GET /metrics`` on a port of its own, from a daemon thread.
+
+    Meant for a port only the private network reaches (Fly's managed
+    Prometheus scrapes ``[metrics]`` over it), so it asks for no admin key.
+    Stop it with ``shutdown()``.
+    """
+    server = ThreadingHTTPServer((host, port), _ScrapeHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='metrics-scrape', daemon=True
+    ).start()
+    return server
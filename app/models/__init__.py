@@ -1,7 +1,7 @@
 """Database models package."""
 
 from app.models.ad import Ad
-from app.models.tracking import Click, Impression
+from app.models.tracking import AdStatsDaily, AdStatsHourly, Click, Impression
 from app.models.zone import Zone
 
-__all__ = ['Ad', 'Click', 'Impression', 'Zone']
+__all__ = ['Ad', 'AdStatsDaily', 'AdStatsHourly', 'Click', 'Impression', 'Zone']
@@ -1,6 +1,6 @@
 """Ad model."""
 
-from sqlmodel import Boolean, Column, Field, Relationship, SQLModel
+from sqlmodel import Boolean, Column, Field, Index, Relationship, SQLModel
 
 from app.models.zone import Zone
 
@@ -8,6 +8,8 @@ from app.models.zone import Zone
 class Ad(SQLModel, table=True):
     """Advertisement entity."""
 
+    __table_args__ = (Index('ix_ad_zone_id_is_active', 'zone_id', 'is_active'),)
+
     id: int | None = Field(default=None, primary_key=True)
     zone_id: int = Field(foreign_key='zone.id')
     html: str
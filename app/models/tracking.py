@@ -1,13 +1,15 @@
 """Tracking models for impressions and clicks."""
 
-from datetime import UTC, datetime
+from datetime import UTC, date, datetime
 
-from sqlmodel import Field, SQLModel
+from sqlmodel import Field, Index, SQLModel
 
 
 class Impression(SQLModel, table=True):
     """Ad impression tracking."""
 
+    __table_args__ = (Index('ix_impression_timestamp_ad_id', 'timestamp', 'ad_id'),)
+
     id: int | None = Field(default=None, primary_key=True)
     ad_id: int = Field(foreign_key='ad.id')
     timestamp: datetime = Field(default_factory=lambda: datetime.now(UTC))
@@ -16,6 +18,33 @@ class Impression(SQLModel, table=True):
 class Click(SQLModel, table=True):
     """Ad click tracking."""
 
+    __table_args__ = (Index('ix_click_timestamp_ad_id', 'timestamp', 'ad_id'),)
+
     id: int | None = Field(default=None, primary_key=True)
     ad_id: int = Field(foreign_key='ad.id')
     timestamp: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+
+class AdStatsHourly(SQLModel, table=True):
+    """Per-ad impression/click totals per UTC hour, maintained on write."""
+
+    __tablename__ = 'ad_stats_hourly'  # type: ignore
+    __table_args__ = (Index('ix_ad_stats_hourly_hour', 'hour'),)
+
+    # No FK: rollups outlive the raw rows and may outlive the ad itself
+    ad_id: int = Field(primary_key=True)
+    hour: datetime = Field(primary_key=True)  # start of the hour, UTC
+    impressions: int = 0
+    clicks: int = 0
+
+
+class AdStatsDaily(SQLModel, table=True):
+    """Per-ad totals per UTC day for hours compacted out of the hourly rollup."""
+
+    __tablename__ = 'ad_stats_daily'  # type: ignore
+    __table_args__ = (Index('ix_ad_stats_daily_day', 'day'),)
+
+    ad_id: int = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    impressions: int = 0
+    clicks: int = 0
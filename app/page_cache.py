@@ -0,0 +1,186 @@
+"""In-memory cache of fully rendered public pages."""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import UTC, datetime
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.templating import Jinja2Templates
+from jinja2 import meta
+
+from app import metrics
+from app.config import Settings, get_settings
+from app.http_cache import cached_response, strong_etag
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    """A rendered page with its validators."""
+
+    body: bytes
+    gzipped: bytes | None
+    etag: str
+    last_modified: float
+    settings: Settings  # snapshot rendered with (GA id etc.)
+    signature: tuple[float, ...]  # template mtimes rendered with
+
+
+class PageCache:
+    """
+    LRU of rendered template pages, keyed by URL path, template and context.
+
+    The query string and Host are left out of the key: clients choose them
+    freely, so keying on them would let tracking parameters or spoofed hosts
+    fill the cache with copies of one page. Templates must therefore not
+    render them (the blog's ``@id`` prints its canonical URL instead). The
+    context is part of the key so date-dependent values such as ``year`` or
+    ``published`` produce a new entry when they change. Entries are dropped
+    when any template in the page's extends/include chain changes on disk
+    (mtimes are re-checked at most once per ``check_interval`` seconds) or
+    when the settings are reloaded.
+
+    The ETag hashes the rendered body and Last-Modified is the newest template
+    mtime; pages rendered with ``dated=True`` never report a Last-Modified
+    before the start of the current UTC day, so If-Modified-Since can't hide a
+    date change.
+    """
+
+    def __init__(
+        self,
+        templates: Jinja2Templates,
+        max_entries: int = 512,
+        check_interval: float = 1.0,
+        cache_control: str = 'no-cache',
+    ):
+        self.templates = templates
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self.cache_control = cache_control
+        self._pages: OrderedDict[tuple[str, str, str], CachedPage] = OrderedDict()
+        self._lock = threading.Lock()
+        self._files: dict[str, tuple[str, ...]] = {}  # template -> chain filenames
+        self._signatures: dict[str, tuple[float, tuple[float, ...]]] = {}
+        self.hits = self.misses = 0
+
+    def _template_files(self, name: str) -> tuple[str, ...]:
+        """Filenames of ``name`` and every template it extends or includes."""
+        files = self._files.get(name)
+        if files is None:
+            env = self.templates.env
+            seen: dict[str, str] = {}
+            pending = [name]
+            while pending:
+                current = pending.pop()
+                if current in seen:
+                    continue
+                source, filename, _ = env.loader.get_source(env, current)  # type: ignore
+                seen[current] = filename or ''
+                refs = meta.find_referenced_templates(env.parse(source))
+                pending.extend(ref for ref in refs if ref is not None)
+            files = self._files[name] = tuple(seen.values())
+        return files
+
+    def _signature(self, name: str) -> tuple[float, ...]:
+        now = time.monotonic()
+        checked = self._signatures.get(name)
+        if checked is not None and now - checked[0] < self.check_interval:
+            return checked[1]
+        signature = tuple(os.path.getmtime(f) for f in self._template_files(name))
+        if checked is not None and signature != checked[1]:
+            # The edit may have added or removed an extends/include
+            self._files.pop(name, None)
+            signature = tuple(os.path.getmtime(f) for f in self._template_files(name))
+        self._signatures[name] = (now, signature)
+        return signature
+
+    def render(
+        self,
+        request: Request,
+        name: str,
+        context: dict[str, Any] | None = None,
+        dated: bool = False,
+    ) -> Response:
+        """
+        Serve ``name`` rendered with ``context`` from the cache, rendering on a miss.
+
+        Args:
+            request: Incoming request (its path is part of the key; validators
+                are checked). Templates must not render the query string or
+                Host, which the key leaves out.
+            name: Template name.
+            context: Template context; must be JSON-serialisable (``str`` fallback).
+            dated: The context holds values derived from today's date.
+
+        Returns:
+            The page (gzip-encoded when accepted) or a 304.
+        """
+        context = context or {}
+        key = (request.url.path, name, json.dumps(context, sort_keys=True, default=str))
+        settings = get_settings()
+        signature = self._signature(name)
+
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+        if page is None or page.signature != signature or page.settings is not settings:
+            self.misses += 1
+            metrics.cache_lookup('page', False)
+            page = self._render(request, name, context, settings, signature)
+            with self._lock:
+                self._pages[key] = page
+                self._pages.move_to_end(key)
+                while len(self._pages) > self.max_entries:
+                    self._pages.popitem(last=False)
+        else:
+            self.hits += 1
+            metrics.cache_lookup('page', True)
+
+        last_modified = page.last_modified
+        if dated:
+            today = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+            last_modified = max(last_modified, today.timestamp())
+        return cached_response(
+            request,
+            page.body,
+            media_type='text/html; charset=utf-8',
+            etag=page.etag,
+            cache_control=self.cache_control,
+            last_modified=last_modified,
+            gzipped=page.gzipped,
+        )
+
+    def _render(
+        self,
+        request: Request,
+        name: str,
+        context: dict[str, Any],
+        settings: Settings,
+        signature: tuple[float, ...],
+    ) -> CachedPage:
+        template = self.templates.env.get_template(name)
+        html = template.render({**context, 'request': request, 'settings': settings})
+        body = html.encode()
+        gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+        return CachedPage(
+            body=body,
+            gzipped=gzipped if len(gzipped) < len(body) else None,
+            etag=strong_etag(body),
+            last_modified=max(signature),
+            settings=settings,
+            signature=signature,
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+        self._signatures.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {'entries': len(self._pages), 'hits': self.hits, 'misses': self.misses}
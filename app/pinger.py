@@ -0,0 +1,331 @@
+"""Notify search engines about changed pages after a deploy.
+
+The URL list comes from the public router's GET routes, with path parameters
+expanded from ``BANNER_SIZES`` and the blog registry. Every page is fetched
+concurrently from the live site and hashed (its ETag, else its body); only
+URLs whose hash differs from the previous run's, kept in a JSON state file,
+are submitted to IndexNow, in batches of at most ``INDEXNOW_BATCH_LIMIT``
+URLs. When anything changed, the sitemap pings are sent alongside. All
+requests use timeouts and are retried on network errors, 429 and 5xx.
+
+Usage:
+    uv run python -m app.pinger [--force] [--dry-run] [--base-url URL]
+"""
+
+import argparse
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+import json
+import logging
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from app.http_cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+HOST = 'ad-server.fly.dev'
+INDEXNOW_ENDPOINT = 'https://api.indexnow.org/IndexNow'
+INDEXNOW_BATCH_LIMIT = 10_000  # URLs per IndexNow POST
+SITEMAP_PING_ENDPOINTS = {
+    'google': 'https://www.google.com/ping?sitemap={sitemap}',
+    'bing': 'https://www.bing.com/ping?sitemap={sitemap}',
+}
+STATE_PATH = '.ping_state.json'
+
+# Public GET routes that are not meant to be indexed
+EXCLUDED_PATHS = ('/publisher-test',)
+
+
+@dataclass(frozen=True)
+class PingResult:
+    """Outcome of one HTTP request (after retries)."""
+
+    target: str
+    status: int | None
+    error: str | None = None
+    body: bytes = b''
+    etag: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status is not None and 200 <= self.status < 300
+
+
+@dataclass
+class PingReport:
+    """What a pinger run did."""
+
+    checked: int = 0
+    fetch_failed: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    submitted: list[str] = field(default_factory=list)
+    responses: dict[str, int | str] = field(default_factory=dict)
+
+
+def _path_values() -> dict[str, list[str]]:
+    """Known values of the public routes' path parameters."""
+    from app.blog_registry import blog_registry
+    from app.routers.public import BANNER_SIZES
+
+    return {
+        'size_slug': list(BANNER_SIZES),
+        'slug': [post.slug for post in blog_registry.posts()],
+    }
+
+
+def site_paths(routes: Iterable | None = None) -> list[str]:
+    """
+    Return the indexable paths of the public site.
+
+    Args:
+        routes: Routes to read (defaults to the public router's).
+
+    Returns:
+        GET paths included in the schema, with path parameters expanded; routes
+        with parameters that have no known values are skipped.
+    """
+    if routes is None:
+        from app.routers.public import router
+
+        routes = router.routes
+    values = _path_values()
+    paths: list[str] = []
+    for route in routes:
+        if not getattr(route, 'include_in_schema', False):
+            continue
+        if 'GET' not in getattr(route, 'methods', ()):
+            continue
+        if route.path in EXCLUDED_PATHS:
+            continue
+        params = route.param_convertors
+        if not params:
+            paths.append(route.path)
+            continue
+        if len(params) != 1 or next(iter(params)) not in values:
+            continue
+        (name,) = params
+        paths.extend(route.path.replace(f'{{{name}}}', v) for v in values[name])
+    return paths
+
+
+def send(
+    url: str,
+    data: bytes | None = None,
+    headers: dict[str, str] | None = None,
+    timeout: float = 10.0,
+    retries: int = 2,
+    backoff: float = 0.5,
+) -> PingResult:
+    """
+    GET ``url`` (or POST ``data``), retrying network errors, 429 and 5xx.
+
+    Args:
+        url: Request URL.
+        data: POST body; None for a GET.
+        headers: Request headers.
+        timeout: Per-attempt timeout in seconds.
+        retries: Extra attempts after the first.
+        backoff: Delay before the first retry; doubled for each further one.
+
+    Returns:
+        The last attempt's result.
+    """
+    method = 'GET' if data is None else 'POST'
+    result = PingResult(url, None, 'not attempted')
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        request = urllib.request.Request(
+            url, data=data, headers=headers or {}, method=method
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as resp:
+                return PingResult(
+                    url, resp.status, body=resp.read(), etag=resp.headers.get('ETag')
+                )
+        except urllib.error.HTTPError as e:
+            result = PingResult(url, e.code, f'{e.code} {e.reason}')
+            if e.code != 429 and e.code < 500:
+                return result
+        except (urllib.error.URLError, TimeoutError, OSError) as e:
+            result = PingResult(url, None, str(getattr(e, 'reason', e)))
+    return result
+
+
+def page_hash(result: PingResult) -> str:
+    """Fingerprint of a fetched page: its ETag, else a hash of the body."""
+    return result.etag or f'"{content_hash(result.body)}"'
+
+
+def batches(items: Sequence[str], size: int) -> list[list[str]]:
+    """Split ``items`` into lists of at most ``size``."""
+    return [list(items[i : i + size]) for i in range(0, len(items), size)]
+
+
+def load_state(path: str) -> dict[str, str]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('hashes', {})
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        logger.warning('Ignoring unreadable ping state %s', path)
+        return {}
+
+
+def save_state(path: str, hashes: dict[str, str]) -> None:
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'hashes': hashes}, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def run(
+    host: str = HOST,
+    base_url: str | None = None,
+    paths: Sequence[str] | None = None,
+    key: str | None = None,
+    state_path: str = STATE_PATH,
+    indexnow_endpoint: str = INDEXNOW_ENDPOINT,
+    sitemap_endpoints: dict[str, str] | None = None,
+    batch_size: int = INDEXNOW_BATCH_LIMIT,
+    workers: int = 8,
+    timeout: float = 10.0,
+    retries: int = 2,
+    backoff: float = 0.5,
+    force: bool = False,
+    dry_run: bool = False,
+) -> PingReport:
+    """
+    Hash every page and submit the changed ones.
+
+    Args:
+        host: Public host name; submitted URLs are ``https://<host><path>``.
+        base_url: Where pages are fetched from (defaults to ``https://<host>``).
+        paths: Paths to check (defaults to ``site_paths()``).
+        key: IndexNow key (defaults to the one served by the SEO router).
+        state_path: JSON file with the hashes of the last successful submission.
+        indexnow_endpoint: IndexNow API URL.
+        sitemap_endpoints: Name -> sitemap ping URL template with ``{sitemap}``.
+        batch_size: Maximum URLs per IndexNow request.
+        workers: Concurrent requests.
+        timeout: Per-request timeout in seconds.
+        retries: Retries per request.
+        backoff: Initial retry delay in seconds.
+        force: Submit every URL, changed or not.
+        dry_run: Only report what would be submitted.
+
+    Returns:
+        A ``PingReport``. The state file is only updated for URLs whose IndexNow
+        batch was accepted.
+    """
+    if key is None:
+        from app.routers.seo import INDEXNOW_KEY
+
+        key = INDEXNOW_KEY
+    if sitemap_endpoints is None:
+        sitemap_endpoints = SITEMAP_PING_ENDPOINTS
+    origin = f'https://{host}'
+    base_url = (base_url or origin).rstrip('/')
+    paths = site_paths() if paths is None else paths
+    report = PingReport(checked=len(paths))
+    previous = load_state(state_path)
+
+    def get(path: str) -> PingResult:
+        return send(base_url + path, timeout=timeout, retries=retries, backoff=backoff)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fetched = dict(zip(paths, pool.map(get, paths), strict=True))
+        hashes = {}
+        for path, result in fetched.items():
+            if not result.ok:
+                report.fetch_failed.append(path)
+                continue
+            hashes[origin + path] = page_hash(result)
+        report.changed = [
+            url for url, h in hashes.items() if force or previous.get(url) != h
+        ]
+        if dry_run or not report.changed:
+            return report
+
+        def submit(urls: list[str]) -> PingResult:
+            payload = {
+                'host': host,
+                'key': key,
+                'keyLocation': f'{origin}/{key}.txt',
+                'urlList': urls,
+            }
+            return send(
+                indexnow_endpoint,
+                data=json.dumps(payload).encode(),
+                headers={'Content-Type': 'application/json; charset=utf-8'},
+                timeout=timeout,
+                retries=retries,
+                backoff=backoff,
+            )
+
+        sitemap = urllib.parse.quote(f'{origin}/sitemap.xml', safe='')
+        pings = {
+            name: pool.submit(
+                send,
+                template.format(sitemap=sitemap),
+                timeout=timeout,
+                retries=retries,
+                backoff=backoff,
+            )
+            for name, template in sitemap_endpoints.items()
+        }
+        chunks = batches(report.changed, batch_size)
+        submissions = [pool.submit(submit, chunk) for chunk in chunks]
+
+        accepted = dict(previous)
+        for i, (chunk, future) in enumerate(zip(chunks, submissions, strict=True)):
+            result = future.result()
+            report.responses[f'indexnow[{i}]'] = result.status or result.error or ''
+            if result.ok:
+                report.submitted.extend(chunk)
+                accepted.update((url, hashes[url]) for url in chunk)
+        for name, future in pings.items():
+            result = future.result()
+            report.responses[name] = result.status or result.error or ''
+
+    if report.submitted:
+        save_state(state_path, accepted)
+    return report
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='Submit changed pages for indexing.')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument(
+        '--base-url', help='fetch pages from here instead of https://HOST'
+    )
+    parser.add_argument('--state', default=STATE_PATH)
+    parser.add_argument('--force', action='store_true', help='submit every URL')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument(
+        '--no-sitemap-ping', action='store_true', help='only submit to IndexNow'
+    )
+    args = parser.parse_args(argv)
+
+    # Only the route table is needed; don't require a production DATABASE_URL
+    os.environ.setdefault('APP_ENV', 'development')
+    logging.basicConfig(level=logging.INFO)
+    report = run(
+        host=args.host,
+        base_url=args.base_url,
+        state_path=args.state,
+        sitemap_endpoints={} if args.no_sitemap_ping else None,
+        force=args.force,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(asdict(report), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+"""Sampling CPU profiler for live requests, switched on from the admin API.
+
+A profile is a ``ProfileSession``: either one request (sent with
+``X-Profile: 1`` or ``?__profile=1`` plus a valid ``X-ADMIN-KEY``) or a share of
+the requests to one route for a time window (``profiler.start()``). While a
+selected request is in flight, a background thread samples the Python stacks
+every ``interval`` seconds via ``sys._current_frames()``:
+
+- from the event loop thread, only while the request's own task is running;
+- from busy worker threads (sync endpoints, ``run_sync``), which can't be tied
+  to a task, so with concurrent selected requests each gets those samples.
+
+Samples are aggregated into collapsed stacks (flamegraph.pl / speedscope
+input) or a ``pstats`` file whose times are sample counts times the interval.
+When nothing is being profiled the middleware only checks a flag, the query
+string and the request headers, and no sampler thread runs.
+"""
+
+import asyncio
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+import itertools
+import marshal
+import random
+import sys
+import threading
+import time
+
+from starlette.routing import Match, Mount
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import get_settings
+
+Frame = tuple[str, int, str]  # (filename, first line, function), as in pstats
+Stack = tuple[Frame, ...]  # outermost call first
+
+MAX_DEPTH = 128
+
+# Innermost frames of a thread that is waiting, not working
+_IDLE_FILES = (
+    'threading.py',
+    'queue.py',
+    'selectors.py',
+    'concurrent/futures/thread.py',
+)
+
+
+@dataclass
+class ProfileSession:
+    """Aggregated samples of the requests selected by one profiling request."""
+
+    id: int
+    route: str | None  # route template or path; None for a single request
+    rate: float
+    interval: float
+    until: float  # time.time() after which no new requests are selected
+    single: bool = False
+    requests: int = 0
+    samples: Counter = field(default_factory=Counter)
+    started_at: float = field(default_factory=time.time)
+    stopped: bool = False
+
+    @property
+    def active(self) -> bool:
+        return not self.stopped and time.time() < self.until
+
+    def summary(self) -> dict:
+        return {
+            'id': self.id,
+            'route': self.route,
+            'rate': self.rate,
+            'interval_ms': self.interval * 1000,
+            'active': self.active,
+            'requests': self.requests,
+            'samples': sum(self.samples.values()),
+            'started_at': self.started_at,
+        }
+
+    def collapsed(self) -> str:
+        """Stacks as ``frame;frame;frame count`` lines, outermost frame first."""
+        lines = []
+        for stack, count in self.samples.most_common():
+            frames = ';'.join(
+                f'{func} ({filename}:{line})' for filename, line, func in stack
+            )
+            lines.append(f'{frames} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def pstats(self) -> bytes:
+        """Samples as a marshalled ``pstats`` table (load with ``pstats.Stats``)."""
+        dt = self.interval
+        stats: dict[Frame, list] = {}
+        for stack, count in self.samples.items():
+            seen: set[Frame] = set()
+            for i, func in enumerate(stack):
+                entry = stats.setdefault(func, [0, 0, 0.0, 0.0, {}])
+                leaf = i == len(stack) - 1
+                if func not in seen:  # recursion counts once per sample
+                    seen.add(func)
+                    entry[0] += count
+                    entry[1] += count
+                    entry[3] += count * dt
+                if leaf:
+                    entry[2] += count * dt
+                if i:
+                    caller = entry[4].setdefault(stack[i - 1], [0, 0, 0.0, 0.0])
+                    caller[0] += count
+                    caller[1] += count
+                    caller[2] += count * dt if leaf else 0.0
+                    caller[3] += count * dt
+        table = {
+            func: (cc, nc, tt, ct, {k: tuple(v) for k, v in callers.items()})
+            for func, (cc, nc, tt, ct, callers) in stats.items()
+        }
+        return marshal.dumps(table)
+
+
+@dataclass
+class TrackedRequest:
+    """A selected request in flight."""
+
+    sessions: list[ProfileSession]
+    loop_thread: int
+    loop: asyncio.AbstractEventLoop
+    task: asyncio.Task | None
+    samples: Counter = field(default_factory=Counter)
+
+
+def _stack(frame) -> Stack:
+    stack = []
+    while frame is not None and len(stack) < MAX_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _idle(frame) -> bool:
+    return frame.f_code.co_filename.endswith(_IDLE_FILES)
+
+
+class Profiler:
+    """Profile sessions, the in-flight requests they selected and the sampler."""
+
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self.sessions: OrderedDict[int, ProfileSession] = OrderedDict()
+        self.enabled = False  # a windowed session may be active
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._tracked: list[TrackedRequest] = []
+        self._sampler: threading.Thread | None = None
+
+    def _add(self, session: ProfileSession) -> ProfileSession:
+        with self._lock:
+            self.sessions[session.id] = session
+            while len(self.sessions) > self.keep:
+                self.sessions.popitem(last=False)
+        return session
+
+    def start(
+        self, route: str, rate: float = 1.0, seconds: float = 60.0, interval_ms=5.0
+    ) -> ProfileSession:
+        """
+        Sample ``rate`` of the requests to ``route`` for ``seconds``.
+
+        Args:
+            route: Route template (``/tools/banner-preview-{size_slug}.html``) or
+                exact path.
+            rate: Share of matching requests to profile (0-1].
+            seconds: Window length.
+            interval_ms: Sampling interval.
+
+        Returns:
+            The new session; its report grows until the window closes.
+        """
+        session = self._add(
+            ProfileSession(
+                id=next(self._ids),
+                route=route,
+                rate=rate,
+                interval=interval_ms / 1000,
+                until=time.time() + seconds,
+            )
+        )
+        self.enabled = True
+        return session
+
+    def stop(self, session_id: int) -> ProfileSession | None:
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.stopped = True
+        self.enabled = any(s.active for s in self.sessions.values() if not s.single)
+        return session
+
+    def select(self, scope: Scope) -> list[ProfileSession]:
+        """Sessions that want this request, drawn with their ``rate``."""
+        selected = []
+        if _wants_single(scope):
+            selected.append(
+                self._add(
+                    ProfileSession(
+                        id=next(self._ids),
+                        route=None,
+                        rate=1.0,
+                        interval=0.001,
+                        until=float('inf'),
+                        single=True,
+                    )
+                )
+            )
+        if self.enabled:
+            windows = [s for s in self.sessions.values() if s.active and not s.single]
+            self.enabled = bool(windows)
+            template = None
+            for session in windows:
+                if session.route != scope['path']:
+                    if template is None:
+                        template = resolve_route(scope)
+                    if session.route != template:
+                        continue
+                if random.random() < session.rate:
+                    selected.append(session)
+        return selected
+
+    def track(self, sessions: list[ProfileSession]) -> TrackedRequest:
+        """
+        Start sampling the current request for ``sessions``.
+
+        Call it from the request's task; pass the result to ``untrack()`` when
+        the request is done.
+        """
+        tracked = TrackedRequest(
+            sessions=sessions,
+            loop_thread=threading.get_ident(),
+            loop=asyncio.get_running_loop(),
+            task=asyncio.current_task(),
+        )
+        with self._lock:
+            self._tracked.append(tracked)
+            if self._sampler is None:
+                self._sampler = threading.Thread(
+                    target=self._sample, name='profiler', daemon=True
+                )
+                self._sampler.start()
+        return tracked
+
+    def untrack(self, tracked: TrackedRequest) -> None:
+        """Stop sampling ``tracked`` and add its samples to its sessions."""
+        with self._lock:
+            self._tracked.remove(tracked)
+        for session in tracked.sessions:
+            session.requests += 1
+            session.samples.update(tracked.samples)
+
+    def _sample(self) -> None:
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                tracked = list(self._tracked)
+                if not tracked:
+                    self._sampler = None
+                    return
+            frames = sys._current_frames()
+            workers = [
+                _stack(frame)
+                for ident, frame in frames.items()
+                if ident != me
+                and ident not in {t.loop_thread for t in tracked}
+                and not _idle(frame)
+            ]
+            for t in tracked:
+                loop_frame = frames.get(t.loop_thread)
+                if (
+                    loop_frame is not None
+                    and not _idle(loop_frame)
+                    and asyncio.current_task(t.loop) is t.task
+                ):
+                    t.samples[_stack(loop_frame)] += 1
+                for stack in workers:
+                    t.samples[stack] += 1
+            time.sleep(min(s.interval for t in tracked for s in t.sessions))
+
+
+profiler = Profiler()
+
+
+def resolve_route(scope: Scope) -> str:
+    """
+    Return the route template ``scope`` will be routed to, before routing runs.
+
+    Matches the routes of the application Starlette put in ``scope['app']``,
+    like its router does; templates follow ``app.metrics.route_template``.
+    """
+    partial = None
+    for route in getattr(getattr(scope.get('app'), 'router', None), 'routes', ()):
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            partial = route
+            break
+        if match is Match.PARTIAL and partial is None:
+            partial = route
+    if partial is None:
+        return 'unmatched'
+    if isinstance(partial, Mount):
+        return partial.path + '/{path}'
+    return getattr(partial, 'path', 'unmatched')
+
+
+def _wants_single(scope: Scope) -> bool:
+    """True for ``?__profile=1`` / ``X-Profile: 1`` with a valid admin key."""
+    query = scope.get('query_string', b'')
+    flagged = b'__profile=1' in query
+    key = None
+    for name, value in scope['headers']:
+        if name == b'x-profile':
+            flagged = flagged or value == b'1'
+        elif name == b'x-admin-key':
+            key = value.decode('latin-1')
+    if not flagged:
+        return False
+    expected = get_settings().admin_key
+    return not expected or key == expected
+
+
+class ProfilingMiddleware:
+    """Samples the requests selected by the profiler; a pass-through otherwise."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not (
+            profiler.enabled
+            or b'__profile' in scope.get('query_string', b'')
+            or any(name == b'x-profile' for name, _ in scope['headers'])
+        ):
+            await self.app(scope, receive, send)
+            return
+        sessions = profiler.select(scope)
+        if not sessions:
+            await self.app(scope, receive, send)
+            return
+
+        single = next((s for s in sessions if s.single), None)
+
+        async def send_wrapper(message) -> None:
+            if single is not None and message['type'] == 'http.response.start':
+                headers = list(message.get('headers', []))
+                headers.append((b'x-profile-id', str(single.id).encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        tracked = profiler.track(sessions)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.untrack(tracked)
+            if single is not None:
+                single.stopped = True
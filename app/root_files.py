@@ -0,0 +1,102 @@
+"""Site-root files (ads.txt, robots.txt, sitemap.xml) served from memory."""
+
+from dataclasses import dataclass
+import gzip
+import logging
+import os
+import time
+
+from fastapi import Request, Response
+
+from app.http_cache import cached_response, strong_etag
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FileContent:
+    """One loaded version of a root file."""
+
+    body: bytes
+    gzipped: bytes | None
+    etag: str
+    mtime: float
+
+
+class RootFile:
+    """
+    A small file read into memory once and reloaded when its mtime changes.
+
+    The mtime is re-checked at most once per ``check_interval`` seconds, so
+    crawlers polling the file cost a dict lookup and, when they send
+    validators, an empty 304.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        media_type: str,
+        cache_control: str = 'public, max-age=3600',
+        check_interval: float = 1.0,
+    ):
+        self.path = path
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.check_interval = check_interval
+        self._content: FileContent | None = None
+        self._checked_at = 0.0
+
+    def _load(self, mtime: float) -> FileContent:
+        with open(self.path, 'rb') as f:
+            body = f.read()
+        gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        logger.info('Loaded %s (%d bytes)', self.path, len(body))
+        return FileContent(
+            body=body,
+            gzipped=gzipped if len(gzipped) < len(body) else None,
+            etag=strong_etag(body),
+            mtime=mtime,
+        )
+
+    def content(self) -> FileContent | None:
+        """Return the current content, or None if the file does not exist."""
+        content = self._content
+        now = time.monotonic()
+        if content is not None and now - self._checked_at < self.check_interval:
+            return content
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if content is None or content.mtime != mtime:
+                content = self._content = self._load(mtime)
+        except OSError:
+            content = self._content = None
+        self._checked_at = now
+        return content
+
+    def response(self, request: Request) -> Response:
+        """
+        Serve the file with ETag/Last-Modified, gzip when accepted, or a 304.
+
+        Args:
+            request: Incoming request (for its validators and Accept-Encoding).
+
+        Returns:
+            The file, a 304, or a 404 if the file is missing.
+        """
+        content = self.content()
+        if content is None:
+            return Response(status_code=404)
+        return cached_response(
+            request,
+            content.body,
+            media_type=self.media_type,
+            etag=content.etag,
+            cache_control=self.cache_control,
+            last_modified=content.mtime,
+            gzipped=content.gzipped,
+        )
+
+
+ads_txt = RootFile('ads.txt', 'text/plain; charset=utf-8')
+robots_txt = RootFile('robots.txt', 'text/plain; charset=utf-8')
+sitemap_xml = RootFile('sitemap.xml', 'application/xml; charset=utf-8')
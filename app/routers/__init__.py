@@ -2,6 +2,7 @@
 
 from app.routers.admin import router as admin_router
 from app.routers.api import router as api_router
+from app.routers.metrics import router as metrics_router
 from app.routers.public import router as public_router
 from app.routers.seo import router as seo_router
 from app.routers.serving import router as serving_router
@@ -9,6 +10,7 @@ from app.routers.serving import router as serving_router
 __all__ = [
     'admin_router',
     'api_router',
+    'metrics_router',
     'public_router',
     'seo_router',
     'serving_router',
@@ -4,12 +4,17 @@ import logging
 import os
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from sqlmodel import select
 
+from app.config import reload_settings
+from app.database import query_budget
 from app.dependencies import SessionDep, verify_admin_key
 from app.models import Ad, Zone
+from app.profiling import profiler
 from app.services.analytics import calculate_ctr_data
+from app.services.catalog import catalog
+from app.services.event_sink import click_sink, impression_sink
 from app.template_utils import create_templates
 
 router = APIRouter(prefix='/admin', tags=['Admin'])
@@ -29,6 +34,7 @@ def admin_home(request: Request):
     response_class=HTMLResponse,
     dependencies=[Depends(verify_admin_key)],
 )
+@query_budget(2)
 def admin_analytics(
     request: Request,
     session: SessionDep,
@@ -71,6 +77,7 @@ def admin_zones_create(
     z = Zone(name=name, width=width, height=height)
     session.add(z)
     session.commit()
+    catalog.invalidate()
     return RedirectResponse(url='/admin/zones', status_code=303)
 
 
@@ -82,6 +89,7 @@ def admin_zones_delete(zone_id: int, session: SessionDep):
         raise HTTPException(status_code=404, detail='Zone not found')
     session.delete(z)
     session.commit()
+    catalog.invalidate()
     return RedirectResponse(url='/admin/zones', status_code=303)
 
 
@@ -137,6 +145,7 @@ def admin_ads_create(
     a = Ad(zone_id=zone_id, html=html, url=url, weight=weight)
     session.add(a)
     session.commit()
+    catalog.invalidate()
     return RedirectResponse(url='/admin/ads', status_code=303)
 
 
@@ -148,6 +157,7 @@ def admin_ads_delete(ad_id: int, session: SessionDep):
         raise HTTPException(status_code=404, detail='Ad not found')
     session.delete(a)
     session.commit()
+    catalog.invalidate()
     return RedirectResponse(url='/admin/ads', status_code=303)
 
 
@@ -160,6 +170,7 @@ def admin_ads_disable(ad_id: int, session: SessionDep):
     ad.is_active = False
     session.add(ad)
     session.commit()
+    catalog.invalidate()
     return RedirectResponse(url='/admin/analytics', status_code=303)
 
 
@@ -172,6 +183,7 @@ def admin_ads_enable(ad_id: int, session: SessionDep):
     ad.is_active = True
     session.add(ad)
     session.commit()
+    catalog.invalidate()
     return RedirectResponse(url='/admin/analytics', status_code=303)
 
 
@@ -189,6 +201,71 @@ def get_region(request: Request):
     }
 
 
+@router.get('/debug/tracking', dependencies=[Depends(verify_admin_key)])
+def debug_tracking():
+    """Debug endpoint with write-behind queue depth and flush latency."""
+    return {'impressions': impression_sink.stats(), 'clicks': click_sink.stats()}
+
+
+@router.post('/settings/reload', dependencies=[Depends(verify_admin_key)])
+def settings_reload():
+    """Re-read the environment and .env (e.g. after rotating ADMIN_KEY)."""
+    try:
+        reload_settings()
+    except Exception as e:
+        logging.exception('Error in /admin/settings/reload')
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    return {'reloaded': True}
+
+
+# -------- Profiling --------
+@router.post('/profiling', dependencies=[Depends(verify_admin_key)])
+def profiling_start(
+    route: str = Query(..., description='Route template or exact path'),
+    rate: float = Query(1.0, gt=0, le=1),
+    seconds: float = Query(60.0, gt=0, le=3600),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+):
+    """Sample ``rate`` of the requests to ``route`` for ``seconds``."""
+    return profiler.start(route, rate, seconds, interval_ms).summary()
+
+
+@router.get('/profiling', dependencies=[Depends(verify_admin_key)])
+def profiling_list():
+    """Recent profiles, including single-request ones (``X-Profile: 1``)."""
+    return [session.summary() for session in reversed(profiler.sessions.values())]
+
+
+@router.post('/profiling/{session_id}/stop', dependencies=[Depends(verify_admin_key)])
+def profiling_stop(session_id: int):
+    """Stop selecting requests for a windowed profile."""
+    session = profiler.stop(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail='Profile not found')
+    return session.summary()
+
+
+@router.get('/profiling/{session_id}/report', dependencies=[Depends(verify_admin_key)])
+def profiling_report(
+    session_id: int,
+    format: str = Query('collapsed', pattern='^(collapsed|pstats)$'),
+):
+    """Download a profile as collapsed stacks (flamegraphs) or a pstats file."""
+    session = profiler.sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail='Profile not found')
+    if format == 'pstats':
+        body, media_type = session.pstats(), 'application/octet-stream'
+    else:
+        body, media_type = session.collapsed().encode(), 'text/plain; charset=utf-8'
+    filename = f'profile-{session_id}.{"prof" if format == "pstats" else "folded"}'
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get('/debug/db')
 def debug_db():
     """Debug endpoint to check database configuration."""
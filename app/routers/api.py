@@ -1,15 +1,23 @@
 """REST API endpoints for zones and ads."""
 
-from fastapi import APIRouter, HTTPException
+import json
+
+from fastapi import APIRouter, HTTPException, Response
 from fastapi.responses import JSONResponse
-from sqlalchemy import func
 from sqlmodel import select
 
+from app.config import get_settings
+from app.database import query_budget
 from app.dependencies import SessionDep
-from app.models import Ad, Click, Impression, Zone
-from app.services.analytics import range_counts
+from app.models import Ad, Zone
+from app.services.analytics import public_ad_stats, range_counts
+from app.services.catalog import catalog
+from app.services.snapshot import Snapshot
 
 router = APIRouter(tags=['API'])
+stats_snapshot: Snapshot[bytes] = Snapshot(
+    get_settings().stats_snapshot_seconds, name='stats'
+)
 
 
 # -------- Zones CRUD --------
@@ -18,6 +26,7 @@ def create_zone(zone: Zone, session: SessionDep):
     """Create a new zone."""
     session.add(zone)
     session.commit()
+    catalog.invalidate()
     session.refresh(zone)
     return zone
 
@@ -48,6 +57,7 @@ def update_zone(zone_id: int, updated: Zone, session: SessionDep):
     zone.height = updated.height
     session.add(zone)
     session.commit()
+    catalog.invalidate()
     session.refresh(zone)
     return zone
 
@@ -60,6 +70,7 @@ def delete_zone(zone_id: int, session: SessionDep):
         raise HTTPException(status_code=404, detail='Zone not found')
     session.delete(zone)
     session.commit()
+    catalog.invalidate()
     return {'ok': True}
 
 
@@ -72,6 +83,7 @@ def create_ad(ad: Ad, session: SessionDep):
         raise HTTPException(status_code=400, detail='Invalid zone_id')
     session.add(ad)
     session.commit()
+    catalog.invalidate()
     session.refresh(ad)
     return ad
 
@@ -103,6 +115,7 @@ def update_ad(ad_id: int, updated: Ad, session: SessionDep):
     ad.zone_id = updated.zone_id
     session.add(ad)
     session.commit()
+    catalog.invalidate()
     session.refresh(ad)
     return ad
 
@@ -115,11 +128,13 @@ def delete_ad(ad_id: int, session: SessionDep):
         raise HTTPException(status_code=404, detail='Ad not found')
     session.delete(ad)
     session.commit()
+    catalog.invalidate()
     return {'ok': True}
 
 
 # -------- Stats API --------
 @router.get('/api/stats.json')
+@query_budget(2)
 def stats_api(session: SessionDep):
     """Get stats for all ads (compact format)."""
     imps, clks = range_counts(session, days=7)
@@ -141,40 +156,27 @@ def stats_api(session: SessionDep):
 
 
 @router.get('/stats.json', response_class=JSONResponse)
+@query_budget(1)
 def public_stats(session: SessionDep):
-    """Get public stats for all ads (detailed format)."""
-    ads = session.exec(select(Ad)).all()
-
-    data = []
-    for ad in ads:
-        impressions = (
-            session.exec(
-                select(func.count(Impression.id)).where(Impression.ad_id == ad.id)  # type: ignore
-            ).first()
-            or 0
-        )
-
-        clicks = (
-            session.exec(
-                select(func.count(Click.id)).where(Click.ad_id == ad.id)  # type: ignore
-            ).first()
-            or 0
-        )
-
-        ctr = round((clicks / impressions * 100.0), 2) if impressions else 0.0
-
-        data.append(
-            {
-                'ad_id': ad.id,
-                'zone_id': ad.zone_id,
-                'impressions': impressions,
-                'clicks': clicks,
-                'ctr': ctr,
-                'url': ad.url,
-            }
-        )
-
-    return {'ads': data}
+    """
+    Get public stats for all ads (detailed format).
+
+    Served from a shared snapshot recomputed at most once per
+    ``STATS_SNAPSHOT_SECONDS``, however many stats pages are polling. The
+    snapshot holds the encoded body, so polls don't re-serialize it.
+    """
+    body = stats_snapshot.get(
+        lambda: _encode_json({'ads': public_ad_stats(session)}),
+        key=session.get_bind(),
+    )
+    return Response(body, media_type='application/json')
+
+
+def _encode_json(content: object) -> bytes:
+    """Encode ``content`` the way ``JSONResponse`` would."""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(',', ':')
+    ).encode()
 
 
 # -------- Health Check --------
@@ -0,0 +1,22 @@
+"""Prometheus scrape endpoint."""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app import metrics
+from app.dependencies import verify_admin_key
+
+router = APIRouter(tags=['Metrics'])
+
+
+@router.get(
+    '/metrics', include_in_schema=False, dependencies=[Depends(verify_admin_key)]
+)
+async def metrics_endpoint():
+    """
+    Process metrics in the Prometheus text format.
+
+    Public traffic reaches this port, so it needs the admin key; scrapers on
+    the private network use ``METRICS_PORT`` instead (``start_scrape_server``).
+    """
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,18 +1,18 @@
 """Public-facing pages and static file routes."""
 
 from datetime import UTC, date, datetime
-import os
 
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse
 
-from app.blog_seo import BLOG_DISPLAY_TITLES
-from app.config import get_settings
+from app import root_files
+from app.blog_registry import blog_registry
+from app.page_cache import PageCache
 from app.template_utils import create_templates
 
 router = APIRouter(tags=['Public'])
-settings = get_settings()
 templates = create_templates()
+page_cache = PageCache(templates)
 
 HOME_CRUMB = {'name': 'Home', 'url': '/'}
 TOOLS_CRUMB = {'name': 'Tools', 'url': '/tools'}
@@ -22,18 +22,18 @@ BLOG_CRUMB = {'name': 'Blog', 'url': '/blog'}
 @router.get('/', response_class=HTMLResponse)
 def home(request: Request):
     """Home page."""
-    return templates.TemplateResponse(
-        request=request, name='index.html', context={'year': datetime.now(UTC).year}
+    return page_cache.render(
+        request, 'index.html', {'year': datetime.now(UTC).year}, dated=True
     )
 
 
 @router.get('/tools', response_class=HTMLResponse)
 def tools_page(request: Request):
     """Ad testing tools page."""
-    return templates.TemplateResponse(
-        request=request,
-        name='tools.html',
-        context={'breadcrumb_items': [HOME_CRUMB, {'name': 'Tools', 'url': '/tools'}]},
+    return page_cache.render(
+        request,
+        'tools.html',
+        {'breadcrumb_items': [HOME_CRUMB, {'name': 'Tools', 'url': '/tools'}]},
     )
 
 
@@ -131,18 +131,16 @@ def banner_preview_page(request: Request, size_slug: str):
         ],
         **banner_info,
     }
-    return templates.TemplateResponse(
-        request=request, name='tools/banner-preview.html', context=context
-    )
+    return page_cache.render(request, 'tools/banner-preview.html', context)
 
 
 @router.get('/tools/test-html5-banner-preview.html', response_class=HTMLResponse)
 def html5_test_page(request: Request):
     """HTML5 banner testing page."""
-    return templates.TemplateResponse(
-        request=request,
-        name='tools/html5-test.html',
-        context={
+    return page_cache.render(
+        request,
+        'tools/html5-test.html',
+        {
             'breadcrumb_items': [
                 HOME_CRUMB,
                 TOOLS_CRUMB,
@@ -158,10 +156,10 @@ def html5_test_page(request: Request):
 @router.get('/tools/html5-banner-preview-collection.html', response_class=HTMLResponse)
 def html5_collection_page(request: Request):
     """HTML5 banner multi-size preview page."""
-    return templates.TemplateResponse(
-        request=request,
-        name='tools/html5-collection.html',
-        context={
+    return page_cache.render(
+        request,
+        'tools/html5-collection.html',
+        {
             'breadcrumb_items': [
                 HOME_CRUMB,
                 TOOLS_CRUMB,
@@ -177,10 +175,10 @@ def html5_collection_page(request: Request):
 @router.get('/tools/html5-banner-validator.html', response_class=HTMLResponse)
 def html5_validator_page(request: Request):
     """HTML5 banner validator page."""
-    return templates.TemplateResponse(
-        request=request,
-        name='tools/html5-validator.html',
-        context={
+    return page_cache.render(
+        request,
+        'tools/html5-validator.html',
+        {
             'breadcrumb_items': [
                 HOME_CRUMB,
                 TOOLS_CRUMB,
@@ -196,10 +194,10 @@ def html5_validator_page(request: Request):
 @router.get('/stats', response_class=HTMLResponse)
 def public_stats_ui(request: Request):
     """Public stats page."""
-    return templates.TemplateResponse(
-        request=request,
-        name='stats.html',
-        context={
+    return page_cache.render(
+        request,
+        'stats.html',
+        {
             'breadcrumb_items': [
                 HOME_CRUMB,
                 {'name': 'Statistics', 'url': '/stats'},
@@ -211,10 +209,10 @@ def public_stats_ui(request: Request):
 @router.get('/publisher', response_class=HTMLResponse)
 def publisher_page(request: Request):
     """Publisher information page."""
-    return templates.TemplateResponse(
-        request=request,
-        name='publisher.html',
-        context={
+    return page_cache.render(
+        request,
+        'publisher.html',
+        {
             'breadcrumb_items': [
                 HOME_CRUMB,
                 {'name': 'Publishers', 'url': '/publisher'},
@@ -226,25 +224,18 @@ def publisher_page(request: Request):
 @router.get('/publisher-test', response_class=HTMLResponse)
 def publisher_test(request: Request):
     """Publisher test page."""
-    return templates.TemplateResponse(request=request, name='publisher-test.html')
+    return page_cache.render(request, 'publisher-test.html')
 
 
 # -------- Blog --------
 @router.get('/blog', response_class=HTMLResponse)
 def blog_index(request: Request):
     """Blog index page."""
-    posts = [
-        f.replace('blog_', '').replace('.html', '')
-        for f in os.listdir(settings.blog_dir)
-        if f.startswith('blog_')
-        and f.endswith('.html')
-        and f not in ('blog_index.html', 'blog_base.html')
-    ]
-    return templates.TemplateResponse(
-        request=request,
-        name='blog.html',
-        context={
-            'posts': posts,
+    return page_cache.render(
+        request,
+        'blog.html',
+        {
+            'posts': [post.slug for post in blog_registry.posts()],
             'breadcrumb_items': [HOME_CRUMB, {'name': 'Blog', 'url': '/blog'}],
         },
     )
@@ -253,65 +244,52 @@ def blog_index(request: Request):
 @router.get('/blog/{slug}', response_class=HTMLResponse)
 def blog_page(request: Request, slug: str):
     """Individual blog post page."""
-    filename = f'blog_{slug}.html'
-    filepath = os.path.join(settings.blog_dir, filename)
-    published = date.today().isoformat()
-
-    # Check if the file exists
-    if not os.path.exists(filepath):
+    post = blog_registry.get(slug)
+    if post is None:
         # Show available posts instead of plain 404
-        available = [
-            f.replace('blog_', '').replace('.html', '')
-            for f in os.listdir(settings.blog_dir)
-            if f.startswith('blog_') and f.endswith('.html')
-        ]
         raise HTTPException(
             status_code=404,
             detail={
                 'error': f"Blog post '{slug}' not found",
-                'available_posts': available,
+                'available_posts': blog_registry.current().slugs,
             },
         )
 
-    year = date.today().year
-    title = BLOG_DISPLAY_TITLES.get(slug, slug.replace('_', ' ').title())
-    return templates.TemplateResponse(
-        request=request,
-        name=f'public/{filename}',
-        context={
-            'published': published,
-            'year': year,
+    return page_cache.render(
+        request,
+        post.template,
+        {
+            'published': post.published,
+            'year': date.today().year,
             'slug': slug,
             'breadcrumb_items': [
                 HOME_CRUMB,
                 BLOG_CRUMB,
-                {'name': title, 'url': f'/blog/{slug}'},
+                {'name': post.title, 'url': f'/blog/{slug}'},
             ],
-            'title': title,
+            'title': post.title,
         },
+        dated=True,
     )
 
 
 # -------- Static Files --------
 @router.get('/ads.txt', response_class=PlainTextResponse, include_in_schema=False)
-def ads_txt():
+def ads_txt(request: Request):
     """Serve ads.txt file."""
-    with open('ads.txt') as f:
-        return f.read()
+    return root_files.ads_txt.response(request)
 
 
 @router.get('/robots.txt', response_class=PlainTextResponse, include_in_schema=False)
-def robots_txt():
+def robots_txt(request: Request):
     """Serve robots.txt file."""
-    with open('robots.txt') as f:
-        return f.read()
+    return root_files.robots_txt.response(request)
 
 
-@router.get('/sitemap.xml', response_class=PlainTextResponse, include_in_schema=False)
-def sitemap_xml():
+@router.get('/sitemap.xml', include_in_schema=False)
+def sitemap_xml(request: Request):
     """Serve sitemap.xml file."""
-    with open('sitemap.xml') as f:
-        return f.read()
+    return root_files.sitemap_xml.response(request)
 
 
 @router.get(
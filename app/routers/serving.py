@@ -5,28 +5,33 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlmodel import select
 
 from app.config import get_settings
-from app.dependencies import SessionDep
-from app.models import Ad, Click, Zone
-from app.services.ad_selection import record_impression, select_ad_for_zone
+from app.database import query_budget
+from app.dependencies import AsyncSessionDep, SessionDep
+from app.http_cache import IMMUTABLE, accepts_encoding, cached_response
+from app.models import Ad, Zone
+from app.services.ad_selection import (
+    record_click_async,
+    record_impression_async,
+    select_ad_for_zone_async,
+)
+from app.services.catalog import catalog
+from app.services.embed import embed_scripts
 from app.template_utils import create_templates
 
 router = APIRouter(tags=['Serving'])
-settings = get_settings()
 templates = create_templates()
 
 
 @router.get('/render', response_class=HTMLResponse)
-def render_ad(
+@query_budget(5)  # cold catalog (2) + CTR counters (1) + sync tracking write (2)
+async def render_ad(
     request: Request,
-    session: SessionDep,
-    response: Response,
+    session: AsyncSessionDep,
     zone: int = Query(1, description='Zone ID (defaults to 1)'),
 ):
     """Render an ad for the specified zone."""
-    # Tell search engines not to index this endpoint
-    response.headers['X-Robots-Tag'] = 'noindex, nofollow'
-    # Verify zone exists
-    z = session.get(Zone, zone)
+    # Zone and active ads come from the in-memory catalog (no queries when warm)
+    z = await catalog.get_zone_async(session, zone)
     if not z:
         raise HTTPException(
             status_code=404,
@@ -36,21 +41,14 @@ def render_ad(
             ),
         )
 
-    # Query ads for this zone directly
-    query = select(Ad).where(Ad.zone_id == zone)
-    if hasattr(Ad, 'is_active'):
-        query = query.where(Ad.is_active == True)  # noqa: E712
-    ads = list(session.exec(query).all())
+    ads = z.ads
 
     if not ads:
-        # Check if there are any inactive ads
-        all_ads_query = select(Ad).where(Ad.zone_id == zone)
-        all_ads = list(session.exec(all_ads_query).all())
-        if all_ads:
+        if z.total_ads:
             raise HTTPException(
                 status_code=404,
                 detail=(
-                    f'Zone {zone} ({z.name}) has {len(all_ads)} ad(s) '
+                    f'Zone {zone} ({z.name}) has {z.total_ads} ad(s) '
                     'but none are active. Activate ads via /admin/ads'
                 ),
             )
@@ -62,57 +60,79 @@ def render_ad(
         )
 
     # Select ad using weighted CTR-based selection
-    ad = select_ad_for_zone(session, ads)
+    ad = await select_ad_for_zone_async(session, ads, zone_id=zone)
 
     if ad.id is None:
         raise HTTPException(status_code=500, detail='Ad ID is missing')
 
     # Log impression
-    record_impression(session, ad.id)
-
-    # Build click URL
-    click_url = f'/click?id={ad.id}'
-
-    # Render ad HTML
-    return f"""
-    <div class="ad">
-        <a href="{click_url}" target="_blank">
-            {ad.html}
-        </a>
-    </div>
-    """
+    await record_impression_async(session, ad.id)
+
+    # Serve the fragment pre-rendered (and pre-compressed) by the catalog;
+    # GZipMiddleware passes responses with a Content-Encoding through untouched
+    fragment = z.fragments[ad.id]
+    headers = {
+        # Tell search engines not to index this endpoint
+        'X-Robots-Tag': 'noindex, nofollow',
+        'Vary': 'Accept-Encoding',
+    }
+    accept = request.headers.get('accept-encoding', '')
+    if fragment.gzipped and accepts_encoding(accept, 'gzip'):
+        headers['Content-Encoding'] = 'gzip'
+        return HTMLResponse(fragment.gzipped, headers=headers)
+    return HTMLResponse(fragment.body, headers=headers)
 
 
 @router.get('/click')
-def click(id: int, session: SessionDep, response: Response):
+@query_budget(4)  # cold catalog (2) + sync tracking write (2)
+async def click(id: int, session: AsyncSessionDep, response: Response):
     """Handle ad click - log and redirect to Adsterra SmartLink."""
     # Tell search engines not to index this endpoint
     response.headers['X-Robots-Tag'] = 'noindex, nofollow'
-    ad = session.get(Ad, id)
-    if not ad:
+    # Validate against the in-memory catalog; persistence is write-behind
+    if not await catalog.has_ad_async(session, id):
         raise HTTPException(status_code=404, detail='Ad not found')
 
-    # Log click internally
-    session.add(Click(ad_id=ad.id))  # type: ignore
-    session.commit()
+    await record_click_async(session, id)
 
     # Always redirect to Adsterra SmartLink
-    return RedirectResponse(url=settings.adsterra_smartlink, status_code=302)
+    return RedirectResponse(url=get_settings().adsterra_smartlink, status_code=302)
 
 
 @router.get('/embed.js', response_class=Response, include_in_schema=False)
 def embed_js(
     request: Request,
-    response: Response,
     zone: int | None = Query(default=None, description='Zone ID'),
 ):
-    """Generate embeddable JavaScript for ad display."""
-    response.headers['Cache-Control'] = 'public, max-age=3600'
-    return templates.TemplateResponse(
-        request=request,
-        name='embed.js.jinja2',
-        context={'zone': zone},
+    """Serve the embeddable JavaScript for ad display, pre-rendered per zone."""
+    script = embed_scripts.get(zone)
+    return cached_response(
+        request,
+        script.body,
+        media_type='application/javascript',
+        etag=script.etag,
+        cache_control='public, max-age=3600',
+        gzipped=script.gzipped,
+    )
+
+
+@router.get('/embed.{version}.js', response_class=Response, include_in_schema=False)
+def embed_js_versioned(
+    request: Request,
+    version: str,
+    zone: int | None = Query(default=None, description='Zone ID'),
+):
+    """Serve embed.js under its content-hashed URL (immutable when current)."""
+    script = embed_scripts.get(zone)
+    # An old hash still gets the current script, but must not be pinned forever
+    current = version == embed_scripts.version
+    return cached_response(
+        request,
+        script.body,
         media_type='application/javascript',
+        etag=script.etag,
+        cache_control=IMMUTABLE if current else 'public, max-age=3600',
+        gzipped=script.gzipped,
     )
 
 
@@ -141,6 +161,7 @@ def submit_rental(
     ad = Ad(html=html, url=url, zone_id=zone_id, weight=weight)
     session.add(ad)
     session.commit()
+    catalog.invalidate()
 
     # Optionally notify via logging
     print(f'New ad rental submitted for zone {zone_id}')
@@ -1,11 +1,27 @@
 """Business logic services."""
 
-from app.services.ad_selection import select_ad_for_zone, weighted_choice
-from app.services.analytics import calculate_ctr_data, range_counts
+from app.services.ad_selection import (
+    AliasTable,
+    SelectionStrategy,
+    select_ad_for_zone_async,
+    strategy_for_zone,
+    weighted_choice,
+)
+from app.services.analytics import (
+    calculate_ctr_data,
+    hourly_counts,
+    range_counts,
+    total_counts,
+)
 
 __all__ = [
+    'AliasTable',
+    'SelectionStrategy',
     'calculate_ctr_data',
+    'hourly_counts',
     'range_counts',
-    'select_ad_for_zone',
+    'select_ad_for_zone_async',
+    'strategy_for_zone',
+    'total_counts',
     'weighted_choice',
 ]
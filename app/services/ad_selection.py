@@ -1,13 +1,22 @@
-"""Ad selection and weighted choice services."""
+"""Ad selection strategies and weighted choice services."""
 
-from collections.abc import Sequence
+from abc import ABC, abstractmethod
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+import itertools
 import random
-from typing import TypeVar
+import time
+from typing import ClassVar, Generic, TypeVar
 
-from sqlmodel import Session
+import numpy as np
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.models import Ad, Impression
-from app.services.analytics import range_counts
+from app import metrics
+from app.config import Settings, get_settings
+from app.models import Ad, Click, Impression
+from app.services.counters import ctr_counters
+from app.services.event_sink import click_sink, impression_sink
 
 T = TypeVar('T')
 
@@ -36,13 +45,257 @@ def weighted_choice(items: Sequence[T], weights: Sequence[int | float]) -> T:
     return items[-1]  # Safety fallback
 
 
+class AliasTable(Generic[T]):
+    """
+    Walker/Vose alias table: O(n) to build, O(1) per weighted draw.
+
+    Draws follow the same distribution as ``weighted_choice``; invalid weights
+    (total <= 0) likewise always yield the first item.
+    """
+
+    __slots__ = ('alias', 'items', 'prob')
+
+    def __init__(self, items: Sequence[T], weights: Sequence[int | float]):
+        n = len(items)
+        total = sum(weights)
+        if total <= 0:
+            self.items: Sequence[T] = items[:1]
+            self.prob = [1.0]
+            self.alias = [0]
+            return
+
+        self.items = items
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, g = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = g
+            scaled[g] = (scaled[g] + scaled[s]) - 1.0
+            (small if scaled[g] < 1.0 else large).append(g)
+        # Leftovers are 1.0 up to floating-point error
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def draw(self, rng: random.Random | None = None) -> T:
+        """Return one item with probability proportional to its weight."""
+        r = (rng or random).random() * len(self.prob)
+        i = int(r)
+        # Reuse the fractional part as the second uniform variate
+        return self.items[i] if r - i < self.prob[i] else self.items[self.alias[i]]
+
+    def sample(self, size: int, rng: np.random.Generator) -> np.ndarray:
+        """Draw ``size`` items at once; returns their indices into ``items``."""
+        n = len(self.prob)
+        r = rng.random(size) * n
+        i = np.minimum(r.astype(np.intp), n - 1)
+        prob, alias = np.asarray(self.prob), np.asarray(self.alias, dtype=np.intp)
+        return np.where(r - i < prob[i], i, alias[i])
+
+
+class SelectionStrategy(ABC):
+    """
+    Picks ads for a zone from its candidates' weights and CTR counters.
+
+    Candidates are scored together as NumPy arrays (one element per ad), so a
+    zone's scores cost a few vectorized operations however many ads it has.
+    Ads with a weight <= 0 are never picked; if no ad has a positive weight,
+    every pick is the first ad (as with ``weighted_choice``).
+    """
+
+    name: ClassVar[str]
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'SelectionStrategy':
+        return cls()
+
+    @abstractmethod
+    def scores(
+        self, weights: np.ndarray, imps: np.ndarray, clks: np.ndarray
+    ) -> np.ndarray:
+        """Return each candidate's (unnormalized) selection weight."""
+
+    def choose(
+        self,
+        weights: np.ndarray,
+        imps: np.ndarray,
+        clks: np.ndarray,
+        size: int,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        """
+        Draw ``size`` independent picks from an ``AliasTable`` of the scores.
+
+        Args:
+            weights: Ad weights.
+            imps: Impression counts, aligned with ``weights``.
+            clks: Click counts, aligned with ``weights``.
+            size: Number of picks.
+            rng: Random generator.
+
+        Returns:
+            Candidate indices, one per pick.
+        """
+        scores = np.where(weights > 0, self.scores(weights, imps, clks), 0.0)
+        return AliasTable(range(len(scores)), scores.tolist()).sample(size, rng)
+
+
+@dataclass(frozen=True)
+class CtrBoost(SelectionStrategy):
+    """
+    The ad weight times a CTR boost capped at ``1 + max_boost``.
+
+    Ads with fewer than ``explore_below`` impressions get ``explore_bonus`` on
+    top, so new ads are shown enough to measure their CTR.
+    """
+
+    name: ClassVar[str] = 'ctr_boost'
+    ctr_scale: float = 10.0
+    max_boost: float = 2.0
+    explore_below: int = 100
+    explore_bonus: float = 1.5
+
+    def scores(
+        self, weights: np.ndarray, imps: np.ndarray, clks: np.ndarray
+    ) -> np.ndarray:
+        ctr = np.divide(clks, imps, out=np.zeros_like(weights), where=imps > 0)
+        boost = 1.0 + np.minimum(ctr * self.ctr_scale, self.max_boost)
+        boost[imps < self.explore_below] *= self.explore_bonus
+        return weights * boost
+
+
+@dataclass(frozen=True)
+class EpsilonGreedy(SelectionStrategy):
+    """
+    The best ad with probability ``1 - epsilon``, otherwise a weighted draw.
+
+    "Best" maximizes the ad weight times its posterior mean CTR under a
+    Beta(``prior_clicks``, ``prior_misses``) prior, so unseen ads are tried
+    early instead of tying at zero; ties share the greedy share.
+    """
+
+    name: ClassVar[str] = 'epsilon_greedy'
+    epsilon: float = 0.1
+    prior_clicks: float = 1.0
+    prior_misses: float = 1.0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'EpsilonGreedy':
+        return cls(epsilon=settings.selection_epsilon)
+
+    def scores(
+        self, weights: np.ndarray, imps: np.ndarray, clks: np.ndarray
+    ) -> np.ndarray:
+        eligible = weights > 0
+        if not eligible.any():
+            return weights
+        explore = np.where(eligible, weights, 0.0)
+        value = weights * _posterior_mean(
+            imps, clks, self.prior_clicks, self.prior_misses
+        )
+        best = eligible & (value == value[eligible].max())
+        return (
+            self.epsilon * explore / explore.sum()
+            + (1.0 - self.epsilon) * best / best.sum()
+        )
+
+
+@dataclass(frozen=True)
+class ThompsonSampling(SelectionStrategy):
+    """
+    Beta-Bernoulli Thompson sampling.
+
+    Each pick draws a CTR for every candidate from its Beta posterior and
+    takes the highest weight x CTR, so picks follow the probability of each
+    ad being the best. That costs O(ads) per pick, vectorized over a batch.
+    """
+
+    name: ClassVar[str] = 'thompson'
+    prior_clicks: float = 1.0
+    prior_misses: float = 1.0
+    max_batch_cells: int = 1 << 18  # picks x candidates sampled at once
+
+    def scores(
+        self, weights: np.ndarray, imps: np.ndarray, clks: np.ndarray
+    ) -> np.ndarray:
+        """Weight x posterior mean CTR (for display; picks are sampled)."""
+        return weights * _posterior_mean(
+            imps, clks, self.prior_clicks, self.prior_misses
+        )
+
+    def choose(
+        self,
+        weights: np.ndarray,
+        imps: np.ndarray,
+        clks: np.ndarray,
+        size: int,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        n = len(weights)
+        weights = np.where(weights > 0, weights, 0.0)
+        if not weights.any():
+            return np.zeros(size, dtype=np.intp)
+        a = self.prior_clicks + clks
+        b = self.prior_misses + np.maximum(imps - clks, 0)
+        picks = np.empty(size, dtype=np.intp)
+        step = max(1, self.max_batch_cells // n)
+        for start in range(0, size, step):
+            rows = min(step, size - start)
+            theta = rng.beta(a, b, size=(rows, n))
+            theta *= weights
+            picks[start : start + rows] = theta.argmax(axis=1)
+        return picks
+
+
+def _posterior_mean(
+    imps: np.ndarray, clks: np.ndarray, prior_clicks: float, prior_misses: float
+) -> np.ndarray:
+    return (clks + prior_clicks) / (
+        np.maximum(imps, clks) + prior_clicks + prior_misses
+    )
+
+
+STRATEGIES: dict[str, type[SelectionStrategy]] = {
+    cls.name: cls for cls in (CtrBoost, EpsilonGreedy, ThompsonSampling)
+}
+
+
+def strategy_for_zone(zone_id: int | None) -> SelectionStrategy:
+    """
+    Return the strategy configured for ``zone_id``.
+
+    Zones listed in ``ZONE_SELECTION_STRATEGIES`` use their own strategy; the
+    rest (and selections without a zone) use ``SELECTION_STRATEGY``.
+    """
+    settings = get_settings()
+    name = settings.zone_selection_strategies.get(
+        zone_id,  # type: ignore
+        settings.selection_strategy,
+    )
+    return STRATEGIES[name].from_settings(settings)
+
+
+def candidate_arrays(
+    ads: Sequence[Ad], imps: dict[int, int], clks: dict[int, int]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the ads' weights, impressions and clicks as aligned float arrays."""
+    n = len(ads)
+    weights = np.fromiter((ad.weight for ad in ads), dtype=float, count=n)
+    i = np.fromiter((imps.get(ad.id, 0) for ad in ads), dtype=float, count=n)  # type: ignore
+    c = np.fromiter((clks.get(ad.id, 0) for ad in ads), dtype=float, count=n)  # type: ignore
+    return weights, i, c
+
+
 def calculate_ad_weights(
     ads: Sequence[Ad],
     imps: dict[int, int],
     clks: dict[int, int],
 ) -> list[float]:
     """
-    Calculate CTR-boosted weights for ads.
+    Calculate CTR-boosted weights for ads (the ``CtrBoost`` scores).
 
     Args:
         ads: List of ads to calculate weights for.
@@ -52,40 +305,104 @@ def calculate_ad_weights(
     Returns:
         List of calculated weights corresponding to each ad.
     """
-    weights = []
-    for ad in ads:
-        try:
-            i = imps.get(ad.id, 0)  # type: ignore
-            c = clks.get(ad.id, 0)  # type: ignore
-            ctr = (c / i) if i > 0 else 0
-            boost = 1.0 + min(ctr * 10, 2.0)
-            # Exploration bonus for new ads
-            if i < 100:
-                boost *= 1.5
-            weight = ad.weight * boost
-        except ZeroDivisionError:
-            weight = ad.weight
-        weights.append(weight)
-    return weights
+    return CtrBoost().scores(*candidate_arrays(ads, imps, clks)).tolist()
+
+
+_rng = np.random.default_rng()
+
+
+@dataclass(frozen=True)
+class _ZoneSampler:
+    ads: Sequence[Ad]  # catalog tuple the picks were drawn for (identity-checked)
+    built_at: float
+    picks: list[int]
+    _cursor: Iterator[int] = field(default_factory=itertools.count)
+
+    def draw(self) -> Ad | None:
+        """Return the next pick, or None once the batch is used up."""
+        i = next(self._cursor)  # atomic under the GIL
+        return self.ads[self.picks[i]] if i < len(self.picks) else None
+
+
+_samplers: dict[int, _ZoneSampler] = {}
+
 
+def _cached_draw(zone_id: int, ads: Sequence[Ad]) -> Ad | None:
+    """Draw from the zone's cached sampler; None means it must be rebuilt."""
+    sampler = _samplers.get(zone_id)
+    ad = None
+    if (
+        sampler is not None
+        and sampler.ads is ads
+        and time.monotonic() - sampler.built_at
+        <= get_settings().sampler_refresh_seconds
+    ):
+        ad = sampler.draw()
+    metrics.cache_lookup('sampler', ad is not None)
+    return ad
 
-def select_ad_for_zone(session: Session, ads: list[Ad]) -> Ad:
+
+def _build_sampler(
+    zone_id: int, ads: Sequence[Ad], imps: dict[int, int], clks: dict[int, int]
+) -> _ZoneSampler:
+    picks = strategy_for_zone(zone_id).choose(
+        *candidate_arrays(ads, imps, clks),
+        size=max(1, get_settings().sampler_batch_size),
+        rng=_rng,
+    )
+    sampler = _samplers[zone_id] = _ZoneSampler(ads, time.monotonic(), picks.tolist())
+    return sampler
+
+
+async def select_ad_for_zone_async(
+    session: AsyncSession, ads: Sequence[Ad], zone_id: int
+) -> Ad:
     """
-    Select an ad from the given list using weighted CTR-based selection.
+    Select an ad from the given list with the zone's selection strategy.
+
+    A batch of ``SAMPLER_BATCH_SIZE`` picks is drawn at once and served from a
+    per-zone cache. It is redrawn when used up, when the zone's catalog entry
+    changes (ads or weights edited) or after ``SAMPLER_REFRESH_SECONDS``, so the
+    strategy tracks the counters without scoring the zone on every impression.
 
     Args:
-        session: Database session.
-        ads: List of active ads for the zone.
+        session: Database session (only used to seed the counters).
+        ads: Active ads for the zone (the catalog tuple).
+        zone_id: Zone the ads belong to.
 
     Returns:
         Selected ad.
     """
-    imps, clks = range_counts(session, days=7)
-    weights = calculate_ad_weights(ads, imps, clks)
-    return weighted_choice(ads, weights)
+    ad = _cached_draw(zone_id, ads)
+    if ad is None:
+        imps, clks = await ctr_counters.counts_for_async(
+            session,
+            (ad.id for ad in ads),  # type: ignore
+        )
+        ad = _build_sampler(zone_id, ads, imps, clks).draw()
+    return ad  # type: ignore
 
 
-def record_impression(session: Session, ad_id: int) -> None:
-    """Record an impression for the given ad."""
+async def record_impression_async(session: AsyncSession, ad_id: int) -> None:
+    """
+    Record an impression for the given ad.
+
+    The row is handed to the write-behind sink when it is running; otherwise
+    (or when its buffer is full) it is written directly.
+    """
+    ctr_counters.record_impression(ad_id)
+    metrics.impressions.inc()
+    if impression_sink.submit({'ad_id': ad_id, 'timestamp': datetime.now(UTC)}):
+        return
     session.add(Impression(ad_id=ad_id))
-    session.commit()
+    await session.commit()
+
+
+async def record_click_async(session: AsyncSession, ad_id: int) -> None:
+    """Record a click for the given ad (write-behind, like impressions)."""
+    ctr_counters.record_click(ad_id)
+    metrics.clicks.inc()
+    if click_sink.submit({'ad_id': ad_id, 'timestamp': datetime.now(UTC)}):
+        return
+    session.add(Click(ad_id=ad_id))
+    await session.commit()
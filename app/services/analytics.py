@@ -1,39 +1,93 @@
 """Analytics and statistics services."""
 
+from collections.abc import Collection
 from datetime import UTC, datetime, timedelta
 
-from sqlalchemy import func
+from sqlalchemy import Subquery, func, union_all
 from sqlmodel import Session, select
 
-from app.models import Ad, Click, Impression
+from app.models import Ad, AdStatsDaily, AdStatsHourly
+from app.services.rollup import hour_bucket
+
+
+def _rollup_rows(since: datetime | None = None) -> Subquery:
+    """
+    Hourly and daily rollup rows as one (ad_id, impressions, clicks) subquery.
+
+    Daily rows only hold hours the retention job compacted out of the hourly
+    table, so the two never overlap.
+    """
+    hourly = select(
+        AdStatsHourly.ad_id, AdStatsHourly.impressions, AdStatsHourly.clicks
+    )
+    daily = select(AdStatsDaily.ad_id, AdStatsDaily.impressions, AdStatsDaily.clicks)
+    if since is not None:
+        hourly = hourly.where(AdStatsHourly.hour >= hour_bucket(since))
+        daily = daily.where(AdStatsDaily.day >= since.date())
+    return union_all(hourly, daily).subquery()
+
+
+def _rollup_counts(
+    session: Session,
+    since: datetime | None,
+    ad_ids: Collection[int] | None = None,
+) -> tuple[dict[int, int], dict[int, int]]:
+    """Sum the rollups per ad, optionally from the hour containing ``since``."""
+    rollup = _rollup_rows(since)
+    query = select(
+        rollup.c.ad_id,
+        func.sum(rollup.c.impressions),
+        func.sum(rollup.c.clicks),
+    ).group_by(rollup.c.ad_id)
+    if ad_ids is not None:
+        query = query.where(rollup.c.ad_id.in_(ad_ids))
+    rows = session.exec(query).all()
+
+    imps = {ad_id: i for ad_id, i, _ in rows if i}
+    clks = {ad_id: c for ad_id, _, c in rows if c}
+    return imps, clks
 
 
 def range_counts(
-    session: Session, days: int = 7
+    session: Session, days: int = 7, ad_ids: Collection[int] | None = None
 ) -> tuple[dict[int, int], dict[int, int]]:
     """
     Get impression and click counts for the last N days.
 
+    Reads the rollups, which are updated in the same transaction as the raw
+    rows (including the current hour), so no raw tracking rows are scanned. The
+    window is aligned to whole UTC hours. Pass ``ad_ids`` to count only those
+    ads (``WHERE ad_id IN (...)``).
+
     Returns:
         Tuple of (impressions_dict, clicks_dict) mapping ad_id to count.
     """
     since = datetime.now(UTC) - timedelta(days=days)
+    return _rollup_counts(session, since, ad_ids=ad_ids)
 
-    imps_rows = session.exec(
-        select(Impression.ad_id, func.count(Impression.id))  # type: ignore
-        .where(Impression.timestamp >= since)
-        .group_by(Impression.ad_id)  # type: ignore
-    ).all()
 
-    clicks_rows = session.exec(
-        select(Click.ad_id, func.count(Click.id))  # type: ignore
-        .where(Click.timestamp >= since)
-        .group_by(Click.ad_id)  # type: ignore
-    ).all()
+def hourly_counts(
+    session: Session, since: datetime, ad_ids: Collection[int] | None = None
+) -> list[tuple[int, datetime, int, int]]:
+    """
+    Get (ad_id, hour, impressions, clicks) rollup rows from the hour of ``since``.
 
-    imps = {ad_id: n for ad_id, n in imps_rows}
-    clks = {ad_id: n for ad_id, n in clicks_rows}
-    return imps, clks
+    Pass ``ad_ids`` to fetch only those ads.
+    """
+    query = select(
+        AdStatsHourly.ad_id,
+        AdStatsHourly.hour,
+        AdStatsHourly.impressions,
+        AdStatsHourly.clicks,
+    ).where(AdStatsHourly.hour >= hour_bucket(since))
+    if ad_ids is not None:
+        query = query.where(AdStatsHourly.ad_id.in_(ad_ids))  # type: ignore
+    return list(session.exec(query).all())
+
+
+def total_counts(session: Session) -> tuple[dict[int, int], dict[int, int]]:
+    """Get all-time impression and click counts per ad from the rollups."""
+    return _rollup_counts(session, None)
 
 
 def calculate_ctr_data(
@@ -65,3 +119,32 @@ def calculate_ctr_data(
         }
 
     return ctr_data
+
+
+def public_ad_stats(session: Session) -> list[dict[str, int | float | str | None]]:
+    """All-time impressions, clicks and CTR for every ad, in one grouped query."""
+    rollup = _rollup_rows()
+    rows = session.exec(
+        select(
+            Ad.id,
+            Ad.zone_id,
+            Ad.url,
+            func.coalesce(func.sum(rollup.c.impressions), 0),
+            func.coalesce(func.sum(rollup.c.clicks), 0),
+        )
+        .outerjoin(rollup, rollup.c.ad_id == Ad.id)  # type: ignore
+        .group_by(Ad.id)  # type: ignore
+        .order_by(Ad.id)  # type: ignore
+    ).all()
+
+    return [
+        {
+            'ad_id': ad_id,
+            'zone_id': zone_id,
+            'impressions': impressions,
+            'clicks': clicks,
+            'ctr': round((clicks / impressions * 100.0), 2) if impressions else 0.0,
+            'url': url,
+        }
+        for ad_id, zone_id, url, impressions, clicks in rows
+    ]
@@ -0,0 +1,195 @@
+"""In-memory zone/ad catalog used by the serving hot path."""
+
+import asyncio
+from dataclasses import dataclass
+import gzip
+import threading
+import time
+
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import metrics
+from app.config import get_settings
+from app.models import Ad, Zone
+
+_LOAD_POLL_SECONDS = 0.005
+
+
+@dataclass(frozen=True)
+class AdFragment:
+    """The ``/render`` response body for one ad, plain and gzip-compressed."""
+
+    source: str  # the ad's html the fragment was built from
+    body: bytes
+    gzipped: bytes | None  # None when compression wouldn't make it smaller
+
+    @classmethod
+    def build(cls, ad: Ad) -> 'AdFragment':
+        html = f"""
+    <div class="ad">
+        <a href="/click?id={ad.id}" target="_blank">
+            {ad.html}
+        </a>
+    </div>
+    """
+        body = html.encode()
+        # mtime=0 keeps the bytes identical across catalog reloads
+        gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+        return cls(
+            source=ad.html,
+            body=body,
+            gzipped=gzipped if len(gzipped) < len(body) else None,
+        )
+
+
+@dataclass(frozen=True)
+class ZoneEntry:
+    """Detached snapshot of a zone and the ads that can be served in it."""
+
+    id: int
+    name: str
+    width: int
+    height: int
+    ads: tuple[Ad, ...]  # active ads only
+    total_ads: int  # active + inactive, for 404 diagnostics
+    fragments: dict[int, AdFragment]  # pre-rendered /render bodies by ad id
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable catalog contents, swapped atomically on reload."""
+
+    zones: dict[int, ZoneEntry]
+    ad_ids: frozenset[int]  # every known ad, active or not (click validation)
+
+
+class AdCatalog:
+    """
+    Process-local cache of zones and their active ads, keyed by zone id.
+
+    The catalog is loaded once (at startup or on first use) and then served from
+    memory. Write paths call ``invalidate()`` after committing, which makes the
+    next reader reload it. ``ttl_seconds`` bounds staleness for changes made by
+    other processes (e.g. other Fly machines sharing a Postgres database).
+
+    Snapshots are tied to the engine they were loaded from, so a session bound to
+    a different database transparently triggers a reload.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()  # held by the caller that reloads
+        self._snapshot: CatalogSnapshot | None = None
+        self._fragments: dict[int, AdFragment] = {}  # by ad id, for reuse
+        self._bind: object | None = None
+        self._loaded_at = 0.0
+        self._generation = 0
+
+    def load(self, session: Session) -> CatalogSnapshot:
+        """Load all zones and ads from the database and swap in a new snapshot."""
+        generation = self._generation
+        zones = session.exec(select(Zone)).all()
+        ads = session.exec(select(Ad).order_by(Ad.id)).all()  # type: ignore
+
+        # Fragments only depend on the ad's id and html: reuse unchanged ones
+        previous = self._fragments
+        fragments: dict[int, AdFragment] = {}
+
+        def fragment(ad: Ad) -> AdFragment:
+            built = previous.get(ad.id)  # type: ignore
+            if built is None or built.source != ad.html:
+                built = AdFragment.build(ad)
+            fragments[ad.id] = built  # type: ignore
+            return built
+
+        by_zone: dict[int, list[Ad]] = {}
+        for ad in ads:
+            by_zone.setdefault(ad.zone_id, []).append(ad)
+
+        entries: dict[int, ZoneEntry] = {}
+        for z in zones:
+            zone_ads = by_zone.get(z.id, [])  # type: ignore
+            # Detached copies: catalog entries must never be re-attached
+            active = tuple(Ad(**ad.model_dump()) for ad in zone_ads if ad.is_active)
+            entries[z.id] = ZoneEntry(  # type: ignore
+                id=z.id,  # type: ignore
+                name=z.name,
+                width=z.width,
+                height=z.height,
+                ads=active,
+                total_ads=len(zone_ads),
+                fragments={ad.id: fragment(ad) for ad in active},  # type: ignore
+            )
+        snapshot = CatalogSnapshot(
+            zones=entries,
+            ad_ids=frozenset(ad.id for ad in ads),  # type: ignore
+        )
+
+        with self._lock:
+            # A write committed while we were reading; keep the result for this
+            # caller but let the next reader load a fresh snapshot.
+            if generation == self._generation:
+                self._snapshot = snapshot
+                self._fragments = fragments
+                self._bind = session.get_bind()
+                self._loaded_at = time.monotonic()
+        return snapshot
+
+    def _usable(self, bind: object) -> CatalogSnapshot | None:
+        """Return the snapshot if it is loaded and from ``bind``, fresh or not."""
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None and self._bind is bind else None
+
+    def _fresh(self) -> bool:
+        return time.monotonic() - self._loaded_at <= self.ttl_seconds
+
+    async def snapshot_async(self, session: AsyncSession) -> CatalogSnapshot:
+        """
+        Return the current snapshot, loading it if missing, stale or foreign.
+
+        Only one caller reloads at a time; while it does, the others keep
+        serving the previous snapshot (as ``Snapshot`` does), or wait for the
+        load if there is nothing to serve yet.
+        """
+        bind = session.get_bind()
+        while True:
+            snapshot = self._usable(bind)
+            if snapshot is not None and self._fresh():
+                metrics.cache_lookup('catalog', True)
+                return snapshot
+            if self._reload_lock.acquire(blocking=False):
+                try:
+                    # Re-check: another caller may have just finished a reload
+                    snapshot = self._usable(bind)
+                    if snapshot is not None and self._fresh():
+                        metrics.cache_lookup('catalog', True)
+                        return snapshot
+                    metrics.cache_lookup('catalog', False)
+                    return await session.run_sync(self.load)
+                finally:
+                    self._reload_lock.release()
+            if snapshot is not None:
+                metrics.cache_lookup('catalog', True)
+                return snapshot  # stale, but someone else is reloading
+            await asyncio.sleep(_LOAD_POLL_SECONDS)  # first load is in progress
+
+    async def get_zone_async(
+        self, session: AsyncSession, zone_id: int
+    ) -> ZoneEntry | None:
+        """Return the catalog entry for a zone, or None if it does not exist."""
+        return (await self.snapshot_async(session)).zones.get(zone_id)
+
+    async def has_ad_async(self, session: AsyncSession, ad_id: int) -> bool:
+        """Return True if the ad exists (active or not)."""
+        return ad_id in (await self.snapshot_async(session)).ad_ids
+
+    def invalidate(self) -> None:
+        """Expire the current snapshot; the next reader reloads from the database."""
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = float('-inf')
+
+
+catalog = AdCatalog(ttl_seconds=get_settings().catalog_ttl_seconds)
@@ -0,0 +1,222 @@
+"""Rolling in-memory impression/click counters used for CTR weighting."""
+
+from collections.abc import Collection, Iterable
+from contextlib import ExitStack
+from datetime import UTC, datetime, timedelta
+import threading
+import time
+from typing import Any
+
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import get_settings
+from app.services.analytics import hourly_counts
+from app.services.event_sink import EventSink, click_sink, impression_sink
+from app.services.rollup import hour_bucket
+
+
+class _Ring:
+    """Fixed-size ring of per-bucket counts with a running total."""
+
+    __slots__ = ('counts', 'head', 'total')
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.head = 0  # most recent bucket epoch seen
+        self.total = 0
+
+    def advance(self, epoch: int) -> None:
+        """Move the window forward to ``epoch``, expiring buckets that fell out."""
+        steps = epoch - self.head
+        if steps <= 0:
+            return
+        size = len(self.counts)
+        if steps >= size:
+            self.counts = [0] * size
+            self.total = 0
+        else:
+            for e in range(self.head + 1, epoch + 1):
+                idx = e % size
+                self.total -= self.counts[idx]
+                self.counts[idx] = 0
+        self.head = epoch
+
+    def add(self, epoch: int, n: int) -> None:
+        self.advance(epoch)
+        if self.head - epoch >= len(self.counts):
+            return  # older than the window
+        self.counts[epoch % len(self.counts)] += n
+        self.total += n
+
+
+class RollingCounter:
+    """
+    Sliding-window event counts per key, bucketed into ring buffers.
+
+    The window covers the current (partial) bucket plus the previous
+    ``window_seconds // bucket_seconds - 1`` full buckets.
+    """
+
+    def __init__(self, window_seconds: int, bucket_seconds: int):
+        self.bucket_seconds = bucket_seconds
+        self.size = max(1, window_seconds // bucket_seconds)
+        self._rings: dict[int, _Ring] = {}
+        self._lock = threading.Lock()
+
+    def _epoch(self, at: float | None) -> int:
+        return int(time.time() if at is None else at) // self.bucket_seconds
+
+    def add(self, key: int, n: int = 1, at: float | None = None) -> None:
+        """Count ``n`` events for ``key`` at unix time ``at`` (default: now)."""
+        epoch = self._epoch(at)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = _Ring(self.size)
+                ring.head = epoch
+            ring.add(epoch, n)
+
+    def counts(self, keys: Iterable[int], at: float | None = None) -> dict[int, int]:
+        """Return windowed totals for the given keys (missing keys are omitted)."""
+        epoch = self._epoch(at)
+        out: dict[int, int] = {}
+        with self._lock:
+            for key in keys:
+                ring = self._rings.get(key)
+                if ring is not None:
+                    ring.advance(epoch)
+                    if ring.total:
+                        out[key] = ring.total
+        return out
+
+    def reset(self, keys: Iterable[int]) -> None:
+        """Forget the counts of the given keys."""
+        with self._lock:
+            for key in keys:
+                self._rings.pop(key, None)
+
+
+class CtrCounters:
+    """
+    Per-ad impressions and clicks over the CTR window, kept in memory.
+
+    Seeded from the hourly rollup (all ads at startup, otherwise lazily per zone)
+    and then updated as impressions and clicks are recorded, so
+    reading the counts for a zone costs O(ads-in-zone) and no queries.
+
+    Each ad is re-read from the rollup after ``resync_seconds``, using a query
+    scoped to the ads being served, to pick up traffic recorded by other
+    processes sharing the database. Rows still queued in ``impression_sink`` and
+    ``click_sink`` are not in the rollup yet, so they are added back on top.
+    """
+
+    def __init__(
+        self,
+        days: int = 7,
+        bucket_seconds: int = 3600,
+        resync_seconds: float = 300,
+        impression_sink: EventSink | None = None,
+        click_sink: EventSink | None = None,
+    ):
+        self.days = days
+        self.bucket_seconds = bucket_seconds
+        self.resync_seconds = resync_seconds
+        self.impression_sink = impression_sink
+        self.click_sink = click_sink
+        self.impressions = self._new_counter()
+        self.clicks = self._new_counter()
+        self._bind: object | None = None
+        self._seeded_at: dict[int, float] = {}
+        self._seeded_all_at = float('-inf')
+        self._seed_lock = threading.Lock()
+
+    def _new_counter(self) -> RollingCounter:
+        return RollingCounter(self.days * 86400, self.bucket_seconds)
+
+    def seed(self, session: Session, ad_ids: Collection[int] | None = None) -> None:
+        """Rebuild the counters from the rollup, for all ads or only ``ad_ids``."""
+        since = datetime.now(UTC) - timedelta(days=self.days)
+        with ExitStack() as stack:
+            # No flush may land between reading the rollup and the queues
+            sinks = [s for s in (self.impression_sink, self.click_sink) if s]
+            for sink in sinks:
+                stack.enter_context(sink.paused())
+            rows = hourly_counts(session, since, ad_ids=ad_ids)
+            pending_imps = self._pending(self.impression_sink, ad_ids)
+            pending_clks = self._pending(self.click_sink, ad_ids)
+        now = time.monotonic()
+
+        if ad_ids is None or self._bind is not session.get_bind():
+            impressions, clicks = self._new_counter(), self._new_counter()
+            self._seeded_at = {}
+            self._seeded_all_at = now if ad_ids is None else float('-inf')
+        else:
+            impressions, clicks = self.impressions, self.clicks
+            impressions.reset(ad_ids)
+            clicks.reset(ad_ids)
+
+        for ad_id, hour, imps, clks in rows:
+            at = hour_bucket(hour).timestamp()
+            if imps:
+                impressions.add(ad_id, imps, at=at)
+            if clks:
+                clicks.add(ad_id, clks, at=at)
+        for counter, pending in ((impressions, pending_imps), (clicks, pending_clks)):
+            for row in pending:
+                counter.add(row['ad_id'], at=row['timestamp'].timestamp())
+        for ad_id in ad_ids or ():
+            self._seeded_at[ad_id] = now
+        self.impressions, self.clicks = impressions, clicks
+        self._bind = session.get_bind()
+
+    @staticmethod
+    def _pending(
+        sink: EventSink | None, ad_ids: Collection[int] | None
+    ) -> list[dict[str, Any]]:
+        return sink.pending(ad_ids) if sink is not None else []
+
+    def _stale(self, session: Session, ad_ids: Iterable[int]) -> list[int]:
+        if self._bind is not session.get_bind():
+            return list(ad_ids)
+        cutoff = time.monotonic() - self.resync_seconds
+        default = self._seeded_all_at
+        return [i for i in ad_ids if self._seeded_at.get(i, default) < cutoff]
+
+    def ensure_seeded(self, session: Session, ad_ids: Collection[int]) -> None:
+        """Seed the given ads if they were never loaded or are due for a resync."""
+        if not self._stale(session, ad_ids):
+            return
+        with self._seed_lock:
+            stale = self._stale(session, ad_ids)
+            if stale:
+                self.seed(session, stale)
+
+    def record_impression(self, ad_id: int) -> None:
+        self.impressions.add(ad_id)
+
+    def record_click(self, ad_id: int) -> None:
+        self.clicks.add(ad_id)
+
+    async def counts_for_async(
+        self, session: AsyncSession, ad_ids: Iterable[int]
+    ) -> tuple[dict[int, int], dict[int, int]]:
+        """
+        Return (impressions, clicks) dicts for the given ads only.
+
+        Only (re)seeding touches the database, through ``ensure_seeded``.
+        """
+        ids = list(ad_ids)
+        if self._stale(session, ids):  # type: ignore
+            await session.run_sync(self.ensure_seeded, ids)
+        return self.impressions.counts(ids), self.clicks.counts(ids)
+
+
+_settings = get_settings()
+ctr_counters = CtrCounters(
+    days=_settings.ctr_window_days,
+    bucket_seconds=_settings.ctr_bucket_seconds,
+    resync_seconds=_settings.ctr_resync_seconds,
+    impression_sink=impression_sink,
+    click_sink=click_sink,
+)
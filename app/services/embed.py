@@ -0,0 +1,97 @@
+"""Pre-rendered ``embed.js`` variants served from memory."""
+
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+import gzip
+import re
+import threading
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment
+
+from app import metrics
+from app.http_cache import content_hash, strong_etag
+
+
+@dataclass(frozen=True)
+class EmbedScript:
+    """One rendered variant of the embed script."""
+
+    body: bytes
+    etag: str
+    gzipped: bytes | None
+
+
+class EmbedScripts:
+    """
+    ``embed.js`` rendered once per zone value and kept in memory with its ETag.
+
+    The template output depends only on the ``zone`` query value. The generic
+    variant, the zones in the script's ZONE_MAP and the catalog's zones are
+    rendered by ``prerender()`` at startup and kept for good. Any other zone
+    value comes from the client, so it is rendered on first use into an LRU of
+    ``max_variants`` entries: random zones can only evict each other.
+
+    ``version`` hashes the template source, so ``/embed.<version>.js`` changes
+    whenever the script does and can be cached as immutable. Editing the
+    template therefore requires a restart, like any other deploy.
+    """
+
+    def __init__(
+        self, env: Environment, name: str = 'embed.js.jinja2', max_variants: int = 1024
+    ):
+        self.env = env
+        self.name = name
+        self.max_variants = max_variants
+        source, _, _ = env.loader.get_source(env, name)  # type: ignore
+        self.source = source
+        self.version = content_hash(source.encode())
+        self._pinned: dict[int | None, EmbedScript] = {}
+        self._recent: OrderedDict[int | None, EmbedScript] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def known_zones(self) -> list[int]:
+        """Zone ids listed in the script's ZONE_MAP."""
+        return [int(z) for z in re.findall(r'"(\d+)"\s*:\s*\{', self.source)]
+
+    def get(self, zone: int | None) -> EmbedScript:
+        """Return the rendered script for ``zone`` (None for the generic one)."""
+        script = self._pinned.get(zone)
+        if script is None:
+            with self._lock:
+                script = self._recent.get(zone)
+                if script is not None:
+                    self._recent.move_to_end(zone)
+        metrics.cache_lookup('embed', script is not None)
+        if script is None:
+            script = self._render(zone)
+            with self._lock:
+                self._recent[zone] = script
+                while len(self._recent) > self.max_variants:
+                    self._recent.popitem(last=False)
+        return script
+
+    def prerender(self, zones: Iterable[int] = ()) -> int:
+        """Render and pin the generic variant, the ZONE_MAP zones and ``zones``."""
+        for zone in (None, *self.known_zones(), *zones):
+            if zone not in self._pinned:
+                self._pinned[zone] = self._render(zone)
+        return len(self._pinned)
+
+    def _render(self, zone: int | None) -> EmbedScript:
+        body = self.env.get_template(self.name).render(zone=zone).encode()
+        gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        return EmbedScript(
+            body=body,
+            etag=strong_etag(body),
+            gzipped=gzipped if len(gzipped) < len(body) else None,
+        )
+
+    def url(self, zone: int | None = None) -> str:
+        """Versioned, immutable-cacheable URL of the script for ``zone``."""
+        path = f'/embed.{self.version}.js'
+        return path if zone is None else f'{path}?zone={zone}'
+
+
+embed_scripts = EmbedScripts(Jinja2Templates(directory='templates').env)
@@ -0,0 +1,330 @@
+"""Write-behind sinks that batch tracking rows into bulk INSERTs."""
+
+from collections import deque
+from collections.abc import Callable, Collection, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import Connection, Engine, insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel
+
+from app.config import get_settings
+from app.models import Click, Impression
+from app.services.rollup import bump_hourly, count_rows
+
+logger = logging.getLogger(__name__)
+
+# Keep multi-row VALUES statements under SQLite's default 999 bound parameters
+_MAX_ROWS_PER_STATEMENT = 400
+
+
+class EventSink:
+    """
+    In-process queue of rows for one table, flushed by a background thread.
+
+    Rows are flushed as multi-row INSERTs when ``batch_size`` rows are queued or
+    every ``flush_interval_ms``, whichever comes first. ``submit`` returns False
+    when the sink is not running or the buffer is full, so callers can fall back
+    to a synchronous write instead of losing the event.
+
+    A batch that fails is put back at the head of the queue and retried. A batch
+    a constraint rejects is retried row by row instead, and the rows that still
+    fail are dead-lettered to ``<spool_dir>/<table>.rejected.jsonl``. Rows that
+    cannot be written at shutdown are appended to ``<spool_dir>/<table>.jsonl``
+    and replayed on the next start. A replay that fails halfway keeps the file,
+    so some rows may be written twice.
+
+    Delivery is best-effort, not at-least-once: the response has already gone
+    out when a row is queued, so a crash loses the rows still in memory (up to
+    ``flush_interval_ms`` of traffic, or more while the database is down), and
+    without a spool dir so does a shutdown with the database unreachable.
+    """
+
+    def __init__(
+        self,
+        model: type[SQLModel],
+        *,
+        batch_size: int = 500,
+        flush_interval_ms: int = 250,
+        max_buffer: int = 50_000,
+        spool_dir: str | None = None,
+        on_flush: Callable[[Connection, list[dict[str, Any]]], None] | None = None,
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_buffer = max_buffer
+        self.spool_dir = spool_dir
+        self.on_flush = on_flush  # runs in the same transaction as the INSERTs
+        self._buffer: deque[dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.RLock()  # held while a batch is out of _buffer
+        self._engine: Engine | None = None
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        # Stats
+        self.flushed = 0
+        self.flushes = 0
+        self.overflows = 0
+        self.errors = 0
+        self.dead_lettered = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, engine: Engine) -> None:
+        """Start the background writer against the given engine."""
+        if self._thread is not None:
+            return
+        self._engine = engine
+        self._stopping = False
+        self._replay_spool()
+        self._thread = threading.Thread(
+            target=self._run, name=f'{self.model.__tablename__}-sink', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the writer and flush whatever is still buffered."""
+        thread = self._thread
+        if thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        thread.join(timeout)
+        self._thread = None
+        self.flush()
+        self._spool_remaining()
+
+    def submit(self, row: dict[str, Any]) -> bool:
+        """Queue a row for writing; False means the caller must write it itself."""
+        if self._thread is None:
+            return False
+        with self._cond:
+            if len(self._buffer) >= self.max_buffer:
+                self.overflows += 1
+                return False
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def flush(self) -> int:
+        """Write out everything currently buffered; returns the number of rows."""
+        total = 0
+        while True:
+            with self._flush_lock:
+                with self._cond:
+                    n = min(len(self._buffer), self.batch_size)
+                    batch = [self._buffer.popleft() for _ in range(n)]
+                if not batch:
+                    return total
+                done = self._write(batch)
+                total += done
+                if done < len(batch):
+                    with self._cond:
+                        self._buffer.extendleft(reversed(batch[done:]))
+                    return total
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """
+        Hold off flushes for the duration of the block.
+
+        Inside it no row is being written, so every row submitted so far is
+        either in the table or returned by ``pending``.
+        """
+        with self._flush_lock:
+            yield
+
+    def pending(self, ad_ids: Collection[int] | None = None) -> list[dict[str, Any]]:
+        """Return the queued rows, of all ads or only ``ad_ids``."""
+        with self._cond:
+            if ad_ids is None:
+                return list(self._buffer)
+            ids = set(ad_ids)
+            return [row for row in self._buffer if row['ad_id'] in ids]
+
+    def _write(self, batch: list[dict[str, Any]]) -> int:
+        """
+        Write a batch; returns how many of its leading rows are done with.
+
+        A batch rejected by a constraint (e.g. a foreign key to an ad deleted
+        while its rows were buffered) is retried row by row, and the rows that
+        still fail are dead-lettered rather than retried forever. Any other
+        error is treated as transient: the rest of the batch is to be retried.
+        """
+        assert self._engine is not None
+        started = time.perf_counter()
+        with self._flush_lock:
+            try:
+                self._insert(batch)
+            except IntegrityError:
+                self.errors += 1
+                logger.warning(
+                    'Constraint violation in a batch of %d %s rows; '
+                    'retrying row by row',
+                    len(batch),
+                    self.model.__tablename__,
+                )
+                done = self._write_each(batch)
+                if done < len(batch):
+                    return done
+            except Exception:
+                self.errors += 1
+                logger.exception(
+                    'Failed to flush %d %s rows', len(batch), self.model.__tablename__
+                )
+                return 0
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushed += len(batch)
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        return len(batch)
+
+    def _insert(self, batch: list[dict[str, Any]]) -> None:
+        assert self._engine is not None
+        with Session(self._engine) as session:
+            for i in range(0, len(batch), _MAX_ROWS_PER_STATEMENT):
+                chunk = batch[i : i + _MAX_ROWS_PER_STATEMENT]
+                session.execute(insert(self.model).values(chunk))
+            if self.on_flush is not None:
+                self.on_flush(session.connection(), batch)
+            session.commit()
+
+    def _write_each(self, batch: list[dict[str, Any]]) -> int:
+        """Write rows one at a time, dead-lettering those a constraint rejects."""
+        for i, row in enumerate(batch):
+            try:
+                self._insert([row])
+            except IntegrityError:
+                self._dead_letter(row)
+            except Exception:
+                logger.exception('Failed to write a %s row', self.model.__tablename__)
+                return i
+        return len(batch)
+
+    def _dead_letter(self, row: dict[str, Any]) -> None:
+        """Set aside a row the database rejects, in ``<table>.rejected.jsonl``."""
+        self.dead_lettered += 1
+        line = json.dumps(row, default=datetime.isoformat)
+        if not self.spool_dir:
+            logger.error('Dropping rejected %s row %s', self.model.__tablename__, line)
+            return
+        path = os.path.join(
+            self.spool_dir, f'{self.model.__tablename__}.rejected.jsonl'
+        )
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+        logger.error('Rejected %s row written to %s', self.model.__tablename__, path)
+
+    @property
+    def _spool_path(self) -> str | None:
+        if not self.spool_dir:
+            return None
+        return os.path.join(self.spool_dir, f'{self.model.__tablename__}.jsonl')
+
+    def _spool_remaining(self) -> None:
+        """Persist rows that could not be written so the next start replays them."""
+        path = self._spool_path
+        with self._cond:
+            rows = list(self._buffer)
+            if path is None or not rows:
+                if rows:
+                    logger.error(
+                        'Dropping %d unwritten %s rows (no spool_dir configured)',
+                        len(rows),
+                        self.model.__tablename__,
+                    )
+                return
+            self._buffer.clear()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, default=datetime.isoformat) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        logger.warning(
+            'Spooled %d %s rows to %s', len(rows), self.model.__tablename__, path
+        )
+
+    def _replay_spool(self) -> None:
+        """Write rows spooled by a previous shutdown, removing the file on success."""
+        path = self._spool_path
+        if path is None or not os.path.exists(path):
+            return
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        for row in rows:
+            if isinstance(row.get('timestamp'), str):
+                row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+        for i in range(0, len(rows), self.batch_size):
+            batch = rows[i : i + self.batch_size]
+            if self._write(batch) < len(batch):
+                return  # keep the file; the next start retries it
+        os.remove(path)
+        logger.info('Replayed %d spooled %s rows', len(rows), self.model.__tablename__)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._buffer) < self.batch_size and not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            if self._buffer and not self.flush() and not stopping:
+                time.sleep(self.flush_interval)  # back off after a failed write
+            if stopping:
+                return
+
+    def stats(self) -> dict[str, int | float]:
+        """Queue depth and flush statistics for monitoring."""
+        return {
+            'queue_depth': len(self._buffer),
+            'flushed': self.flushed,
+            'flushes': self.flushes,
+            'overflows': self.overflows,
+            'errors': self.errors,
+            'dead_lettered': self.dead_lettered,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+            'max_flush_ms': round(self.max_flush_ms, 3),
+        }
+
+
+def _rollup_impressions(conn: Connection, rows: list[dict[str, Any]]) -> None:
+    bump_hourly(conn, impressions=count_rows(rows))
+
+
+def _rollup_clicks(conn: Connection, rows: list[dict[str, Any]]) -> None:
+    bump_hourly(conn, clicks=count_rows(rows))
+
+
+_settings = get_settings()
+impression_sink = EventSink(
+    Impression,
+    batch_size=_settings.impression_batch_size,
+    flush_interval_ms=_settings.impression_flush_interval_ms,
+    max_buffer=_settings.impression_buffer_max,
+    spool_dir=_settings.tracking_spool_dir,
+    on_flush=_rollup_impressions,
+)
+click_sink = EventSink(
+    Click,
+    batch_size=_settings.click_batch_size,
+    flush_interval_ms=_settings.click_flush_interval_ms,
+    max_buffer=_settings.click_buffer_max,
+    spool_dir=_settings.tracking_spool_dir,
+    on_flush=_rollup_clicks,
+)
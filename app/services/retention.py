@@ -0,0 +1,244 @@
+"""Retention and compaction of tracking data.
+
+Raw ``Impression``/``Click`` rows are already counted in the hourly rollup when
+they are written, so once they are older than ``RAW_EVENT_TTL_DAYS`` they are
+simply deleted. Hourly rollup rows older than ``ROLLUP_HOURLY_TTL_DAYS`` are
+folded into per-day ``AdStatsDaily`` summaries. Deletes run in bounded chunks,
+each in its own short transaction, and SQLite space is reclaimed with
+``PRAGMA incremental_vacuum``.
+
+Usage:
+    uv run python -m app.services.retention [--enable-incremental-vacuum]
+"""
+
+import argparse
+from collections import Counter
+from dataclasses import asdict, dataclass
+from datetime import UTC, date, datetime, time as dt_time, timedelta
+import logging
+import threading
+import time
+
+from sqlalchemy import Engine, delete
+from sqlmodel import Session, SQLModel, select
+
+from app.config import Settings, get_settings
+from app.models import AdStatsDaily, AdStatsHourly, Click, Impression
+from app.services.rollup import add_counts
+
+logger = logging.getLogger(__name__)
+
+# SQLite PRAGMA auto_vacuum value for INCREMENTAL
+_AUTO_VACUUM_INCREMENTAL = 2
+
+
+@dataclass
+class RetentionReport:
+    """What a retention run did."""
+
+    impressions_deleted: int = 0
+    clicks_deleted: int = 0
+    days_compacted: int = 0
+    hourly_rows_compacted: int = 0
+    pages_vacuumed: int = 0
+
+
+def delete_expired(
+    engine: Engine,
+    model: type[SQLModel],
+    cutoff: datetime,
+    chunk_size: int = 5000,
+    pause: float = 0.05,
+) -> int:
+    """Delete rows of a tracking table older than ``cutoff``, one chunk per commit."""
+    total = 0
+    while True:
+        with Session(engine) as session:
+            expired = (
+                select(model.id)  # type: ignore
+                .where(model.timestamp < cutoff)  # type: ignore
+                .limit(chunk_size)
+            )
+            result = session.exec(  # type: ignore
+                delete(model).where(model.id.in_(expired))  # type: ignore
+            )
+            session.commit()
+        deleted = result.rowcount or 0
+        total += deleted
+        if deleted < chunk_size:
+            return total
+        time.sleep(pause)  # let request writers take the lock between chunks
+
+
+def compact_hourly(engine: Engine, cutoff: date) -> tuple[int, int]:
+    """
+    Fold hourly rollup rows before ``cutoff`` into daily summaries, a day at a time.
+
+    Returns (days compacted, hourly rows removed).
+    """
+    days = rows_removed = 0
+    while True:
+        with Session(engine) as session:
+            oldest = session.exec(
+                select(AdStatsHourly.hour).order_by(AdStatsHourly.hour).limit(1)  # type: ignore
+            ).first()
+            if oldest is None or oldest.date() >= cutoff:
+                return days, rows_removed
+            start = datetime.combine(oldest.date(), dt_time.min, tzinfo=UTC)
+            end = start + timedelta(days=1)
+            in_day = (AdStatsHourly.hour >= start, AdStatsHourly.hour < end)
+
+            # Lock the day's rows so concurrent runs (other machines) can't fold
+            # them twice; the loser finds them already deleted.
+            rows = session.exec(
+                select(
+                    AdStatsHourly.ad_id,
+                    AdStatsHourly.impressions,
+                    AdStatsHourly.clicks,
+                )
+                .where(*in_day)
+                .with_for_update()
+            ).all()
+            imps: Counter[int] = Counter()
+            clks: Counter[int] = Counter()
+            for ad_id, i, c in rows:
+                imps[ad_id] += i
+                clks[ad_id] += c
+            add_counts(
+                session.connection(),
+                AdStatsDaily.__table__,  # type: ignore
+                [
+                    {
+                        'ad_id': ad_id,
+                        'day': start.date(),
+                        'impressions': imps[ad_id],
+                        'clicks': clks[ad_id],
+                    }
+                    for ad_id in imps.keys() | clks.keys()
+                ],
+            )
+            session.exec(delete(AdStatsHourly).where(*in_day))  # type: ignore
+            session.commit()
+        days += 1
+        rows_removed += len(rows)
+
+
+def incremental_vacuum(engine: Engine, max_pages: int = 10_000) -> int:
+    """
+    Return free SQLite pages to the filesystem, at most ``max_pages`` per run.
+
+    Only works once the database uses ``auto_vacuum=INCREMENTAL``; see
+    ``enable_incremental_vacuum``. Returns the number of pages released.
+    """
+    if engine.dialect.name != 'sqlite':
+        return 0
+    with engine.connect() as conn:
+        mode = conn.exec_driver_sql('PRAGMA auto_vacuum').scalar()
+        if mode != _AUTO_VACUUM_INCREMENTAL:
+            logger.info(
+                'SQLite auto_vacuum is %s, not INCREMENTAL; run the retention CLI '
+                'with --enable-incremental-vacuum once to convert the database',
+                mode,
+            )
+            return 0
+        before = conn.exec_driver_sql('PRAGMA freelist_count').scalar() or 0
+        # Small steps keep each write lock short
+        limit = min(before, max_pages)
+        # sqlite3 steps a statement without result columns only once, which
+        # frees a single page; executescript() runs it to completion
+        raw = conn.connection.dbapi_connection
+        for start in range(0, limit, 1000):
+            pages = min(1000, limit - start)
+            raw.executescript(f'PRAGMA incremental_vacuum({pages});')  # type: ignore
+            conn.commit()
+        after = conn.exec_driver_sql('PRAGMA freelist_count').scalar() or 0
+    return before - after
+
+
+def enable_incremental_vacuum(engine: Engine) -> None:
+    """Switch an existing SQLite database to auto_vacuum=INCREMENTAL (full VACUUM)."""
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.connect() as conn:
+        conn.exec_driver_sql(f'PRAGMA auto_vacuum = {_AUTO_VACUUM_INCREMENTAL}')
+        conn.commit()
+        # Changing auto_vacuum on a non-empty database only applies after VACUUM,
+        # which can't run inside a transaction
+        conn.execution_options(isolation_level='AUTOCOMMIT').exec_driver_sql('VACUUM')
+
+
+def run_retention(engine: Engine, settings: Settings | None = None) -> RetentionReport:
+    """Run one full retention pass: raw deletes, hourly compaction, vacuum."""
+    settings = settings or get_settings()
+    now = datetime.now(UTC)
+    report = RetentionReport()
+
+    raw_cutoff = now - timedelta(days=settings.raw_event_ttl_days)
+    chunk = settings.retention_chunk_size
+    report.impressions_deleted = delete_expired(engine, Impression, raw_cutoff, chunk)
+    report.clicks_deleted = delete_expired(engine, Click, raw_cutoff, chunk)
+
+    hourly_cutoff = (now - timedelta(days=settings.rollup_hourly_ttl_days)).date()
+    report.days_compacted, report.hourly_rows_compacted = compact_hourly(
+        engine, hourly_cutoff
+    )
+
+    report.pages_vacuumed = incremental_vacuum(engine)
+    logger.info('Retention run: %s', asdict(report))
+    return report
+
+
+class RetentionJob:
+    """Runs ``run_retention`` every ``interval_minutes`` on a daemon thread."""
+
+    def __init__(self, interval_minutes: float):
+        self.interval = interval_minutes * 60
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, engine: Engine) -> None:
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(engine,), name='retention', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=30)
+        self._thread = None
+
+    def _run(self, engine: Engine) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                run_retention(engine)
+            except Exception:
+                logger.exception('Retention run failed')
+
+
+retention_job = RetentionJob(get_settings().retention_interval_minutes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run tracking data retention once.')
+    parser.add_argument(
+        '--enable-incremental-vacuum',
+        action='store_true',
+        help='convert an existing SQLite database to auto_vacuum=INCREMENTAL first',
+    )
+    args = parser.parse_args()
+
+    from app.database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(engine)
+    print(asdict(run_retention(engine)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Incremental maintenance of the hourly impression/click rollup."""
+
+from collections import Counter
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import Connection, Table, event, func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from app.models import AdStatsHourly, Click, Impression
+
+HourKey = tuple[int, datetime]
+
+# 4 bound parameters per row keeps each upsert under SQLite's default limit of 999
+_UPSERT_CHUNK = 200
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    """Truncate a timestamp to the start of its UTC hour (naive values are UTC)."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=UTC)
+    return ts.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+
+
+def add_counts(conn: Connection, table: Table, rows: list[dict[str, Any]]) -> None:
+    """
+    Upsert rows into a rollup table, adding to the counts of existing keys.
+
+    ``table`` has a primary key of (ad_id, <period>) plus ``impressions`` and
+    ``clicks`` columns; each key must appear at most once in ``rows``.
+    """
+    if not rows:
+        return
+    keys = [c.name for c in table.primary_key.columns]
+    dialect = conn.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert_ = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        for i in range(0, len(rows), _UPSERT_CHUNK):
+            stmt = insert_(table).values(rows[i : i + _UPSERT_CHUNK])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=keys,
+                set_={
+                    'impressions': table.c.impressions + stmt.excluded.impressions,
+                    'clicks': table.c.clicks + stmt.excluded.clicks,
+                },
+            )
+            conn.execute(stmt)
+        return
+
+    # Portable fallback: update, then insert the keys that did not exist yet
+    for row in rows:
+        result = conn.execute(
+            update(table)
+            .where(*(table.c[k] == row[k] for k in keys))
+            .values(
+                impressions=table.c.impressions + row['impressions'],
+                clicks=table.c.clicks + row['clicks'],
+            )
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(table).values(**row))
+
+
+def bump_hourly(
+    conn: Connection,
+    impressions: Counter[HourKey] | None = None,
+    clicks: Counter[HourKey] | None = None,
+) -> None:
+    """Add the given per-(ad, hour) counts to the rollup in one upsert."""
+    impressions = impressions or Counter()
+    clicks = clicks or Counter()
+    rows = [
+        {
+            'ad_id': ad_id,
+            'hour': hour,
+            'impressions': impressions[(ad_id, hour)],
+            'clicks': clicks[(ad_id, hour)],
+        }
+        for ad_id, hour in impressions.keys() | clicks.keys()
+    ]
+    add_counts(conn, AdStatsHourly.__table__, rows)  # type: ignore
+
+
+def count_rows(rows: Iterable[Any]) -> Counter[HourKey]:
+    """Count tracking rows (ORM objects or dicts) per (ad_id, hour)."""
+    counts: Counter[HourKey] = Counter()
+    for row in rows:
+        if isinstance(row, dict):
+            ad_id, ts = row['ad_id'], row['timestamp']
+        else:
+            ad_id, ts = row.ad_id, row.timestamp
+        counts[(ad_id, hour_bucket(ts))] += 1
+    return counts
+
+
+@event.listens_for(OrmSession, 'after_flush')
+def _rollup_flushed_events(session: OrmSession, flush_context: Any) -> None:
+    """Keep the rollup in the same transaction as ORM-inserted tracking rows."""
+    new = session.new
+    if not new:
+        return
+    imps = [obj for obj in new if isinstance(obj, Impression)]
+    clks = [obj for obj in new if isinstance(obj, Click)]
+    if imps or clks:
+        bump_hourly(session.connection(), count_rows(imps), count_rows(clks))
+
+
+def _hour_expr(column: Any, dialect: str) -> Any:
+    if dialect == 'sqlite':
+        return func.strftime('%Y-%m-%d %H:00:00', column)
+    return func.date_trunc('hour', column)
+
+
+def backfill_hourly(session: Session) -> int:
+    """
+    Build the rollup from raw rows when it is empty (e.g. an existing database).
+
+    Returns the number of rollup rows written.
+    """
+    if session.exec(select(AdStatsHourly.ad_id).limit(1)).first() is not None:
+        return 0
+
+    dialect = session.get_bind().dialect.name
+    counters: list[Counter[HourKey]] = []
+    for model in (Impression, Click):
+        bucket = _hour_expr(model.timestamp, dialect)
+        rows = session.exec(
+            select(model.ad_id, bucket, func.count(model.id)).group_by(  # type: ignore
+                model.ad_id, bucket
+            )
+        ).all()
+        counts: Counter[HourKey] = Counter()
+        for ad_id, hour, n in rows:
+            if isinstance(hour, str):
+                hour = datetime.fromisoformat(hour)
+            counts[(ad_id, hour_bucket(hour))] += n
+        counters.append(counts)
+
+    bump_hourly(session.connection(), *counters)
+    session.commit()
+    return len(counters[0].keys() | counters[1].keys())
@@ -0,0 +1,261 @@
+"""Offline comparison of ad-selection strategies on recorded traffic.
+
+A replay walks a zone's ``AdStatsHourly`` rows hour by hour. Each hour's
+logged impressions are served again by the strategy under test, among the ads
+that were live that hour (those with logged impressions). A simulated pick is
+clicked with that ad's CTR for the hour, shrunk toward its CTR over the whole
+period so thinly served hours don't read as 0% or 100%. Strategies only see
+their own simulated counters, refreshed every ``batch`` picks like the zone
+sampler, so they start cold and learn as the replay goes.
+
+Results report sampled and expected clicks, and the regret against an oracle
+that always shows the live ad with the best CTR for the hour.
+
+Usage:
+    uv run python -m app.services.simulation --zone 3 [--days 30] [--runs 3]
+"""
+
+import argparse
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+from sqlmodel import Session, col, select
+
+from app.config import get_settings
+from app.models import Ad, AdStatsHourly
+from app.services.ad_selection import STRATEGIES, SelectionStrategy
+from app.services.rollup import hour_bucket
+
+# Impressions' worth of prior pulling an ad's CTR toward the zone's (and an
+# hour's toward the ad's)
+SMOOTHING_IMPRESSIONS = 100.0
+
+
+@dataclass
+class ZoneHistory:
+    """Logged hourly traffic of one zone, as (hours, ads) matrices."""
+
+    ad_ids: list[int]
+    weights: np.ndarray
+    hours: list[datetime]
+    impressions: np.ndarray
+    clicks: np.ndarray
+
+    def click_rates(self) -> np.ndarray:
+        """Return the smoothed CTR of every ad in every hour."""
+        total_imps = self.impressions.sum()
+        zone_ctr = self.clicks.sum() / total_imps if total_imps else 0.0
+        k = SMOOTHING_IMPRESSIONS
+        ad_ctr = (self.clicks.sum(axis=0) + k * zone_ctr) / (
+            self.impressions.sum(axis=0) + k
+        )
+        rates = (self.clicks + k * ad_ctr) / (self.impressions + k)
+        return np.clip(rates, 0.0, 1.0)
+
+
+def load_history(session: Session, zone_id: int, since: datetime) -> ZoneHistory:
+    """
+    Load the hourly rollup of a zone's ads from ``since`` on.
+
+    Args:
+        session: Database session.
+        zone_id: Zone to replay.
+        since: Start of the first hour to include.
+
+    Returns:
+        The zone's history; hours without any of its traffic are left out.
+    """
+    ads = session.exec(select(Ad.id, Ad.weight).where(Ad.zone_id == zone_id)).all()
+    ad_ids = [ad_id for ad_id, _ in ads]
+    rows = session.exec(
+        select(
+            AdStatsHourly.hour,
+            AdStatsHourly.ad_id,
+            AdStatsHourly.impressions,
+            AdStatsHourly.clicks,
+        )
+        .where(
+            col(AdStatsHourly.ad_id).in_(ad_ids),
+            AdStatsHourly.hour >= hour_bucket(since),
+        )
+        .order_by(col(AdStatsHourly.hour))
+    ).all()
+
+    hours = sorted({row[0] for row in rows})
+    hour_index = {hour: h for h, hour in enumerate(hours)}
+    ad_index = {ad_id: a for a, ad_id in enumerate(ad_ids)}
+    impressions = np.zeros((len(hours), len(ad_ids)))
+    clicks = np.zeros_like(impressions)
+    for hour, ad_id, imps, clks in rows:
+        impressions[hour_index[hour], ad_index[ad_id]] = imps
+        clicks[hour_index[hour], ad_index[ad_id]] = clks
+    return ZoneHistory(
+        ad_ids=ad_ids,  # type: ignore
+        weights=np.array([weight for _, weight in ads], dtype=float),
+        hours=hours,
+        impressions=impressions,
+        clicks=clicks,
+    )
+
+
+@dataclass
+class SimulationResult:
+    """Totals of replaying a zone's history with one strategy."""
+
+    strategy: str
+    impressions: int
+    clicks: float  # sampled (mean over runs)
+    expected_clicks: float
+    oracle_clicks: float
+
+    @property
+    def ctr(self) -> float:
+        return self.expected_clicks / self.impressions if self.impressions else 0.0
+
+    @property
+    def regret(self) -> float:
+        return self.oracle_clicks - self.expected_clicks
+
+
+def simulate(
+    history: ZoneHistory,
+    strategy: SelectionStrategy,
+    batch: int = 1024,
+    traffic: float = 1.0,
+    rng: np.random.Generator | None = None,
+) -> SimulationResult:
+    """
+    Replay ``history`` with ``strategy``.
+
+    Args:
+        history: Logged traffic of the zone.
+        strategy: Strategy under test.
+        batch: Picks drawn per counter snapshot.
+        traffic: Share of the logged impressions to replay (for quick runs).
+        rng: Random generator (a fresh unseeded one by default).
+
+    Returns:
+        The run's totals.
+    """
+    rng = rng or np.random.default_rng()
+    rates = history.click_rates()
+    n = len(history.ad_ids)
+    imps = np.zeros(n)
+    clks = np.zeros(n)
+    expected = oracle = 0.0
+    served = 0
+
+    for h in range(len(history.hours)):
+        live = history.impressions[h] > 0
+        weights = np.where(live, history.weights, 0.0)
+        remaining = int(round(history.impressions[h].sum() * traffic))
+        if not remaining or not live.any():
+            continue
+        oracle += remaining * float(rates[h][live].max())
+        served += remaining
+        while remaining:
+            size = min(batch, remaining)
+            picks = strategy.choose(weights, imps, clks, size, rng)
+            shown = np.bincount(picks, minlength=n)
+            clicked = rng.binomial(shown, rates[h])
+            expected += float(shown @ rates[h])
+            imps += shown
+            clks += clicked
+            remaining -= size
+
+    return SimulationResult(
+        strategy=strategy.name,
+        impressions=served,
+        clicks=float(clks.sum()),
+        expected_clicks=expected,
+        oracle_clicks=oracle,
+    )
+
+
+def compare(
+    history: ZoneHistory,
+    strategies: Sequence[SelectionStrategy],
+    runs: int = 3,
+    batch: int = 1024,
+    traffic: float = 1.0,
+    seed: int | None = None,
+) -> list[SimulationResult]:
+    """Replay ``history`` ``runs`` times per strategy and average the totals."""
+    rng = np.random.default_rng(seed)
+    results = []
+    for strategy in strategies:
+        trials = [
+            simulate(history, strategy, batch=batch, traffic=traffic, rng=rng)
+            for _ in range(runs)
+        ]
+        results.append(
+            SimulationResult(
+                strategy=strategy.name,
+                impressions=trials[0].impressions,
+                clicks=float(np.mean([t.clicks for t in trials])),
+                expected_clicks=float(np.mean([t.expected_clicks for t in trials])),
+                oracle_clicks=trials[0].oracle_clicks,
+            )
+        )
+    return results
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(
+        description="Compare ad-selection strategies on a zone's hourly rollup."
+    )
+    parser.add_argument('--zone', type=int, required=True, help='zone id')
+    parser.add_argument('--days', type=float, default=30, help='history to replay')
+    parser.add_argument(
+        '--strategy',
+        action='append',
+        choices=sorted(STRATEGIES),
+        help='strategy to run (repeatable; default: all)',
+    )
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--batch', type=int, default=settings.sampler_batch_size)
+    parser.add_argument(
+        '--traffic', type=float, default=1.0, help='share of impressions to replay'
+    )
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    from app.database import engine
+
+    since = datetime.now(UTC) - timedelta(days=args.days)
+    with Session(engine) as session:
+        history = load_history(session, args.zone, hour_bucket(since))
+    if not history.hours:
+        raise SystemExit(
+            f'No rollup rows for zone {args.zone} in the last {args.days} days'
+        )
+
+    strategies = [
+        STRATEGIES[name].from_settings(settings) for name in args.strategy or STRATEGIES
+    ]
+    logged_imps = int(history.impressions.sum())
+    print(
+        f'zone {args.zone}: {len(history.ad_ids)} ads, {len(history.hours)} hours, '
+        f'{logged_imps} impressions, logged CTR '
+        f'{history.clicks.sum() / logged_imps:.4%}'
+    )
+    for result in compare(
+        history,
+        strategies,
+        runs=args.runs,
+        batch=args.batch,
+        traffic=args.traffic,
+        seed=args.seed,
+    ):
+        print(
+            f'{result.strategy:<15} CTR {result.ctr:.4%}  '
+            f'clicks {result.clicks:.1f} (expected {result.expected_clicks:.1f})  '
+            f'regret {result.regret:.1f} of {result.oracle_clicks:.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
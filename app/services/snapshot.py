@@ -0,0 +1,65 @@
+"""Shared, periodically recomputed snapshots of expensive results."""
+
+from collections.abc import Callable
+import threading
+import time
+from typing import Generic, TypeVar
+
+from app import metrics
+
+T = TypeVar('T')
+
+
+class Snapshot(Generic[T]):
+    """
+    A value recomputed at most once per ``ttl_seconds``, however many callers ask.
+
+    While one caller recomputes an expired value, concurrent callers get the
+    previous value instead of queueing behind the recomputation. ``key`` ties the
+    value to its source (e.g. the database bind); a different key forces a
+    recompute. A ``name`` reports hits and misses to ``app.metrics``.
+    """
+
+    def __init__(self, ttl_seconds: float, name: str | None = None):
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._lock = threading.Lock()
+        self._value: T | None = None
+        self._key: object | None = None
+        self._computed_at = float('-inf')
+
+    def get(self, compute: Callable[[], T], key: object | None = None) -> T:
+        value = self._value
+        usable = value is not None and key is self._key
+        if usable and time.monotonic() - self._computed_at <= self.ttl_seconds:
+            self._count(True)
+            return value  # type: ignore
+        if usable:
+            if not self._lock.acquire(blocking=False):
+                self._count(True)
+                return value  # type: ignore  # someone else is recomputing
+        else:
+            self._lock.acquire()
+        try:
+            # Re-check: another caller may have finished while we waited
+            if (
+                self._value is not None
+                and key is self._key
+                and time.monotonic() - self._computed_at <= self.ttl_seconds
+            ):
+                self._count(True)
+                return self._value
+            self._count(False)
+            value = compute()
+            self._value, self._key = value, key
+            self._computed_at = time.monotonic()
+            return value
+        finally:
+            self._lock.release()
+
+    def _count(self, hit: bool) -> None:
+        if self.name is not None:
+            metrics.cache_lookup(self.name, hit)
+
+    def invalidate(self) -> None:
+        self._computed_at = float('-inf')
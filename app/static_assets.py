@@ -0,0 +1,86 @@
+"""Build step writing precompressed siblings of static assets.
+
+For every compressible file under the static directory, writes ``<file>.gz``
+and, when the optional ``brotli`` package is installed, ``<file>.br``, but only
+when the compressed copy is actually smaller. ``CachedStaticFiles`` serves these
+siblings to clients that accept the encoding.
+
+Usage:
+    uv run python -m app.static_assets [static]
+"""
+
+import argparse
+import gzip
+import logging
+import os
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Text formats; images and fonts other than SVG are already compressed
+COMPRESSIBLE = ('.css', '.js', '.mjs', '.svg', '.html', '.txt', '.json', '.xml')
+
+# Content-Encoding -> sibling suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _compressors():
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+def precompress(directory: str = 'static', min_size: int = 256) -> list[str]:
+    """
+    Write missing or outdated compressed siblings under ``directory``.
+
+    Args:
+        directory: Root of the static files.
+        min_size: Files smaller than this are left alone.
+
+    Returns:
+        Paths of the files written.
+    """
+    written = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            if stat.st_size < min_size:
+                continue
+            data = None
+            for suffix, compress in _compressors():
+                target = path + suffix
+                if os.path.exists(target) and os.stat(target).st_mtime >= stat.st_mtime:
+                    continue
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                compressed = compress(data)
+                if len(compressed) >= len(data):
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(compressed)
+                logger.info('%s: %d -> %d bytes', target, len(data), len(compressed))
+                written.append(target)
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Precompress static assets.')
+    parser.add_argument('directory', nargs='?', default='static')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if brotli is None:
+        logger.info('brotli is not installed; writing .gz files only')
+    print(f'{len(precompress(args.directory))} file(s) written')
+
+
+if __name__ == '__main__':
+    main()
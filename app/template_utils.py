@@ -6,12 +6,14 @@ from fastapi import Request
 from fastapi.templating import Jinja2Templates
 
 from app.config import get_settings
+from app.services.embed import embed_scripts
 
 
 def create_templates(directory: str = 'templates') -> Jinja2Templates:
     """Create Jinja2Templates instance with settings injected into all contexts."""
-    settings = get_settings()
     tmpl = Jinja2Templates(directory=directory)
+    # {{ embed_src(zone) }}: content-hashed, immutable-cacheable embed.js URL
+    tmpl.env.globals['embed_src'] = embed_scripts.url
 
     # Store original TemplateResponse method
     original_response = tmpl.TemplateResponse
@@ -24,7 +26,7 @@ def create_templates(directory: str = 'templates') -> Jinja2Templates:
             context = {}
         # Add settings to context if not already present
         if 'settings' not in context:
-            context['settings'] = settings
+            context['settings'] = get_settings()
         return original_response(request=request, name=name, context=context, **kwargs)
 
     tmpl.TemplateResponse = custom_response  # type: ignore
@@ -0,0 +1,211 @@
+"""Latency and throughput of the hot endpoints, checked against a stored baseline.
+
+Seeds a file-backed SQLite database with zones, ads and tracking rows (the
+same synthetic data as ``bench_indexes.py``), starts the app under uvicorn on
+it, and drives each endpoint in turn from concurrent client threads. Reports
+requests/s and p50/p95/p99 latency per endpoint, and compares them with a
+stored baseline: the run fails (exit status 1) when an endpoint's p95 rises,
+or its throughput falls, by more than ``--threshold``.
+
+Usage:
+    uv run python benchmarks/bench_endpoints.py --db /tmp/bench.db
+    uv run python benchmarks/bench_endpoints.py --db /tmp/bench.db --save-baseline
+"""
+
+import argparse
+from collections.abc import Callable
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_indexes import seed  # noqa: E402
+from bench_storage import start_server  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlmodel import SQLModel, create_engine  # noqa: E402
+
+BASELINE = os.path.join(HERE, 'baseline.json')
+
+# Parameters that must match for a baseline comparison to mean anything
+RUN_KEYS = ('rows', 'zones', 'ads', 'days', 'concurrency', 'seconds')
+
+
+def endpoints(url: str) -> dict[str, Callable[[random.Random], str]]:
+    """Endpoint name -> function returning a request path."""
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        rows = conn.execute(text('SELECT id, zone_id FROM ad WHERE is_active')).all()
+    engine.dispose()
+    ads = [ad_id for ad_id, _ in rows]
+    zones = sorted({zone_id for _, zone_id in rows})  # zones with a servable ad
+    return {
+        'render': lambda rng: f'/render?zone={rng.choice(zones)}',
+        'click': lambda rng: f'/click?id={rng.choice(ads)}',
+        'stats.json': lambda rng: '/stats.json',
+        'admin/analytics': lambda rng: '/admin/analytics?days=7',
+    }
+
+
+def drive(
+    base: str,
+    make_path: Callable[[random.Random], str],
+    seconds: float,
+    concurrency: int,
+    headers: dict[str, str],
+) -> dict:
+    """Request ``make_path`` paths from ``concurrency`` threads for ``seconds``."""
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def worker(seed: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed)
+        local_lat, local_err = [], 0
+        with httpx.Client(base_url=base, timeout=60, headers=headers) as client:
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                r = client.get(make_path(rng))
+                local_lat.append((time.perf_counter() - started) * 1000)
+                local_err += r.status_code not in (200, 302, 307)
+        with lock:
+            latencies.extend(local_lat)
+            errors += local_err
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    return {
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(pct(0.95), 2),
+        'p99_ms': round(pct(0.99), 2),
+        'errors': errors,
+    }
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compare ``results`` with ``baseline``.
+
+    Args:
+        results: Endpoint -> metrics of this run.
+        baseline: Endpoint -> metrics of the stored baseline.
+        threshold: Allowed relative change (0.25 = 25%).
+
+    Returns:
+        One message per regressed metric.
+    """
+    failed = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if r['p95_ms'] > base['p95_ms'] * (1 + threshold):
+            failed.append(f'{name}: p95 {base["p95_ms"]} -> {r["p95_ms"]} ms')
+        if r['rps'] < base['rps'] * (1 - threshold):
+            failed.append(f'{name}: {base["rps"]} -> {r["rps"]} req/s')
+        if r['errors'] > base['errors']:
+            failed.append(f'{name}: {r["errors"]} errors')
+    return failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--zones', type=int, default=50)
+    parser.add_argument('--ads', type=int, default=5_000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument(
+        '--db', help='SQLite file; seeded only if it does not exist (default: temp)'
+    )
+    parser.add_argument('--only', nargs='*', help='endpoint names to run')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument(
+        '--threshold', type=float, default=0.25, help='allowed regression (0.25=25%%)'
+    )
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench_endpoints.db')
+    url = f'sqlite:///{path}'
+    if not os.path.exists(path):
+        print(f'Seeding {args.rows:,} impressions into {path} ...')
+        started = time.perf_counter()
+        engine = create_engine(url)
+        SQLModel.metadata.create_all(engine)
+        seed(engine, args.rows, args.zones, args.ads, args.days)
+        engine.dispose()
+        print(f'Seeded in {time.perf_counter() - started:.1f} s')
+
+    selected = endpoints(url)
+    if args.only:
+        selected = {name: selected[name] for name in args.only}
+    headers = {'X-ADMIN-KEY': os.environ.get('ADMIN_KEY', '')}
+    results = {}
+    proc, base = start_server(url, 'tuned', write_behind=True)
+    try:
+        for name, make_path in selected.items():
+            drive(base, make_path, 1.0, args.concurrency, headers)  # warm up
+            results[name] = drive(
+                base, make_path, args.seconds, args.concurrency, headers
+            )
+            print(f'{name:<16} {results[name]}')
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    print(f'\n{"endpoint":<16} {"req/s":>8} {"p50":>8} {"p95":>8} {"p99":>8} err')
+    for name, r in results.items():
+        print(
+            f'{name:<16} {r["rps"]:>8.1f} {r["p50_ms"]:>8.1f} '
+            f'{r["p95_ms"]:>8.1f} {r["p99_ms"]:>8.1f} {r["errors"]}'
+        )
+
+    run = {key: getattr(args, key) for key in RUN_KEYS}
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'run': run, 'endpoints': results}, f, indent=2)
+            f.write('\n')
+        print(f'\nBaseline written to {args.baseline}')
+        return
+    if not os.path.exists(args.baseline):
+        print(f'\nNo baseline at {args.baseline}; run with --save-baseline first')
+        return
+    with open(args.baseline) as f:
+        stored = json.load(f)
+    if stored['run'] != run:
+        print(f'\nBaseline was recorded with {stored["run"]}, not {run}')
+        sys.exit(2)
+    failed = regressions(results, stored['endpoints'], args.threshold)
+    if failed:
+        print(f'\nRegressed by more than {args.threshold:.0%}:')
+        for message in failed:
+            print(f'  {message}')
+        sys.exit(1)
+    print(f'\nWithin {args.threshold:.0%} of the baseline')
+
+
+if __name__ == '__main__':
+    main()
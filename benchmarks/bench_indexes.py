@@ -0,0 +1,150 @@
+"""Compare query plans and timings of the hot tracking queries with/without indexes.
+
+Seeds a file-backed SQLite database with synthetic tracking rows, runs the
+serving/analytics queries with the model indexes dropped, then creates them via
+``ensure_indexes`` (the startup upgrade path) and runs the queries again.
+
+Usage:
+    uv run python benchmarks/bench_indexes.py --rows 10000000
+"""
+
+import argparse
+from datetime import UTC, datetime, timedelta
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('APP_ENV', 'development')  # app.database needs a URL
+
+from sqlalchemy import text  # noqa: E402
+from sqlmodel import SQLModel, create_engine  # noqa: E402
+
+from app import models  # noqa: E402,F401  # registers the tables
+from app.database import ensure_indexes  # noqa: E402
+
+QUERIES = {
+    'active ads in zone': (
+        'SELECT id, weight FROM ad WHERE zone_id = :zone AND is_active = 1'
+    ),
+    '7d impressions per ad': (
+        'SELECT ad_id, count(id) FROM impression '
+        'WHERE timestamp >= :since GROUP BY ad_id'
+    ),
+    '7d clicks per ad': (
+        'SELECT ad_id, count(id) FROM click WHERE timestamp >= :since GROUP BY ad_id'
+    ),
+    '7d rollup per ad': (
+        'SELECT ad_id, sum(impressions), sum(clicks) FROM ad_stats_hourly '
+        'WHERE hour >= :since GROUP BY ad_id'
+    ),
+    'expired impressions (retention)': (
+        'SELECT id FROM impression WHERE timestamp < :cutoff LIMIT 5000'
+    ),
+}
+
+
+def seed(engine, rows: int, zones: int, ads: int, days: int) -> None:
+    """Bulk-load zones, ads and tracking rows spread evenly over ``days``."""
+    rng = random.Random(42)
+    now = datetime.now(UTC).replace(tzinfo=None)
+    span = days * 86400
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.executemany(
+            'INSERT INTO zone (id, name, width, height) VALUES (?, ?, 300, 250)',
+            [(z, f'zone {z}') for z in range(1, zones + 1)],
+        )
+        cur.executemany(
+            'INSERT INTO ad (id, zone_id, html, url, weight, is_active) '
+            "VALUES (?, ?, '<img>', 'https://x', 1, ?)",
+            [(a, a % zones + 1, a % 10 != 0) for a in range(1, ads + 1)],
+        )
+        for table, n in (('impression', rows), ('click', rows // 50)):
+            done = 0
+            while done < n:
+                chunk = min(100_000, n - done)
+                batch = [
+                    (rng.randint(1, ads), now - timedelta(seconds=rng.randrange(span)))
+                    for _ in range(chunk)
+                ]
+                cur.executemany(
+                    f'INSERT INTO {table} (ad_id, timestamp) VALUES (?, ?)',
+                    [(ad_id, ts.isoformat(' ')) for ad_id, ts in batch],
+                )
+                done += chunk
+        cur.execute(
+            'INSERT INTO ad_stats_hourly (ad_id, hour, impressions, clicks) '
+            "SELECT ad_id, strftime('%Y-%m-%d %H:00:00.000000', timestamp), "
+            'count(*), 0 FROM impression GROUP BY 1, 2'
+        )
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def run_queries(engine, label: str) -> dict[str, float]:
+    now = datetime.now(UTC).replace(tzinfo=None)
+    params = {
+        'zone': 1,
+        'since': (now - timedelta(days=7)).isoformat(' '),
+        'cutoff': (now - timedelta(days=60)).isoformat(' '),
+    }
+    timings = {}
+    print(f'\n=== {label} ===')
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            plan = conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'), params).all()
+            runs = []
+            for _ in range(3):  # best of 3, so page-cache warmup doesn't count
+                started = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[name] = min(runs)
+            print(f'\n{name}: {timings[name]:.1f} ms')
+            for row in plan:
+                print(f'    {row[-1]}')
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--zones', type=int, default=50)
+    parser.add_argument('--ads', type=int, default=5_000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--db', help='SQLite file to use (default: a temp file)')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench_indexes.db')
+    engine = create_engine(f'sqlite:///{path}')
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+
+    print(f'Seeding {args.rows:,} impressions into {path} ...')
+    started = time.perf_counter()
+    seed(engine, args.rows, args.zones, args.ads, args.days)
+    print(f'Seeded in {time.perf_counter() - started:.1f} s')
+
+    before = run_queries(engine, 'without indexes')
+    started = time.perf_counter()
+    created = ensure_indexes(engine)
+    print(
+        f'\nensure_indexes created {len(created)} indexes in '
+        f'{time.perf_counter() - started:.1f} s'
+    )
+    after = run_queries(engine, 'with indexes')
+
+    print('\n=== summary (ms) ===')
+    for name in QUERIES:
+        print(f'{name:<34} {before[name]:>10.1f} {after[name]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""Compare write throughput of concurrent /render + /click under each storage profile.
+
+For every profile a fresh database is seeded with a few zones and ads, the app
+is started under uvicorn with ``DB_PROFILE`` set accordingly, and client
+threads hammer ``/render`` followed by ``/click`` for a fixed time. Write-behind
+is disabled by default so every request writes to the database synchronously,
+which is the path the storage profile affects.
+
+Usage:
+    uv run python benchmarks/bench_storage.py --seconds 15 --concurrency 16
+    uv run python benchmarks/bench_storage.py --postgres-url postgresql+psycopg://...
+"""
+
+import argparse
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('APP_ENV', 'development')  # app.database needs a URL
+
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from app import models  # noqa: E402  # registers the tables
+from app.config import Settings  # noqa: E402
+from app.database import create_db_engine  # noqa: E402
+
+
+def seed(url: str, zones: int, ads_per_zone: int) -> list[int]:
+    """Create the tables and zones/ads; return the zone ids."""
+    engine = create_db_engine(url, Settings(db_profile='default'))
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        zs = [
+            models.Zone(name=f'zone {i}', width=300, height=250) for i in range(zones)
+        ]
+        session.add_all(zs)
+        session.commit()
+        zone_ids = [z.id for z in zs]
+        session.add_all(
+            models.Ad(zone_id=zid, html='<img>', url='https://example.com', weight=1)
+            for zid in zone_ids
+            for _ in range(ads_per_zone)
+        )
+        session.commit()
+    engine.dispose()
+    return zone_ids  # type: ignore
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(url: str, profile: str, write_behind: bool) -> tuple:
+    port = _free_port()
+    env = {
+        **os.environ,
+        'APP_ENV': 'production',
+        'DATABASE_URL': url,
+        'DB_PROFILE': profile,
+        'WRITE_BEHIND_ENABLED': str(write_behind).lower(),
+        'RETENTION_INTERVAL_MINUTES': '0',
+    }
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            '-m',
+            'uvicorn',
+            'app.main:app',
+            '--port',
+            str(port),
+            '--log-level',
+            'warning',
+            '--no-access-log',
+        ],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'{base}/robots.txt', timeout=1)
+            return proc, base
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f'server for profile {profile!r} did not start')
+
+
+def hammer(base: str, zone_ids: list[int], seconds: float, concurrency: int) -> dict:
+    """Run render+click pairs from ``concurrency`` threads for ``seconds``."""
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def worker(seed: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed)
+        local_lat, local_err = [], 0
+        with httpx.Client(base_url=base, timeout=30) as client:
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                r = client.get('/render', params={'zone': rng.choice(zone_ids)})
+                ok = r.status_code == 200
+                if ok:
+                    ad_id = int(r.text.split('/click?id=')[1].split('"')[0])
+                    c = client.get('/click', params={'id': ad_id})
+                    ok = c.status_code in (302, 307)
+                local_lat.append((time.perf_counter() - started) * 1000)
+                local_err += not ok
+        with lock:
+            latencies.extend(local_lat)
+            errors += local_err
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'pairs_per_s': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+        'errors': errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--zones', type=int, default=5)
+    parser.add_argument('--ads-per-zone', type=int, default=10)
+    parser.add_argument('--postgres-url', help='also benchmark this Postgres URL')
+    parser.add_argument(
+        '--write-behind',
+        action='store_true',
+        help='keep the write-behind sinks on (measures the batched path instead)',
+    )
+    args = parser.parse_args()
+
+    targets = [('sqlite', None)]
+    if args.postgres_url:
+        targets.append(('postgres', args.postgres_url))
+
+    results = {}
+    for backend, url in targets:
+        for profile in ('default', 'tuned'):
+            db_url = url or f'sqlite:///{os.path.join(tempfile.mkdtemp(), "b.db")}'
+            zone_ids = seed(db_url, args.zones, args.ads_per_zone)
+            proc, base = start_server(db_url, profile, args.write_behind)
+            try:
+                hammer(base, zone_ids, 1.0, args.concurrency)  # warm up
+                results[(backend, profile)] = hammer(
+                    base, zone_ids, args.seconds, args.concurrency
+                )
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            print(f'{backend:<8} {profile:<8} {results[(backend, profile)]}')
+
+    print(f'\n{"backend":<8} {"profile":<8} {"pairs/s":>9} {"p50":>8} {"p99":>8} err')
+    for (backend, profile), r in results.items():
+        print(
+            f'{backend:<8} {profile:<8} {r["pairs_per_s"]:>9.1f} '
+            f'{r["p50_ms"]:>8.1f} {r["p99_ms"]:>8.1f} {r["errors"]}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,139 @@
 # tests/conftest.py
+import asyncio
+
 import pytest
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.database import get_session
+from app.config import reload_settings
+from app.database import (
+    QueryLog,
+    create_async_db_engine,
+    get_async_session,
+    get_session,
+    query_log_listeners,
+)
 from app.main import app
+from app.models import Ad, Zone
 
 
 @pytest.fixture(scope='function')
-def session():
+def session(tmp_path):
     """
     Provide a SQLModel Session for tests that need direct database access.
-    Each test gets its own in-memory SQLite database.
+    Each test gets its own SQLite database file, shared with the async engine
+    that serves the async endpoints (see the ``async_engine`` fixture).
     """
-    engine = create_engine(
-        'sqlite://',  # in-memory
-        connect_args={'check_same_thread': False},
-        poolclass=StaticPool,
-    )
+    url = f'sqlite:///{tmp_path / "test.db"}'
+    engine = create_engine(url, connect_args={'check_same_thread': False})
     SQLModel.metadata.create_all(engine)
+    # TestClient runs each request in a fresh event loop, so don't pool
+    # aiosqlite connections across them
+    async_engine = create_async_db_engine(url, poolclass=NullPool)
 
     with Session(engine) as test_session:
         # Override FastAPI's get_session dependency
         def _get_session():
             yield test_session
 
+        async def _get_async_session():
+            async with AsyncSession(async_engine, expire_on_commit=False) as s:
+                yield s
+
         app.dependency_overrides[get_session] = _get_session
+        app.dependency_overrides[get_async_session] = _get_async_session
+        test_session.info['async_engine'] = async_engine
         yield test_session
         app.dependency_overrides.pop(get_session, None)
+        app.dependency_overrides.pop(get_async_session, None)
+    engine.dispose()
+
+
+@pytest.fixture
+def async_engine(session):
+    """The async engine bound to the same database as ``session``."""
+    return session.info['async_engine']
+
+
+@pytest.fixture
+def seed_ad(session):
+    """
+    Add an ad, in a new zone unless ``zone_id`` is given, and return it.
+
+    ``seed_ad(**fields)`` overrides the ad's defaults; ``db=`` writes through
+    another session than ``session``.
+    """
+
+    def _seed(db: Session | None = None, **fields) -> Ad:
+        db = db or session
+        if 'zone_id' not in fields:
+            zone = Zone(name='Z', width=1, height=1)
+            db.add(zone)
+            db.commit()
+            db.refresh(zone)
+            fields['zone_id'] = zone.id
+        ad = Ad(**{'html': '<img>', 'url': 'https://x', 'weight': 1, **fields})
+        db.add(ad)
+        db.commit()
+        db.refresh(ad)
+        return ad
+
+    return _seed
+
+
+@pytest.fixture
+def run_async(async_engine):
+    """
+    Run ``fn(async_session)`` to completion in a fresh event loop.
+
+    The session is bound to the same database as ``session``.
+    """
+
+    def _run(fn):
+        async def main():
+            async with AsyncSession(async_engine, expire_on_commit=False) as s:
+                return await fn(s)
+
+        return asyncio.run(main())
+
+    return _run
+
+
+@pytest.fixture
+def env(monkeypatch):
+    """
+    Set (or, with None, unset) environment variables and reload the settings.
+
+    The previous environment and settings are restored after the test.
+    """
+
+    def _set(**values: str | None) -> None:
+        for name, value in values.items():
+            if value is None:
+                monkeypatch.delenv(name, raising=False)
+            else:
+                monkeypatch.setenv(name, value)
+        reload_settings()
+
+    yield _set
+    monkeypatch.undo()
+    reload_settings()
+
+
+@pytest.fixture(autouse=True)
+def query_logs():
+    """
+    The ``QueryLog`` of every request made during the test.
+
+    Fails the test if a request ran more statements than its endpoint's
+    ``@query_budget``.
+    """
+    logs: list[QueryLog] = []
+    query_log_listeners.append(logs.append)
+    yield logs
+    query_log_listeners.remove(logs.append)
+    over = [log for log in logs if log.over_budget]
+    assert not over, 'Query budget exceeded: ' + ', '.join(
+        f'{log.route} ran {log.count} > {log.budget}' for log in over
+    )
@@ -7,8 +7,8 @@ from app.models import Ad, Click, Impression, Zone
 
 
 @pytest.fixture(autouse=True)
-def _set_admin_key(monkeypatch):
-    monkeypatch.setenv('ADMIN_KEY', 'testkey')
+def _set_admin_key(env):
+    env(ADMIN_KEY='testkey')
 
 
 def test_admin_analytics_renders(session: Session):
@@ -0,0 +1,55 @@
+from collections import Counter
+import random
+
+import numpy as np
+
+from app.models import Ad
+from app.services import ad_selection
+from app.services.ad_selection import AliasTable
+
+
+def test_alias_table_distribution():
+    rng = random.Random(123)
+    items = ['A', 'B', 'C', 'D']
+    weights = [1, 3, 6, 0]  # A 10%, B 30%, C 60%, D never
+    table = AliasTable(items, weights)
+    N = 100_000
+    counts = Counter(table.draw(rng) for _ in range(N))
+    a, b, c = counts['A'] / N, counts['B'] / N, counts['C'] / N
+    # allow ~1% tolerance at 100k draws
+    assert 0.09 <= a <= 0.11
+    assert 0.29 <= b <= 0.31
+    assert 0.59 <= c <= 0.61
+    assert counts['D'] == 0
+
+
+def test_alias_table_invalid_weights_pick_first():
+    table = AliasTable(['A', 'B'], [0, 0])
+    assert {table.draw() for _ in range(100)} == {'A'}
+
+
+def test_alias_table_sample_matches_draw_distribution():
+    table = AliasTable(['A', 'B', 'C', 'D'], [1, 3, 6, 0])
+    picks = table.sample(100_000, np.random.default_rng(123))
+    freq = np.bincount(picks, minlength=4) / len(picks)
+    assert np.allclose(freq, [0.1, 0.3, 0.6, 0.0], atol=0.01)
+    assert (
+        AliasTable(['A', 'B'], [0, 0]).sample(100, np.random.default_rng()).max() == 0
+    )
+
+
+def test_zone_sampler_picks_follow_the_ad_weights(env, monkeypatch):
+    env(SELECTION_STRATEGY='ctr_boost', SAMPLER_BATCH_SIZE='100000')
+    monkeypatch.setattr(ad_selection, '_rng', np.random.default_rng(7))
+    monkeypatch.setattr(ad_selection, '_samplers', {})
+    weights = [5, 1, 0, 2, 2]
+    ads = tuple(
+        Ad(id=i, zone_id=1, html='', url='', weight=w)
+        for i, w in enumerate(weights, start=1)
+    )
+    # No counts yet, so every ad gets the same exploration bonus
+    sampler = ad_selection._build_sampler(1, ads, {}, {})
+    counts = Counter(sampler.draw().id for _ in range(100_000))  # type: ignore
+    observed = np.array([counts[ad.id] for ad in ads]) / 100_000
+    assert np.allclose(observed, np.array(weights) / sum(weights), atol=0.01)
+    assert counts[3] == 0
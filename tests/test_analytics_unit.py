@@ -40,3 +40,19 @@ def test_range_counts(session: Session):
     imps_2, clks_2 = range_counts(session, days=3)
     assert imps_2.get(a.id) == 2  # Both recent impressions included
     assert clks_2.get(a.id) == 1  # One click included
+
+
+def test_scoped_range_counts(session: Session):
+    zones = [Zone(name=f'Z{i}', width=1, height=1) for i in range(2)]
+    session.add_all(zones)
+    session.commit()
+    ads = [Ad(zone_id=z.id, html='<img>', url='https://x') for z in zones]  # type: ignore
+    session.add_all(ads)
+    session.commit()
+    a, b = (ad.id for ad in ads)
+    assert a is not None and b is not None
+    session.add_all([Impression(ad_id=a), Impression(ad_id=b), Click(ad_id=b)])
+    session.commit()
+
+    assert range_counts(session, ad_ids=[a]) == ({a: 1}, {})
+    assert range_counts(session) == ({a: 1, b: 1}, {b: 1})
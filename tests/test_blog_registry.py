@@ -0,0 +1,65 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from app.blog_registry import BlogRegistry, scan
+from app.main import app
+
+
+def _touch(path, mtime):
+    path.write_text('<p>post</p>')
+    os.utime(path, (mtime, mtime))
+
+
+def test_scan_skips_non_posts_and_uses_mtime(tmp_path):
+    _touch(tmp_path / 'blog_best_free_tools.html', 1_700_000_000)
+    _touch(tmp_path / 'blog_my_post.html', 1_700_000_000)
+    (tmp_path / 'blog_base.html').write_text('')
+    (tmp_path / 'blog_index.html').write_text('')
+    (tmp_path / 'stats.html').write_text('')
+
+    index = scan(str(tmp_path))
+
+    assert index.slugs == ['best_free_tools', 'my_post']
+    post = index.posts['best_free_tools']
+    assert post.title.startswith('Best Free Tools')  # from BLOG_DISPLAY_TITLES
+    assert post.template == f'{tmp_path.name}/blog_best_free_tools.html'
+    assert post.published == '2023-11-14'
+    assert index.posts['my_post'].title == 'My Post'
+
+
+def test_registry_watch_refresh(tmp_path, env):
+    _touch(tmp_path / 'blog_one.html', 1_700_000_000)
+    env(BLOG_DIR=str(tmp_path), BLOG_WATCH_INTERVAL_SECONDS='0')
+    registry = BlogRegistry()
+    assert [p.slug for p in registry.posts()] == ['one']
+
+    # Without watching, a new file is not picked up
+    _touch(tmp_path / 'blog_two.html', 1_700_000_000)
+    os.utime(tmp_path, (1, 1))  # force a directory mtime change
+    assert registry.get('two') is None
+
+    env(BLOG_DIR=str(tmp_path), BLOG_WATCH_INTERVAL_SECONDS='0.000001')
+    assert registry.get('two') is not None
+
+    # Pointing blog_dir elsewhere rebuilds the index
+    other = tmp_path / 'other'
+    other.mkdir()
+    env(BLOG_DIR=str(other))
+    assert registry.posts() == []
+
+
+def test_blog_routes_use_registry():
+    client = TestClient(app)
+    r = client.get('/blog')
+    assert r.status_code == 200
+    assert '/blog/best_free_tools' in r.text
+
+    r = client.get('/blog/best_free_tools?utm_source=x')
+    assert r.status_code == 200
+    assert '"@id": "https://ad-server.fly.dev/blog/best_free_tools"' in r.text
+
+    r = client.get('/blog/no_such_post')
+    assert r.status_code == 404
+    available = r.json()['detail']['available_posts']
+    assert 'best_free_tools' in available and 'base' not in available
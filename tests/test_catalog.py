@@ -0,0 +1,134 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.main import app
+from app.services.catalog import AdCatalog, catalog
+
+
+def test_render_serves_catalog_without_queries(session: Session, async_engine, seed_ad):
+    a = seed_ad()
+    catalog.invalidate()
+    client = TestClient(app)
+    url = f'/render?zone={a.zone_id}'
+    assert client.get(url).status_code == 200
+
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = async_engine.sync_engine  # /render runs on the async engine
+    event.listen(engine, 'before_cursor_execute', _record)
+    try:
+        r = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', _record)
+
+    assert r.status_code == 200
+    assert f'/click?id={a.id}' in r.text
+    catalog_reads = [s for s in statements if 'FROM zone' in s or 'FROM ad' in s]
+    assert not catalog_reads
+    assert any('INSERT INTO impression' in s for s in statements)  # listener works
+
+
+def test_admin_writes_invalidate_catalog(session: Session, env, seed_ad):
+    env(ADMIN_KEY=None)
+    a = seed_ad(is_active=False)
+    catalog.invalidate()
+    client = TestClient(app)
+
+    r = client.get(f'/render?zone={a.zone_id}')
+    assert r.status_code == 404
+    assert 'none are active' in r.json()['detail']
+
+    assert client.post(f'/admin/ads/{a.id}/enable').status_code == 200
+    assert client.get(f'/render?zone={a.zone_id}').status_code == 200
+
+    assert client.get('/render?zone=999').status_code == 404
+
+
+def test_click_validates_against_catalog(session: Session, seed_ad):
+    a = seed_ad()
+    catalog.invalidate()
+    client = TestClient(app)
+
+    r = client.get(f'/click?id={a.id}', follow_redirects=False)
+    assert r.status_code == 302
+    assert client.get('/click?id=999', follow_redirects=False).status_code == 404
+
+
+def test_render_serves_prebuilt_fragment(session: Session, seed_ad):
+    a = seed_ad()
+    a.html = '<p>' + 'lorem ipsum ' * 40 + '</p>'  # big enough to compress
+    session.add(a)
+    session.commit()
+    catalog.invalidate()
+    client = TestClient(app)
+
+    r = client.get(f'/render?zone={a.zone_id}')  # httpx sends Accept-Encoding: gzip
+    assert r.headers['content-encoding'] == 'gzip'
+    assert r.headers['x-robots-tag'] == 'noindex, nofollow'
+    assert f'<a href="/click?id={a.id}" target="_blank">' in r.text
+    assert 'lorem ipsum' in r.text
+
+    plain = client.get(
+        f'/render?zone={a.zone_id}', headers={'Accept-Encoding': 'identity'}
+    )
+    assert 'content-encoding' not in plain.headers
+    assert plain.content == r.content
+
+    # Editing the ad rebuilds its fragment
+    r = client.put(
+        f'/ads/{a.id}',
+        json={
+            'zone_id': a.zone_id,
+            'html': '<b>new</b>',
+            'url': 'https://x',
+            'weight': 1,
+        },
+    )
+    assert r.status_code == 200
+    assert '<b>new</b>' in client.get(f'/render?zone={a.zone_id}').text
+
+
+def test_concurrent_reloads_are_single_flight(session: Session, run_async, seed_ad):
+    seed_ad()
+    cat = AdCatalog()
+    loads = []
+    load = cat.load
+
+    def counting_load(s):
+        loads.append(1)
+        return load(s)
+
+    cat.load = counting_load  # type: ignore
+
+    async def burst(s):
+        return await asyncio.gather(*(cat.snapshot_async(s) for _ in range(10)))
+
+    first = run_async(burst)  # cold: everyone waits for one load
+    assert len(loads) == 1 and all(snap is first[0] for snap in first)
+
+    cat.invalidate()
+    second = run_async(burst)
+    assert len(loads) == 2
+    # One caller reloaded; the rest kept serving the previous snapshot
+    assert sum(snap is first[0] for snap in second) == 9
+
+
+def test_reload_rebuilds_only_changed_fragments(session: Session, run_async, seed_ad):
+    a = seed_ad()
+    b = seed_ad(zone_id=a.zone_id, html='<i>b</i>')
+    cat = AdCatalog()
+    before = run_async(cat.snapshot_async).zones[a.zone_id].fragments
+
+    b.html = '<i>edited</i>'
+    session.add(b)
+    session.commit()
+    cat.invalidate()
+    after = run_async(cat.snapshot_async).zones[a.zone_id].fragments
+    assert after[a.id] is before[a.id]  # type: ignore
+    assert after[b.id] is not before[b.id] and b'edited' in after[b.id].body  # type: ignore
@@ -0,0 +1,57 @@
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+import pytest
+
+from app.config import get_settings, reload_settings
+from app.main import app
+
+
+def test_settings_are_cached_and_frozen():
+    settings = get_settings()
+    assert get_settings() is settings
+    with pytest.raises(ValidationError):
+        settings.admin_key = 'x'  # type: ignore
+
+
+def test_reload_swaps_snapshot(env):
+    env(ADMIN_KEY='first')
+    before = get_settings()
+    assert before.admin_key == 'first'
+
+    env(ADMIN_KEY='second')
+    assert get_settings() is not before
+    assert get_settings().admin_key == 'second'
+    assert before.admin_key == 'first'  # old snapshot is untouched
+
+
+def test_invalid_reload_keeps_current_settings(env, monkeypatch):
+    env(ADMIN_KEY='k')
+    current = get_settings()
+    monkeypatch.setenv('CATALOG_TTL_SECONDS', 'not a number')
+    with pytest.raises(ValidationError):
+        reload_settings()
+    assert get_settings() is current
+
+
+def test_admin_key_rotation_via_reload_endpoint(env, monkeypatch):
+    env(ADMIN_KEY='old')
+    client = TestClient(app)
+    assert client.get(
+        '/admin/debug/tracking', headers={'X-ADMIN-KEY': 'old'}
+    ).is_success
+
+    # Rotated in the environment: not visible until the reload
+    monkeypatch.setenv('ADMIN_KEY', 'new')
+    assert (
+        client.get('/admin/debug/tracking', headers={'X-ADMIN-KEY': 'new'}).status_code
+        == 401
+    )
+    r = client.post('/admin/settings/reload', headers={'X-ADMIN-KEY': 'old'})
+    assert r.json() == {'reloaded': True}
+    assert client.get(
+        '/admin/debug/tracking', headers={'X-ADMIN-KEY': 'new'}
+    ).is_success
+    assert (
+        client.get('/admin/debug/tracking', headers={'X-ADMIN-KEY': 'old'}).status_code
+        == 401
+    )
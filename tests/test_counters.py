@@ -0,0 +1,104 @@
+from datetime import UTC, datetime, timedelta
+
+from sqlmodel import Session
+
+from app.models import Click, Impression
+from app.services.ad_selection import record_impression_async
+from app.services.counters import CtrCounters, RollingCounter
+from app.services.event_sink import EventSink
+from app.services.rollup import bump_hourly, count_rows
+
+
+def test_rolling_counter_expires_old_buckets():
+    c = RollingCounter(window_seconds=3 * 60, bucket_seconds=60)
+    t0 = 1_000_000 * 60
+    c.add(1, at=t0)
+    c.add(1, n=2, at=t0 + 60)
+    c.add(2, at=t0 + 60)
+    assert c.counts([1, 2], at=t0 + 120) == {1: 3, 2: 1}
+    # t0's bucket falls out of the 3-bucket window
+    assert c.counts([1, 2], at=t0 + 180) == {1: 2, 2: 1}
+    assert c.counts([1, 2, 3], at=t0 + 10_000) == {}
+
+
+def test_ctr_counters_seed_and_record(session: Session, run_async, seed_ad):
+    a = seed_ad()
+    assert a.id is not None
+
+    now = datetime.now(UTC)
+    session.add_all(
+        [
+            Impression(ad_id=a.id, timestamp=now - timedelta(days=1)),
+            Impression(ad_id=a.id, timestamp=now - timedelta(days=30)),
+            Click(ad_id=a.id, timestamp=now - timedelta(hours=2)),
+        ]
+    )
+    session.commit()
+
+    counters = CtrCounters(days=7)
+    counts = run_async(lambda s: counters.counts_for_async(s, [a.id]))
+    assert counts == ({a.id: 1}, {a.id: 1})
+
+    counters.record_impression(a.id)
+    counters.record_click(a.id)
+    counts = run_async(lambda s: counters.counts_for_async(s, [a.id]))
+    assert counts == ({a.id: 2}, {a.id: 2})
+
+
+def test_record_impression_updates_shared_counters(
+    session: Session, run_async, seed_ad
+):
+    from app.services.counters import ctr_counters
+
+    a = seed_ad()
+    assert a.id is not None
+
+    ad_id = a.id
+    imps, _ = run_async(lambda s: ctr_counters.counts_for_async(s, [ad_id]))
+    assert imps == {}
+    run_async(lambda s: record_impression_async(s, ad_id))
+    imps, _ = run_async(lambda s: ctr_counters.counts_for_async(s, [ad_id]))
+    assert imps == {ad_id: 1}
+
+
+def test_counters_seed_only_requested_ads(session: Session, run_async, seed_ad):
+    first = seed_ad()
+    a, b = first.id, seed_ad(zone_id=first.zone_id).id
+    assert a is not None and b is not None
+    session.add_all([Impression(ad_id=a), Impression(ad_id=b)])
+    session.commit()
+
+    counters = CtrCounters(days=7, resync_seconds=0)
+    assert run_async(lambda s: counters.counts_for_async(s, [a])) == ({a: 1}, {})
+    assert counters.impressions.counts([b]) == {}  # b was never loaded
+
+    # Resync (every call with resync_seconds=0) replaces local counts with the DB's
+    counters.record_impression(a)
+    session.add(Impression(ad_id=a))
+    session.commit()
+    counts = run_async(lambda s: counters.counts_for_async(s, [a, b]))
+    assert counts == ({a: 2, b: 1}, {})
+
+
+def test_resync_keeps_rows_still_queued_in_the_sink(
+    session: Session, run_async, seed_ad
+):
+    a = seed_ad().id
+    assert a is not None
+    sink = EventSink(
+        Impression,
+        flush_interval_ms=60_000,
+        on_flush=lambda conn, rows: bump_hourly(conn, impressions=count_rows(rows)),
+    )
+    counters = CtrCounters(days=7, resync_seconds=0, impression_sink=sink)
+    sink.start(session.get_bind())  # type: ignore
+    try:
+        for _ in range(3):
+            counters.record_impression(a)
+            assert sink.submit({'ad_id': a, 'timestamp': datetime.now(UTC)})
+        # The rows aren't in the rollup yet, so the resync adds them back
+        assert run_async(lambda s: counters.counts_for_async(s, [a])) == ({a: 3}, {})
+    finally:
+        sink.stop()
+    # Once flushed they are read from the rollup, and counted only once
+    assert run_async(lambda s: counters.counts_for_async(s, [a])) == ({a: 3}, {})
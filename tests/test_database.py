@@ -0,0 +1,82 @@
+import asyncio
+
+from sqlalchemy import inspect
+from sqlmodel import SQLModel, create_engine
+
+from app.config import Settings
+from app.database import (
+    async_database_url,
+    create_async_db_engine,
+    create_db_engine,
+    ensure_indexes,
+)
+
+
+def test_ensure_indexes_upgrades_existing_tables(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "old.db"}')
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql('DROP INDEX ix_impression_timestamp_ad_id')
+        conn.exec_driver_sql('DROP INDEX ix_ad_zone_id_is_active')
+
+    assert sorted(ensure_indexes(engine)) == [
+        'ix_ad_zone_id_is_active',
+        'ix_impression_timestamp_ad_id',
+    ]
+    names = {ix['name'] for ix in inspect(engine).get_indexes('impression')}
+    assert 'ix_impression_timestamp_ad_id' in names
+    assert ensure_indexes(engine) == []
+
+
+def test_sqlite_tuned_profile_sets_pragmas(tmp_path):
+    url = f'sqlite:///{tmp_path / "tuned.db"}'
+    engine = create_db_engine(url, Settings(db_profile='tuned'))
+    with engine.connect() as conn:
+        pragmas = {
+            name: conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'auto_vacuum')
+        }
+    # synchronous 1 = NORMAL, auto_vacuum 2 = INCREMENTAL
+    assert pragmas == {
+        'journal_mode': 'wal',
+        'synchronous': 1,
+        'busy_timeout': 5000,
+        'auto_vacuum': 2,
+    }
+
+    plain = create_db_engine(
+        f'sqlite:///{tmp_path / "plain.db"}', Settings(db_profile='default')
+    )
+    with plain.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'delete'
+
+
+def test_postgres_tuned_profile_sizes_pool():
+    engine = create_db_engine(
+        'postgresql+psycopg://u:p@localhost/db',
+        Settings(db_profile='tuned', db_pool_size=7, db_max_overflow=3),
+    )
+    assert engine.pool.size() == 7  # type: ignore
+    assert engine.pool._max_overflow == 3  # type: ignore
+    assert engine.pool._pre_ping is True
+
+
+def test_async_engine_uses_async_driver_and_profile(tmp_path):
+    assert async_database_url('sqlite:///./a.db') == 'sqlite+aiosqlite:///./a.db'
+    assert async_database_url('postgres://u@h/db') == 'postgresql+psycopg://u@h/db'
+    assert (
+        async_database_url('postgresql+psycopg://u@h/db')
+        == 'postgresql+psycopg://u@h/db'
+    )
+
+    engine = create_async_db_engine(
+        f'sqlite:///{tmp_path / "async.db"}', Settings(db_profile='tuned')
+    )
+
+    async def journal_mode() -> str:
+        async with engine.connect() as conn:
+            mode = (await conn.exec_driver_sql('PRAGMA journal_mode')).scalar()
+        await engine.dispose()
+        return mode
+
+    assert asyncio.run(journal_mode()) == 'wal'
@@ -0,0 +1,77 @@
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.main import app
+from app.services.embed import embed_scripts
+
+client = TestClient(app)
+
+
+def test_embed_js_is_prerendered_with_etag():
+    r = client.get('/embed.js?zone=27382965')
+    assert r.status_code == 200
+    assert r.headers['content-type'].startswith('application/javascript')
+    assert 'var zoneId = "27382965";' in r.text
+    etag = embed_scripts.get(27382965).etag
+    assert r.headers['content-encoding'] == 'gzip'  # httpx sends Accept-Encoding
+    assert r.headers['etag'] == etag[:-1] + '-gzip"'
+    assert r.headers['cache-control'] == 'public, max-age=3600'
+    plain = client.get('/embed.js?zone=27382965', headers={'Accept-Encoding': ''})
+    assert plain.headers['etag'] == etag
+
+    generic = client.get('/embed.js')
+    assert 'var zoneId = null;' in generic.text
+    assert generic.headers['etag'] != r.headers['etag']
+
+
+def test_embed_js_if_none_match_gets_304():
+    etag = client.get('/embed.js?zone=5').headers['etag']
+    r = client.get('/embed.js?zone=5', headers={'If-None-Match': etag})
+    assert r.status_code == 304
+    assert r.content == b''
+    assert r.headers['etag'] == etag
+
+    weak = client.get('/embed.js?zone=5', headers={'If-None-Match': f'"x", W/{etag}'})
+    assert weak.status_code == 304
+    assert (
+        client.get('/embed.js?zone=6', headers={'If-None-Match': etag}).status_code
+        == 200
+    )
+
+
+def test_versioned_embed_url_is_immutable():
+    url = embed_scripts.url(27383189)
+    assert url.startswith(f'/embed.{embed_scripts.version}.js')
+    r = client.get(url)
+    assert r.status_code == 200
+    assert 'immutable' in r.headers['cache-control']
+    assert r.content == client.get('/embed.js?zone=27383189').content
+
+    stale = client.get('/embed.0000.js?zone=27383189')
+    assert stale.status_code == 200
+    assert 'immutable' not in stale.headers['cache-control']
+
+    # Our own pages link the versioned URL
+    assert url in client.get('/').text
+
+
+def test_prerender_covers_zone_map():
+    assert 27382965 in embed_scripts.known_zones()
+    assert embed_scripts.prerender([1, 2]) >= len(embed_scripts.known_zones()) + 3
+
+
+def test_unknown_zones_only_evict_each_other():
+    from fastapi.templating import Jinja2Templates
+
+    from app.services.embed import EmbedScripts
+
+    scripts = EmbedScripts(Jinja2Templates(directory='templates').env, max_variants=2)
+    scripts.prerender([7])
+    pinned = scripts.get(7)
+    misses = metrics.cache_lookups.value('embed', 'miss')
+    for zone in range(1000, 1100):
+        scripts.get(zone)
+    assert metrics.cache_lookups.value('embed', 'miss') - misses == 100
+    assert scripts.get(7) is pinned and scripts.get(None) is scripts.get(None)
+    assert scripts.get(1099) is scripts.get(1099)  # recent ones stay cached
+    assert len(scripts._recent) == 2
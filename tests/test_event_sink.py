@@ -0,0 +1,85 @@
+from datetime import UTC, datetime
+
+from sqlalchemy import func
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models import Impression
+from app.services.event_sink import EventSink
+
+
+def _engine(tmp_path, seed_ad):
+    engine = create_engine(f'sqlite:///{tmp_path / "sink.db"}')
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as s:
+        seed_ad(db=s)
+    return engine
+
+
+def _count(engine) -> int:
+    with Session(engine) as s:
+        return s.exec(select(func.count(Impression.id))).one()  # type: ignore
+
+
+def test_sink_flushes_on_stop(tmp_path, seed_ad):
+    engine = _engine(tmp_path, seed_ad)
+    sink = EventSink(Impression, batch_size=1000, flush_interval_ms=60_000)
+    assert not sink.submit({'ad_id': 1, 'timestamp': datetime.now(UTC)})
+
+    sink.start(engine)
+    for _ in range(950):
+        assert sink.submit({'ad_id': 1, 'timestamp': datetime.now(UTC)})
+    assert sink.stats()['queue_depth'] == 950
+    sink.stop()
+
+    assert _count(engine) == 950
+    stats = sink.stats()
+    assert stats['queue_depth'] == 0
+    assert stats['flushed'] == 950
+
+
+def test_sink_overflow_rejects_rows(tmp_path, seed_ad):
+    engine = _engine(tmp_path, seed_ad)
+    sink = EventSink(Impression, batch_size=100, flush_interval_ms=60_000, max_buffer=2)
+    sink.start(engine)
+    try:
+        assert sink.submit({'ad_id': 1, 'timestamp': datetime.now(UTC)})
+        assert sink.submit({'ad_id': 1, 'timestamp': datetime.now(UTC)})
+        assert not sink.submit({'ad_id': 1, 'timestamp': datetime.now(UTC)})
+        assert sink.stats()['overflows'] == 1
+    finally:
+        sink.stop()
+    assert _count(engine) == 2
+
+
+def test_unwritten_rows_are_spooled_and_replayed(tmp_path, seed_ad):
+    engine = _engine(tmp_path, seed_ad)
+    spool = tmp_path / 'spool'
+    sink = EventSink(Impression, flush_interval_ms=60_000, spool_dir=str(spool))
+    sink.start(engine)
+    sink.submit({'ad_id': 1, 'timestamp': datetime.now(UTC)})
+    sink._write = lambda batch: 0  # type: ignore  # simulate a dead database
+    sink.stop()
+    assert (spool / 'impression.jsonl').exists()
+    assert _count(engine) == 0
+
+    replay = EventSink(Impression, flush_interval_ms=60_000, spool_dir=str(spool))
+    replay.start(engine)
+    replay.stop()
+    assert not (spool / 'impression.jsonl').exists()
+    assert _count(engine) == 1
+
+
+def test_rejected_rows_are_dead_lettered(tmp_path, seed_ad):
+    engine = _engine(tmp_path, seed_ad)
+    spool = tmp_path / 'spool'
+    sink = EventSink(Impression, flush_interval_ms=60_000, spool_dir=str(spool))
+    sink.start(engine)
+    for ad_id in (1, None, 2):  # ad_id is NOT NULL: the batch violates it
+        sink.submit({'ad_id': ad_id, 'timestamp': datetime.now(UTC)})
+    sink.stop()
+
+    assert _count(engine) == 2
+    assert sink.stats()['dead_lettered'] == 1 and sink.stats()['queue_depth'] == 0
+    (line,) = (spool / 'impression.rejected.jsonl').read_text().splitlines()
+    assert '"ad_id": null' in line
+    assert not (spool / 'impression.jsonl').exists()
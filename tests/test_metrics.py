@@ -0,0 +1,80 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.main import app
+
+
+def test_counter_and_histogram_sum_thread_tables():
+    registry = metrics.Registry()
+    hits = metrics.Counter('hits_total', 'Hits.', ('cache',), registry=registry)
+    latency = metrics.Histogram(
+        'latency_seconds', 'Latency.', ('route',), (0.1, 1.0), registry=registry
+    )
+
+    def work():
+        for _ in range(1000):
+            hits.inc('page')
+            latency.observe(0.0625, '/')
+        latency.observe(5.0, '/')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert hits.value('page') == 4000
+    text = registry.render()
+    assert '# TYPE hits_total counter' in text
+    assert 'hits_total{cache="page"} 4000' in text
+    assert 'latency_seconds_bucket{route="/",le="0.1"} 4000' in text
+    assert 'latency_seconds_bucket{route="/",le="1"} 4000' in text
+    assert 'latency_seconds_bucket{route="/",le="+Inf"} 4004' in text
+    assert 'latency_seconds_count{route="/"} 4004' in text
+    assert 'latency_seconds_sum{route="/"} 270' in text
+
+
+def test_metrics_endpoint_labels_route_templates(env):
+    env(ADMIN_KEY='k')
+    client = TestClient(app)
+    before = metrics.http_requests.value(
+        'GET', '/tools/banner-preview-{size_slug}.html', '200'
+    )
+    client.get('/tools/banner-preview-728x90.html')
+    client.get('/no/such/page')
+
+    assert client.get('/metrics').status_code == 401
+    r = client.get('/metrics', headers={'X-ADMIN-KEY': 'k'})
+    assert r.status_code == 200
+    assert r.headers['content-type'].startswith('text/plain; version=0.0.4')
+    after = metrics.http_requests.value(
+        'GET', '/tools/banner-preview-{size_slug}.html', '200'
+    )
+    assert after == before + 1
+    assert metrics.http_requests.value('GET', 'unmatched', '404') >= 1
+    assert 'http_request_duration_seconds_bucket{method="GET"' in r.text
+    assert 'adserver_cache_lookups_total{cache="page",result=' in r.text
+    assert 'adserver_write_behind_queue_depth{sink="impressions"}' in r.text
+
+
+def test_scrape_server_serves_metrics_without_key():
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+
+    server = metrics.start_scrape_server(0, host='127.0.0.1')
+    try:
+        base = f'http://127.0.0.1:{server.server_address[1]}'
+        with urlopen(f'{base}/metrics') as r:
+            assert r.headers['Content-Type'] == metrics.CONTENT_TYPE
+            assert b'# TYPE http_requests_total counter' in r.read()
+        try:
+            urlopen(f'{base}/other')
+        except HTTPError as e:
+            assert e.code == 404
+        else:
+            raise AssertionError('expected a 404')
+    finally:
+        server.shutdown()
+        server.server_close()
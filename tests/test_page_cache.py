@@ -0,0 +1,78 @@
+from fastapi import FastAPI, Request
+from fastapi.templating import Jinja2Templates
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.page_cache import PageCache
+
+
+def _cached_app(tmp_path):
+    (tmp_path / 'base.html').write_text(
+        '<title>{{ title }}</title>{% block b %}{% endblock %}'
+    )
+    (tmp_path / 'page.html').write_text(
+        '{% extends "base.html" %}{% block b %}'
+        + 'x' * 600
+        + '{{ year }}{% endblock %}'
+    )
+    cache = PageCache(Jinja2Templates(directory=tmp_path), check_interval=0)
+    page_app = FastAPI()
+
+    @page_app.get('/p')
+    def page(request: Request, year: int = 2025):
+        return cache.render(
+            request, 'page.html', {'title': 'T', 'year': year}, dated=True
+        )
+
+    return cache, TestClient(page_app)
+
+
+def test_page_cache_hits_and_304(tmp_path):
+    cache, client = _cached_app(tmp_path)
+    r = client.get('/p')
+    assert r.status_code == 200
+    assert r.headers['content-encoding'] == 'gzip'
+    assert '<title>T</title>' in r.text and '2025' in r.text
+    assert client.get('/p').content == r.content
+    # Unused query parameters and another Host reuse the entry
+    assert client.get('/p?utm_source=x').content == r.content
+    assert client.get('http://other.example/p').content == r.content
+    assert cache.stats() == {'entries': 1, 'hits': 3, 'misses': 1}
+
+    etag, modified = r.headers['etag'], r.headers['last-modified']
+    assert client.get('/p', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/p', headers={'If-Modified-Since': modified}).status_code == 304
+
+
+def test_page_cache_context_and_template_changes(tmp_path):
+    import os
+
+    cache, client = _cached_app(tmp_path)
+    etag = client.get('/p').headers['etag']
+
+    # A date-dependent value (here via the query) is a different entry and ETag
+    r = client.get('/p?year=2026')
+    assert '2026' in r.text and r.headers['etag'] != etag
+
+    # Editing a template in the extends chain invalidates the rendered page
+    base = tmp_path / 'base.html'
+    base.write_text('<title>new {{ title }}</title>{% block b %}{% endblock %}')
+    st = os.stat(base)
+    os.utime(base, (st.st_atime, st.st_mtime + 10))
+    r = client.get('/p', headers={'If-None-Match': etag})
+    assert r.status_code == 200
+    assert '<title>new T</title>' in r.text
+
+
+def test_public_pages_are_cached():
+    client = TestClient(app)
+    r = client.get('/tools/banner-preview-728x90.html')
+    assert r.status_code == 200
+    assert 'Leaderboard' in r.text
+    assert r.headers['cache-control'] == 'no-cache'
+    again = client.get(
+        '/tools/banner-preview-728x90.html',
+        headers={'If-None-Match': r.headers['etag']},
+    )
+    assert again.status_code == 304
+    assert client.get('/').status_code == 200
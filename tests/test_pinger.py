@@ -0,0 +1,129 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+import pytest
+
+from app import pinger
+
+
+class _Stub(BaseHTTPRequestHandler):
+    """Serves ``pages`` on GET; records POSTs and sitemap pings."""
+
+    pages: dict[str, bytes] = {}
+    posts: list[dict] = []
+    pings: list[str] = []
+    failures: dict[str, int] = {}  # path -> 503s left to return
+
+    def _fail(self) -> bool:
+        left = self.failures.get(self.path, 0)
+        if left:
+            self.failures[self.path] = left - 1
+            self.send_response(503)
+            self.end_headers()
+        return bool(left)
+
+    def do_GET(self):
+        if self._fail():
+            return
+        if self.path.startswith('/ping'):
+            self.pings.append(self.path)
+            body = b''
+        elif self.path in self.pages:
+            body = self.pages[self.path]
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self._fail():
+            return
+        length = int(self.headers['Content-Length'])
+        self.posts.append(json.loads(self.rfile.read(length)))
+        self.send_response(202)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    _Stub.pages, _Stub.posts, _Stub.pings, _Stub.failures = {}, [], [], {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Stub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield _Stub, f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def _run(base, tmp_path, paths, **kwargs):
+    return pinger.run(
+        host='example.test',
+        base_url=base,
+        paths=paths,
+        key='k',
+        state_path=str(tmp_path / 'state.json'),
+        indexnow_endpoint=f'{base}/IndexNow',
+        sitemap_endpoints={'stub': f'{base}/ping?sitemap={{sitemap}}'},
+        backoff=0,
+        **kwargs,
+    )
+
+
+def test_site_paths_from_route_table():
+    paths = pinger.site_paths()
+    assert '/' in paths and '/tools' in paths and '/blog' in paths
+    assert '/tools/banner-preview-728x90.html' in paths
+    assert '/blog/best_free_tools' in paths
+    assert '/publisher-test' not in paths
+    assert not any('{' in p or p.endswith(('.txt', '.xml')) for p in paths)
+
+
+def test_only_changed_pages_are_submitted_in_batches(stub, tmp_path):
+    server, base = stub
+    server.pages = {f'/p{i}': f'page {i}'.encode() for i in range(5)}
+    paths = [*server.pages, '/missing']
+
+    report = _run(base, tmp_path, paths, batch_size=2)
+    assert report.fetch_failed == ['/missing']
+    assert len(report.submitted) == 5
+    # batches go out concurrently, so they may arrive in any order
+    assert sorted(len(p['urlList']) for p in server.posts) == [1, 2, 2]
+    assert server.posts[0]['keyLocation'] == 'https://example.test/k.txt'
+    assert len(server.pings) == 1
+
+    # Nothing changed: no submissions, no pings
+    server.posts.clear()
+    server.pings.clear()
+    report = _run(base, tmp_path, paths, batch_size=2)
+    assert report.changed == [] and server.posts == [] and server.pings == []
+
+    # One page changed
+    server.pages['/p3'] = b'edited'
+    report = _run(base, tmp_path, paths, batch_size=2)
+    assert report.submitted == ['https://example.test/p3']
+    assert server.posts[0]['urlList'] == ['https://example.test/p3']
+
+
+def test_retries_and_failed_submission_keeps_state(stub, tmp_path):
+    server, base = stub
+    server.pages = {'/a': b'a'}
+    server.failures = {'/a': 1}  # fetch succeeds on retry
+
+    server.failures['/IndexNow'] = 10  # submission never succeeds
+    report = _run(base, tmp_path, ['/a'], retries=1)
+    assert report.changed == ['https://example.test/a']
+    assert report.submitted == []
+    assert report.responses['indexnow[0]'] == 503
+    assert not (tmp_path / 'state.json').exists()
+
+    server.failures.clear()
+    report = _run(base, tmp_path, ['/a'])
+    assert report.submitted == ['https://example.test/a']
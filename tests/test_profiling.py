@@ -0,0 +1,109 @@
+import pstats
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.profiling import ProfilingMiddleware, profiler, resolve_route
+
+
+def _spin_async():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _spin_sync():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _busy_app() -> TestClient:
+    busy_app = FastAPI()
+    busy_app.add_middleware(ProfilingMiddleware)
+
+    @busy_app.get('/async/{n}')
+    async def busy_async(n: int):
+        _spin_async()
+        return {'n': n}
+
+    @busy_app.get('/sync')
+    def busy_sync():
+        _spin_sync()
+        return {}
+
+    return TestClient(busy_app)
+
+
+def test_single_request_profile_requires_admin_key(env):
+    env(ADMIN_KEY='secret')
+    client = _busy_app()
+
+    r = client.get('/async/1', headers={'X-Profile': '1'})
+    assert 'x-profile-id' not in r.headers
+
+    r = client.get('/async/1?__profile=1', headers={'X-ADMIN-KEY': 'secret'})
+    session = profiler.sessions[int(r.headers['x-profile-id'])]
+    assert session.requests == 1 and not session.active
+    assert '_spin_async' in session.collapsed()
+
+    r = client.get('/sync', headers={'X-Profile': '1', 'X-ADMIN-KEY': 'secret'})
+    session = profiler.sessions[int(r.headers['x-profile-id'])]
+    assert '_spin_sync' in session.collapsed()
+
+
+def test_window_profile_by_route_template(tmp_path, monkeypatch):
+    client = _busy_app()
+    tracked = []
+    track = profiler.track
+    monkeypatch.setattr(
+        profiler,
+        'track',
+        lambda sessions: tracked.append(sessions) or track(sessions),
+    )
+    session = profiler.start('/async/{n}', rate=1.0, seconds=30, interval_ms=1)
+    try:
+        client.get('/async/1')
+        client.get('/async/2')
+        client.get('/sync')  # other route: not selected at all
+    finally:
+        profiler.stop(session.id)
+    assert session.requests == 2
+    assert len(tracked) == 2
+    assert not profiler.enabled
+
+    path = tmp_path / 'profile.prof'
+    path.write_bytes(session.pstats())
+    stats = pstats.Stats(str(path))
+    spin = [f for f in stats.stats if f[2] == '_spin_async']  # type: ignore
+    assert spin and stats.stats[spin[0]][3] > 0  # type: ignore  # cumulative time
+
+
+def test_admin_profiling_endpoints():
+    client = TestClient(app)
+    r = client.post('/admin/profiling', params={'route': '/tools', 'seconds': 30})
+    assert r.status_code == 200
+    session_id = r.json()['id']
+    assert any(s['id'] == session_id for s in client.get('/admin/profiling').json())
+
+    client.get('/tools')
+    r = client.post(f'/admin/profiling/{session_id}/stop')
+    assert r.json()['requests'] == 1 and not r.json()['active']
+
+    r = client.get(f'/admin/profiling/{session_id}/report', params={'format': 'pstats'})
+    assert r.status_code == 200
+    assert 'attachment' in r.headers['content-disposition']
+    assert client.get('/admin/profiling/999999/report').status_code == 404
+
+
+def test_resolve_route_before_routing():
+    def scope(path: str, method: str = 'GET') -> dict:
+        return {'type': 'http', 'path': path, 'method': method, 'app': app}
+
+    assert resolve_route(scope('/tools/banner-preview-728x90.html')) == (
+        '/tools/banner-preview-{size_slug}.html'
+    )
+    assert resolve_route(scope('/static/css/main.css')) == '/static/{path}'
+    assert resolve_route(scope('/no/such/page')) == 'unmatched'
@@ -0,0 +1,76 @@
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.database import (
+    QueryTrackingMiddleware,
+    get_session,
+    normalize_sql,
+    query_budget,
+    track_queries,
+)
+from app.dependencies import SessionDep
+from app.models import Ad, Zone
+
+
+def test_normalize_sql_folds_literals_and_in_lists():
+    a = normalize_sql("SELECT * FROM ad WHERE id IN (?, ?, ?) AND url = 'x'  LIMIT 5")
+    b = normalize_sql('SELECT * FROM ad WHERE id IN (?, ?) AND url = ? LIMIT ?')
+    assert a == b == 'SELECT * FROM ad WHERE id IN (?...) AND url = ? LIMIT ?'
+    assert normalize_sql('SELECT 1 WHERE x = %(x_1)s AND y::text = :y') == (
+        'SELECT ? WHERE x = ? AND y::text = ?'
+    )
+
+
+def test_track_queries_counts_statements(session: Session):
+    with track_queries() as log:
+        session.exec(select(Zone)).all()
+        session.exec(select(Ad).where(Ad.id == 1)).all()
+        session.exec(select(Ad).where(Ad.id == 2)).all()
+    assert log.count == 3 and log.seconds > 0
+    ((shape, n),) = log.repeated(2).items()
+    assert n == 2 and shape.endswith('FROM ad WHERE ad.id = ?')
+
+
+def _looping_app() -> FastAPI:
+    loop_app = FastAPI()
+    loop_app.add_middleware(QueryTrackingMiddleware)
+
+    @loop_app.get('/ads/{n}')
+    @query_budget(2)
+    def per_ad_loop(n: int, session: SessionDep):
+        for ad_id in range(n):  # the N+1 shape the budget exists to catch
+            session.exec(select(Ad).where(Ad.id == ad_id)).first()
+        return {}
+
+    return loop_app
+
+
+def test_budget_and_repeated_statements_are_reported(
+    session: Session, query_logs, env, caplog
+):
+    env(DB_REPEATED_QUERY_THRESHOLD='3')
+    loop_app = _looping_app()
+    loop_app.dependency_overrides[get_session] = lambda: session
+    client = TestClient(loop_app)
+
+    with caplog.at_level(logging.WARNING, logger='app.database'):
+        client.get('/ads/2')
+        client.get('/ads/5')
+
+    within, over = query_logs
+    assert within.route == '/ads/{n}' and within.count == 2 and not within.over_budget
+    assert over.count == 5 and over.budget == 2 and over.over_budget
+    assert 'ran 5 statements (budget 2)' in caplog.text
+    assert 'ran the same statement 5 times' in caplog.text
+    query_logs.clear()  # expected overrun; don't fail the test
+
+
+def test_slow_queries_are_logged(session: Session, env, caplog):
+    env(DB_SLOW_QUERY_MS='0')
+    with caplog.at_level(logging.WARNING, logger='app.database'):
+        session.exec(select(Zone).where(Zone.name == 'x')).all()
+    assert 'Slow query' in caplog.text
+    assert 'FROM zone WHERE zone.name = ?' in caplog.text
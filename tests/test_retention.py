@@ -0,0 +1,85 @@
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import func, insert
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.config import Settings
+from app.models import AdStatsDaily, AdStatsHourly, Click, Impression
+from app.services.analytics import total_counts
+from app.services.retention import (
+    delete_expired,
+    enable_incremental_vacuum,
+    incremental_vacuum,
+    run_retention,
+)
+
+
+def test_retention_preserves_totals(session: Session, seed_ad):
+    a = seed_ad()
+    now = datetime.now(UTC)
+    session.add_all(
+        [Impression(ad_id=a.id, timestamp=now - timedelta(days=d)) for d in (1, 40)]  # type: ignore
+        + [
+            Impression(ad_id=a.id, timestamp=now - timedelta(days=200, hours=h))
+            for h in (1, 2)
+        ]  # type: ignore
+        + [Click(ad_id=a.id, timestamp=now - timedelta(days=200))]  # type: ignore
+    )
+    session.commit()
+    before = total_counts(session)
+
+    settings = Settings(raw_event_ttl_days=30, rollup_hourly_ttl_days=120)
+    report = run_retention(session.get_bind(), settings)  # type: ignore
+
+    assert report.impressions_deleted == 3
+    assert report.clicks_deleted == 1
+    assert report.days_compacted >= 1
+    session.expire_all()
+    assert session.exec(select(func.count()).select_from(Impression)).one() == 1
+    assert session.exec(select(func.count()).select_from(Click)).one() == 0
+    daily = session.exec(select(AdStatsDaily)).all()
+    assert sum(r.impressions for r in daily) == 2
+    assert sum(r.clicks for r in daily) == 1
+    old = now - timedelta(days=120)
+    assert all(
+        r.hour.replace(tzinfo=UTC) >= old for r in session.exec(select(AdStatsHourly))
+    )
+    assert total_counts(session) == before
+
+    # A second run has nothing left to do
+    again = run_retention(session.get_bind(), settings)  # type: ignore
+    assert (again.impressions_deleted, again.days_compacted) == (0, 0)
+
+
+def test_delete_expired_runs_in_chunks(session: Session, seed_ad):
+    a = seed_ad()
+    old = datetime.now(UTC) - timedelta(days=60)
+    session.execute(insert(Impression), [{'ad_id': a.id, 'timestamp': old}] * 25)
+    session.commit()
+    cutoff = datetime.now(UTC) - timedelta(days=30)
+    assert delete_expired(session.get_bind(), Impression, cutoff, 10, pause=0) == 25  # type: ignore
+
+
+def test_incremental_vacuum_releases_pages(tmp_path, seed_ad):
+    engine = create_engine(f'sqlite:///{tmp_path / "r.db"}')
+    SQLModel.metadata.create_all(engine)
+    assert incremental_vacuum(engine) == 0  # not enabled yet
+    enable_incremental_vacuum(engine)
+
+    with Session(engine) as session:
+        a = seed_ad(db=session)
+        old = datetime.now(UTC) - timedelta(days=60)
+        session.execute(insert(Impression), [{'ad_id': a.id, 'timestamp': old}] * 5000)
+        session.commit()
+    delete_expired(engine, Impression, datetime.now(UTC), pause=0)
+
+    def free_pages() -> int:
+        with engine.connect() as conn:
+            return conn.exec_driver_sql('PRAGMA freelist_count').scalar()  # type: ignore
+
+    before = free_pages()
+    assert before > 10
+    assert incremental_vacuum(engine, max_pages=10) == 10
+    assert free_pages() == before - 10
+    assert incremental_vacuum(engine) == before - 10
+    assert free_pages() == 0
@@ -0,0 +1,47 @@
+from datetime import UTC, datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from app.main import app
+from app.models import AdStatsHourly, Click, Impression
+from app.services.rollup import backfill_hourly, hour_bucket
+
+
+def test_orm_inserts_maintain_hourly_rollup(session: Session, seed_ad):
+    a = seed_ad()
+    now = datetime.now(UTC)
+    session.add_all(
+        [
+            Impression(ad_id=a.id, timestamp=now),  # type: ignore
+            Impression(ad_id=a.id, timestamp=now),  # type: ignore
+            Impression(ad_id=a.id, timestamp=now - timedelta(hours=3)),  # type: ignore
+            Click(ad_id=a.id, timestamp=now),  # type: ignore
+        ]
+    )
+    session.commit()
+
+    rows = session.exec(select(AdStatsHourly).order_by(AdStatsHourly.hour)).all()
+    assert [(r.impressions, r.clicks) for r in rows] == [(1, 0), (2, 1)]
+    assert hour_bucket(rows[-1].hour) == hour_bucket(now)
+
+    r = TestClient(app).get('/stats.json')
+    assert r.json()['ads'][0]['impressions'] == 3
+    assert r.json()['ads'][0]['clicks'] == 1
+
+
+def test_backfill_builds_rollup_from_raw_rows(session: Session, seed_ad):
+    a = seed_ad()
+    now = datetime.now(UTC)
+    # Core inserts bypass the ORM hook, like rows written before the rollup existed
+    session.execute(
+        insert(Impression),
+        [{'ad_id': a.id, 'timestamp': now - timedelta(days=d)} for d in (1, 1, 2)],
+    )
+    session.commit()
+    assert session.exec(select(AdStatsHourly)).all() == []
+
+    assert backfill_hourly(session) == 2
+    assert sum(r.impressions for r in session.exec(select(AdStatsHourly))) == 3
+    assert backfill_hourly(session) == 0  # only runs on an empty rollup
@@ -0,0 +1,69 @@
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.root_files import RootFile
+
+
+def test_root_files_served_with_validators():
+    client = TestClient(app)
+    r = client.get('/robots.txt')
+    assert r.status_code == 200
+    assert r.headers['content-type'].startswith('text/plain')
+    with open('robots.txt', 'rb') as f:
+        assert r.content == f.read()
+
+    etag, modified = r.headers['etag'], r.headers['last-modified']
+    r = client.get('/robots.txt', headers={'If-None-Match': etag})
+    assert r.status_code == 304
+    r = client.get('/robots.txt', headers={'If-Modified-Since': modified})
+    assert r.status_code == 304
+
+    r = client.get('/sitemap.xml', headers={'Accept-Encoding': 'gzip'})
+    assert r.headers['content-type'].startswith('application/xml')
+    assert r.headers['content-encoding'] == 'gzip'
+    assert client.get('/ads.txt').status_code == 200
+
+
+def test_gzip_variant_has_its_own_etag():
+    client = TestClient(app)
+    gz = client.get('/sitemap.xml', headers={'Accept-Encoding': 'gzip'})
+    plain = client.get('/sitemap.xml', headers={'Accept-Encoding': 'identity'})
+    assert gz.headers['etag'] == plain.headers['etag'][:-1] + '-gzip"'
+
+    refused = client.get('/sitemap.xml', headers={'Accept-Encoding': 'gzip;q=0, br'})
+    assert 'content-encoding' not in refused.headers
+    assert refused.headers['etag'] == plain.headers['etag']
+    # the identity ETag doesn't validate the gzipped variant
+    r = client.get(
+        '/sitemap.xml',
+        headers={'Accept-Encoding': 'gzip', 'If-None-Match': plain.headers['etag']},
+    )
+    assert r.status_code == 200
+
+
+def test_root_file_reloads_on_mtime_change(tmp_path):
+    path = tmp_path / 'ads.txt'
+    path.write_text('example.com, 1, DIRECT\n')
+    root_file = RootFile(str(path), 'text/plain', check_interval=0)
+    file_app = FastAPI()
+
+    @file_app.get('/ads.txt')
+    def ads(request: Request):
+        return root_file.response(request)
+
+    client = TestClient(file_app)
+    first = client.get('/ads.txt')
+    assert first.text == 'example.com, 1, DIRECT\n'
+
+    path.write_text('example.org, 2, RESELLER\n')
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + 10))
+    r = client.get('/ads.txt', headers={'If-None-Match': first.headers['etag']})
+    assert r.status_code == 200
+    assert r.text == 'example.org, 2, RESELLER\n'
+
+    path.unlink()
+    assert client.get('/ads.txt').status_code == 404
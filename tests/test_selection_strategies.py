@@ -0,0 +1,102 @@
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+
+from app import metrics
+from app.models import Ad, AdStatsHourly, Zone
+from app.services.ad_selection import (
+    CtrBoost,
+    EpsilonGreedy,
+    ThompsonSampling,
+    calculate_ad_weights,
+    select_ad_for_zone_async,
+    strategy_for_zone,
+)
+from app.services.simulation import compare, load_history
+
+
+def test_ctr_boost_keeps_the_legacy_weights():
+    ads = [Ad(id=i, zone_id=1, html='', url='', weight=w) for i, w in [(1, 2), (2, 1)]]
+    # ad 1: CTR 5% over 1000 imps; ad 2: new, gets the exploration bonus
+    assert calculate_ad_weights(ads, {1: 1000, 2: 10}, {1: 50, 2: 1}) == [
+        2 * 1.5,
+        1 * 2.0 * 1.5,
+    ]
+
+
+def test_epsilon_greedy_splits_between_best_and_weighted_draw():
+    weights = np.array([1.0, 1.0, 2.0, 0.0])
+    imps = np.array([1000.0, 1000.0, 1000.0, 0.0])
+    clks = np.array([10.0, 50.0, 10.0, 0.0])
+    p = EpsilonGreedy(epsilon=0.2).scores(weights, imps, clks)
+    assert np.allclose(p, [0.05, 0.85, 0.1, 0.0])
+
+
+def test_thompson_favours_the_better_ad_and_skips_zero_weights():
+    rng = np.random.default_rng(7)
+    weights = np.array([1.0, 1.0, 0.0])
+    imps = np.array([2000.0, 2000.0, 0.0])
+    clks = np.array([20.0, 60.0, 0.0])
+    picks = ThompsonSampling(max_batch_cells=300).choose(weights, imps, clks, 1000, rng)
+    counts = np.bincount(picks, minlength=3)
+    assert counts[1] > 950 and counts[2] == 0
+
+
+def test_strategy_is_configured_per_zone(env, run_async):
+    env(SELECTION_STRATEGY='epsilon_greedy', SELECTION_EPSILON='0.3')
+    env(ZONE_SELECTION_STRATEGIES='{"5": "thompson"}')
+    assert strategy_for_zone(5) == ThompsonSampling()
+    assert strategy_for_zone(6) == EpsilonGreedy(epsilon=0.3)
+    assert strategy_for_zone(None) == EpsilonGreedy(epsilon=0.3)
+
+    ads = (
+        Ad(id=1, zone_id=5, html='', url='', weight=1),
+        Ad(id=2, zone_id=5, html='', url='', weight=0),
+    )
+    picks = [
+        run_async(lambda s: select_ad_for_zone_async(s, ads, 5)) for _ in range(50)
+    ]
+    assert {ad.id for ad in picks} == {1}
+    env(ZONE_SELECTION_STRATEGIES=None)
+    assert strategy_for_zone(5) == EpsilonGreedy(epsilon=0.3)
+
+
+def test_zone_sampler_rebuilds_for_new_catalog_entry(run_async):
+    first = (Ad(id=1, zone_id=1, html='', url='', weight=1),)
+    assert run_async(lambda s: select_ad_for_zone_async(s, first, 1)).id == 1
+    # A catalog reload hands over a new tuple; the cached picks must not be reused
+    second = (Ad(id=2, zone_id=1, html='', url='', weight=1),)
+    assert run_async(lambda s: select_ad_for_zone_async(s, second, 1)).id == 2
+
+
+def test_zone_sampler_redraws_when_its_batch_is_used_up(env, run_async):
+    env(SAMPLER_BATCH_SIZE='2')
+    ads = (Ad(id=1, zone_id=9, html='', url='', weight=1),)
+    misses = metrics.cache_lookups.value('sampler', 'miss')
+    picks = [run_async(lambda s: select_ad_for_zone_async(s, ads, 9)) for _ in range(5)]
+    assert [ad.id for ad in picks] == [1] * 5
+    # built on the 1st, 3rd and 5th draw
+    assert metrics.cache_lookups.value('sampler', 'miss') - misses == 3
+
+
+def test_simulation_replays_the_hourly_rollup(session):
+    session.add(Zone(id=1, name='z', width=300, height=250))
+    session.add(Ad(id=1, zone_id=1, html='', url='', weight=1))
+    session.add(Ad(id=2, zone_id=1, html='', url='', weight=1))
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    for h in range(24):
+        hour = start + timedelta(hours=h)
+        session.add(AdStatsHourly(ad_id=1, hour=hour, impressions=500, clicks=5))
+        session.add(AdStatsHourly(ad_id=2, hour=hour, impressions=500, clicks=40))
+    session.commit()
+
+    history = load_history(session, 1, start)
+    assert history.impressions.shape == (24, 2)
+    assert history.clicks.sum() == 24 * 45
+
+    ctr_boost, thompson = compare(
+        history, [CtrBoost(), ThompsonSampling()], runs=2, batch=100, seed=1
+    )
+    assert ctr_boost.impressions == thompson.impressions == 24 * 1000
+    assert 0 < thompson.regret < ctr_boost.regret
+    assert thompson.oracle_clicks == ctr_boost.oracle_clicks
@@ -0,0 +1,105 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import CachedStaticFiles, SelectiveGZipMiddleware
+from app.static_assets import precompress
+
+CSS = b'body { color: #333; margin: 0; }\n' * 100
+
+
+def _client(tmp_path) -> TestClient:
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'main.css').write_bytes(CSS)
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG' + b'\0' * 2000)
+    app = FastAPI()
+    app.add_middleware(SelectiveGZipMiddleware, minimum_size=500)
+    app.mount('/static', CachedStaticFiles(directory=tmp_path), name='static')
+    return TestClient(app)
+
+
+def test_precompress_writes_smaller_gz_siblings(tmp_path):
+    _client(tmp_path)
+    written = precompress(str(tmp_path))
+    assert str(tmp_path / 'css' / 'main.css.gz') in written
+    assert not (tmp_path / 'logo.png.gz').exists()  # not a text asset
+    assert gzip.decompress((tmp_path / 'css' / 'main.css.gz').read_bytes()) == CSS
+    assert precompress(str(tmp_path)) == []  # up to date
+
+
+def test_static_serves_precompressed_sibling(tmp_path):
+    client = _client(tmp_path)
+    precompress(str(tmp_path))
+
+    r = client.get('/static/css/main.css', headers={'Accept-Encoding': 'gzip'})
+    assert r.status_code == 200
+    assert r.headers['content-encoding'] == 'gzip'
+    assert r.headers['content-type'].startswith('text/css')
+    assert r.headers['vary'] == 'Accept-Encoding'
+    assert r.headers['cache-control'] == 'public, max-age=86400'
+    assert int(r.headers['content-length']) < len(CSS)
+    assert r.content == CSS  # httpx decodes it
+
+    etag = r.headers['etag']
+    again = client.get(
+        '/static/css/main.css',
+        headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag},
+    )
+    assert again.status_code == 304
+
+    plain = client.get('/static/css/main.css', headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in plain.headers
+    assert plain.headers['etag'] != etag
+    assert plain.content == CSS
+
+
+def test_static_without_sibling_is_compressed_on_the_fly(tmp_path):
+    client = _client(tmp_path)  # no precompress run
+    r = client.get('/static/css/main.css', headers={'Accept-Encoding': 'gzip'})
+    assert r.headers['content-encoding'] == 'gzip'
+    assert r.headers['etag'].startswith('W/')
+    assert r.headers['vary'] == 'Accept-Encoding'
+    assert r.content == CSS
+
+    plain = client.get('/static/css/main.css', headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in plain.headers
+    assert plain.headers['etag'] == r.headers['etag'][2:]
+
+
+def test_static_skips_sibling_older_than_source(tmp_path):
+    import os
+
+    client = _client(tmp_path)
+    precompress(str(tmp_path))
+    source = tmp_path / 'css' / 'main.css'
+    source.write_bytes(CSS + b'a { color: red; }\n')
+    mtime = (tmp_path / 'css' / 'main.css.gz').stat().st_mtime
+    os.utime(source, (mtime + 10, mtime + 10))
+
+    stale = (tmp_path / 'css' / 'main.css.gz').stat()
+    r = client.get('/static/css/main.css', headers={'Accept-Encoding': 'gzip'})
+    assert r.content.endswith(b'a { color: red; }\n')
+    # compressed from the source, not the sibling
+    assert r.headers['etag'].startswith('W/')
+    assert int(r.headers['content-length']) != stale.st_size
+
+
+def test_gzip_middleware_weakens_etag_and_honours_q_values():
+    from fastapi import Response
+
+    app = FastAPI()
+    app.add_middleware(SelectiveGZipMiddleware, minimum_size=500)
+
+    @app.get('/big')
+    def big():
+        return Response(CSS, media_type='text/css', headers={'ETag': '"abc"'})
+
+    client = TestClient(app)
+    r = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert r.headers['content-encoding'] == 'gzip'
+    assert r.headers['etag'] == 'W/"abc"'
+
+    r = client.get('/big', headers={'Accept-Encoding': 'br, gzip;q=0'})
+    assert 'content-encoding' not in r.headers
+    assert r.headers['etag'] == '"abc"'
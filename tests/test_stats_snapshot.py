@@ -0,0 +1,46 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.main import app
+from app.models import Click, Impression
+from app.services.snapshot import Snapshot
+
+
+def test_public_stats_uses_one_query_per_snapshot(session: Session, seed_ad):
+    ads = [seed_ad()]
+    ads += [seed_ad(zone_id=ads[0].zone_id) for _ in range(4)]
+    session.add_all([Impression(ad_id=ads[0].id), Click(ad_id=ads[0].id)])  # type: ignore
+    session.commit()
+
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = session.get_bind()
+    client = TestClient(app)
+    event.listen(engine, 'before_cursor_execute', _record)
+    try:
+        first = client.get('/stats.json')
+        second = client.get('/stats.json')
+    finally:
+        event.remove(engine, 'before_cursor_execute', _record)
+
+    assert len(statements) == 1
+    assert first.headers['content-type'] == 'application/json'
+    assert first.content == second.content
+    first = first.json()
+    assert len(first['ads']) == 5
+    assert first['ads'][0]['impressions'] == 1
+    assert first['ads'][0]['ctr'] == 100.0
+
+
+def test_snapshot_recomputes_after_ttl_or_key_change():
+    calls = []
+    snap: Snapshot[int] = Snapshot(ttl_seconds=60)
+    assert snap.get(lambda: calls.append(1) or len(calls)) == 1
+    assert snap.get(lambda: calls.append(1) or len(calls)) == 1
+    assert snap.get(lambda: calls.append(1) or len(calls), key='other') == 2
+    snap.invalidate()
+    assert snap.get(lambda: calls.append(1) or len(calls), key='other') == 3